@@ -0,0 +1,105 @@
+"""
+Synthetic New Relic API responses of configurable size, in the same shape as
+the samples in tests/fixtures/sample_responses.py.
+"""
+from pyrelic.utils import from_epoch
+
+HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+BEGIN = 1303314420  # 2011-04-20T15:47:00Z
+FIELDS = ("average_call_time", "average_response_time", "call_count", "max_call_time", "min_call_time",
+          "requests_per_minute", "throughput", "total_call_time")
+THRESHOLDS = ("Apdex", "Application Busy", "CPU", "Memory", "Errors", "Response Time", "Throughput", "DB")
+
+
+def view_applications(applications):
+    parts = [HEADER, '<applications type="array">\n']
+    for app_id in range(1, applications + 1):
+        parts.append(
+            '  <application>\n'
+            '    <id type="integer">{0}</id>\n'
+            '    <name>Application {0}</name>\n'
+            '    <overview-url>https://rpm.newrelic.com/accounts/1/applications/{0}</overview-url>\n'
+            '    <servers-url>https://api.newrelic.com/api/v1/accounts/1/applications/{0}/servers</servers-url>\n'
+            '  </application>\n'.format(app_id))
+    parts.append('</applications>\n')
+    return "".join(parts)
+
+
+def delete_applications(applications):
+    parts = [HEADER, '<applications type="array">\n']
+    for app_id in range(1, applications + 1):
+        parts.append('  <application name="Application {0}" id="{0}">\n'
+                     '    <result>deleted</result>\n'
+                     '  </application>\n'.format(app_id))
+    parts.append('</applications>\n')
+    return "".join(parts)
+
+
+def notify_deployment():
+    return (HEADER +
+            '<deployment>\n'
+            '  <account-id type="integer">1</account-id>\n'
+            '  <agent-id type="integer">1</agent-id>\n'
+            '  <description>benchmark</description>\n'
+            '  <id type="integer">1</id>\n'
+            '  <revision>benchmark</revision>\n'
+            '</deployment>\n')
+
+
+def metric_names(metrics):
+    fields = "".join('      <field name="{0}"/>\n'.format(field) for field in FIELDS)
+    parts = [HEADER, '<metrics type="array">\n']
+    for metric in range(metrics):
+        parts.append('  <metric name="WebTransaction/Controller/{0}">\n'
+                     '    <fields type="array">\n{1}'
+                     '    </fields>\n'
+                     '  </metric>\n'.format(metric, fields))
+    parts.append('</metrics>\n')
+    return "".join(parts)
+
+
+def metric_data(applications, metrics, periods):
+    parts = [HEADER, '<metrics type="array">\n']
+    for app_id in range(1, applications + 1):
+        for metric in range(metrics):
+            for period in range(periods):
+                begin = BEGIN + period * 60
+                parts.append(
+                    '  <metric app="Application {0}" agent_id="{0}" begin="{1}" end="{2}" '
+                    'name="WebTransaction/Controller/{3}">\n'
+                    '    <field type="float" name="average_response_time">{4}</field>\n'
+                    '  </metric>\n'.format(app_id, from_epoch(begin), from_epoch(begin + 60), metric,
+                                           (period % 97) / 10.0))
+    parts.append('</metrics>\n')
+    return "".join(parts)
+
+
+def threshold_values():
+    parts = [HEADER, '<threshold-values type="array">\n']
+    for name in THRESHOLDS:
+        parts.append('  <threshold_value name="{0}" begin_time="Fri Dec 12 01:22:00 +0000 2008" '
+                     'end_time="Fri Dec 12 01:27:00 +0000 2008" formatted_metric_value="1.0" '
+                     'threshold_value="1" metric_value="1.0"/>\n'.format(name))
+    parts.append('</threshold-values>\n')
+    return "".join(parts)
+
+
+def view_servers(servers):
+    parts = [HEADER, '<servers type="array">\n']
+    for server_id in range(1, servers + 1):
+        parts.append('  <server>\n'
+                     '    <overview-url>https://rpm.newrelic.com/accounts/1/servers/{0}</overview-url>\n'
+                     '    <hostname>host-{0}.example.com</hostname>\n'
+                     '    <id type="integer">{0}</id>\n'
+                     '  </server>\n'.format(server_id))
+    parts.append('</servers>\n')
+    return "".join(parts)
+
+
+def delete_servers(server_id):
+    return (HEADER +
+            '<servers type="array">\n'
+            '  <server name="host-{0}.example.com" id="{0}">\n'
+            '    <result>deleted</result>\n'
+            '  </server>\n'
+            '</servers>\n'.format(server_id))
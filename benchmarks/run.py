@@ -0,0 +1,195 @@
+"""
+Benchmark the Client against a local stub of the New Relic API.
+
+    python -m benchmarks.run --applications 50 --metrics 20 --periods 60 \\
+                             --concurrency 1 4 16 --output results.json
+
+Two things are measured:
+
+* end to end: every Client method is called `--requests` times from
+  `--concurrency` threads sharing one Client, reporting throughput and the
+  latency distribution of single calls.
+* parsing: the XML parsing of view_applications, get_metric_names and
+  get_metric_data responses by every available parser, without any
+  network I/O.
+
+Results are written as JSON (to stdout without --output) so runs of
+different releases can be compared.
+"""
+import argparse
+import datetime
+import json
+import platform
+import sys
+import timeit
+
+from multiprocessing.pool import ThreadPool
+
+from pyrelic import Client, RateLimiter
+from pyrelic.parsers import PARSERS, get_parser
+from pyrelic.utils import clock, from_epoch
+
+from . import responses
+from .server import StubServer
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(q * (len(values) - 1)))))
+    return values[index]
+
+
+def summarize(latencies):
+    return {
+        'mean': sum(latencies) / len(latencies),
+        'p50': percentile(latencies, 0.5),
+        'p90': percentile(latencies, 0.9),
+        'p99': percentile(latencies, 0.99),
+        'max': max(latencies),
+    }
+
+
+def calls(options):
+    """
+    Return the Client calls to benchmark, by API method name.
+    """
+    applications = [str(app_id) for app_id in range(1, options.applications + 1)]
+    metrics = ["WebTransaction/Controller/{0}".format(metric) for metric in range(options.metrics)]
+    begin = from_epoch(responses.BEGIN)
+    end = from_epoch(responses.BEGIN + options.periods * 60)
+    return (
+        ('view_applications', lambda c: c.view_applications()),
+        ('delete_applications', lambda c: c.delete_applications({'app_id': 1})),
+        ('notify_deployment', lambda c: c.notify_deployment(application_id=1, description='benchmark')),
+        ('get_metric_names', lambda c: c.get_metric_names(1)),
+        ('get_metric_data', lambda c: c.get_metric_data(applications, metrics, 'average_response_time',
+                                                        begin, end)),
+        ('get_threshold_values', lambda c: c.get_threshold_values(1)),
+        ('view_servers', lambda c: c.view_servers()),
+        ('delete_servers', lambda c: c.delete_servers(1)),
+    )
+
+
+def create_client(server, concurrency):
+    # No rate limit, we are only talking to ourselves
+    unlimited = RateLimiter(rate=10 ** 9, per=1, burst=10 ** 9)
+    c = Client(account_id="1", api_key="benchmark", rate_limiter=unlimited, timeout=30.0,
+               pool_maxsize=max(10, concurrency))
+    c.api_endpoint = c.rpm_endpoint = server.url
+    return c
+
+
+def end_to_end(server, name, call, concurrency, requests):
+    c = create_client(server, concurrency)
+    try:
+        # Warm the connection pool up
+        for _ in range(concurrency):
+            call(c)
+
+        def timed(_):
+            start = clock()
+            call(c)
+            return clock() - start
+
+        pool = ThreadPool(concurrency)
+        try:
+            start = clock()
+            latencies = pool.map(timed, range(requests), chunksize=1)
+            elapsed = clock() - start
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        c.close()
+    return {
+        'endpoint': name,
+        'concurrency': concurrency,
+        'requests': requests,
+        'seconds': elapsed,
+        'throughput': requests / elapsed,
+        'latency': summarize(latencies),
+    }
+
+
+def parsing(options):
+    """
+    Time every available parser on each response type.
+    """
+    bodies = (
+        ('view_applications', 'applications', responses.view_applications(options.applications)),
+        ('get_metric_names', 'metric_names', responses.metric_names(options.metrics)),
+        ('get_metric_data', 'metric_data',
+         responses.metric_data(options.applications, options.metrics, options.periods)),
+    )
+    # Parsers are handed the bytes received, as the Client does
+    bodies = [(endpoint, method, body.encode('utf-8')) for endpoint, method, body in bodies]
+    results = []
+    for name in sorted(PARSERS):
+        try:
+            parser = get_parser(name)
+        except ImportError:
+            continue
+        for endpoint, method, body in bodies:
+            parse = getattr(parser, method)
+            timer = timeit.Timer(lambda: parse(body))
+            number, _ = timer.autorange() if hasattr(timer, 'autorange') else (10, None)
+            timings = [seconds / number for seconds in timer.repeat(repeat=options.repeat, number=number)]
+            size = len(body)
+            results.append({
+                'parser': name,
+                'endpoint': endpoint,
+                'bytes': size,
+                'best': min(timings),
+                'mean': sum(timings) / len(timings),
+                'megabytes_per_second': size / min(timings) / 1e6,
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pyrelic against a local stub server")
+    parser.add_argument('--applications', type=int, default=10)
+    parser.add_argument('--servers', type=int, default=10)
+    parser.add_argument('--metrics', type=int, default=10)
+    parser.add_argument('--periods', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=200, help="calls per endpoint and concurrency level")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds the stub waits before responding")
+    parser.add_argument('--repeat', type=int, default=5, help="repetitions of each parsing benchmark")
+    parser.add_argument('--endpoints', nargs='+', help="only run these end to end benchmarks")
+    parser.add_argument('--output', help="write the JSON results here instead of stdout")
+    options = parser.parse_args(argv)
+
+    server = StubServer(applications=options.applications, servers=options.servers, metrics=options.metrics,
+                        periods=options.periods, latency=options.latency).start()
+    try:
+        results = []
+        for name, call in calls(options):
+            if options.endpoints and name not in options.endpoints:
+                continue
+            for concurrency in options.concurrency:
+                results.append(end_to_end(server, name, call, concurrency, options.requests))
+    finally:
+        server.stop()
+
+    report = {
+        'created': datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'parameters': dict((key, value) for key, value in vars(options).items() if key != 'output'),
+        'end_to_end': results,
+        'parsing': parsing(options),
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        sys.stdout.write(output + "\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+A local HTTP server standing in for the New Relic API.  Every endpoint the
+Client uses is served from responses rendered once at startup, so the
+server itself adds as little as possible to what we measure.
+"""
+import re
+import threading
+import time
+
+from six.moves import BaseHTTPServer, socketserver
+
+from . import responses
+
+
+class StubServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, applications=10, servers=10, metrics=10, periods=10, latency=0.0, port=0):
+        self.latency = latency
+        self.bodies = {
+            'view_applications': responses.view_applications(applications),
+            'delete_applications': responses.delete_applications(applications),
+            'notify_deployment': responses.notify_deployment(),
+            'get_metric_names': responses.metric_names(metrics),
+            'get_metric_data': responses.metric_data(applications, metrics, periods),
+            'get_threshold_values': responses.threshold_values(),
+            'view_servers': responses.view_servers(servers),
+        }
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', port), _Handler)
+        self._thread = None
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{0}".format(self.server_address[1])
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+
+ROUTES = (
+    ('GET', re.compile(r'^/accounts/\w+/applications\.xml$'), 'view_applications'),
+    ('POST', re.compile(r'^/api/v1/accounts/\w+/applications/delete\.xml$'), 'delete_applications'),
+    ('POST', re.compile(r'^/deployments\.xml$'), 'notify_deployment'),
+    ('GET', re.compile(r'^/api/v1/applications/\w+/metrics\.xml$'), 'get_metric_names'),
+    ('GET', re.compile(r'^/api/v1/accounts/\w+/metrics/data\.xml$'), 'get_metric_data'),
+    ('GET', re.compile(r'^/accounts/\w+/applications/\w+/threshold_values\.xml$'), 'get_threshold_values'),
+    ('GET', re.compile(r'^/api/v1/accounts/\w+/servers\.xml$'), 'view_servers'),
+    ('DELETE', re.compile(r'^/api/v1/accounts/\w+/servers/(\w+)\.xml$'), 'delete_servers'),
+)
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    # Keep connections alive so the client's pool is exercised
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, don't let Nagle's algorithm
+    # and delayed ACKs add 40ms to every response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        path = self.path.split('?', 1)[0]
+        for route_method, pattern, endpoint in ROUTES:
+            match = pattern.match(path)
+            if route_method == method and match:
+                if endpoint == 'delete_servers':
+                    body = responses.delete_servers(match.group(1))
+                else:
+                    body = self.server.bodies[endpoint]
+                status = 200
+                break
+        else:
+            body, status = "Not Found", 404
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/xml; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond('GET')
+
+    def do_POST(self):
+        self._respond('POST')
+
+    def do_DELETE(self):
+        self._respond('DELETE')
@@ -3,8 +3,11 @@
 
 from __future__ import unicode_literals
 
+import sys
+
 from .exceptions import (
     NewRelicApiRateLimitException,
+    NewRelicApiCircuitOpenException,
     NewRelicApiException,
     NewRelicCredentialException,
     NewRelicInvalidApiKeyException,
@@ -12,22 +15,71 @@ from .exceptions import (
     NewRelicUnknownApplicationException
 )
 from .base_client import BaseClient
+from .session import PooledSession
+from .retry import RetryPolicy, RetryBudget
+from .breaker import CircuitBreaker
+from .stats import ClientStats, Observer, RequestRecord
+from .parsers import EtreeParser, LxmlParser, SaxParser
+from .cache import ResponseCache
+from .store import MetricStore
+from .coalesce import RequestCoalescer
+from .deployments import DeploymentQueue
+from .catalog import MetricCatalog
+from .watcher import ThresholdChange, ThresholdWatcher
+from .rate_limit import RateLimiter, SharedRateLimiter
 from .client import Client
 from .application import Application
 from .metric import Metric
+from .frame import MetricFrame
 from .threshold import Threshold
 from .server import Server
+from .deletion import Deletion, DeletionReport
+from .export import CsvWriter, JsonLinesWriter, ParquetWriter
+
+if sys.version_info >= (3, 5):
+    from .async_base_client import AsyncBaseClient
+    from .async_client import AsyncClient
 
 __all__ = (
+    'NewRelicApiRateLimitException',
+    'NewRelicApiCircuitOpenException',
     'NewRelicCredentialException',
     'NewRelicApiException',
     'NewRelicInvalidApiKeyException',
     'NewRelicUnknownApplicationException',
     'NewRelicInvalidParameterException',
     'Client',
-    'BaseClient'
+    'BaseClient',
+    'PooledSession',
+    'RetryPolicy',
+    'RetryBudget',
+    'CircuitBreaker',
+    'ClientStats',
+    'Observer',
+    'RequestRecord',
+    'EtreeParser',
+    'LxmlParser',
+    'SaxParser',
+    'ResponseCache',
+    'MetricStore',
+    'RequestCoalescer',
+    'DeploymentQueue',
+    'MetricCatalog',
+    'ThresholdWatcher',
+    'ThresholdChange',
+    'RateLimiter',
+    'SharedRateLimiter',
     'Application',
     'Metric',
+    'MetricFrame',
     'Threshold',
     'Server',
+    'Deletion',
+    'DeletionReport',
+    'CsvWriter',
+    'JsonLinesWriter',
+    'ParquetWriter',
 )
+
+if sys.version_info >= (3, 5):
+    __all__ += ('AsyncBaseClient', 'AsyncClient')
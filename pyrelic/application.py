@@ -1,8 +1,13 @@
-class Application(object):
+from .record import Record
+
+
+class Application(Record):
     """
     A simple dumb object for easily containing the data returned from a
     "view_applications" call
     """
+    __slots__ = ('name', 'app_id', 'overview_url', 'servers_url')
+
     def __init__(self, properties):
         super(Application, self).__init__()
         self.name = properties['name']
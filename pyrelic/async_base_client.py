@@ -0,0 +1,214 @@
+import asyncio
+import copy
+import logging
+
+import requests
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+from .base_client import BaseClient
+from .utils import clock
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBaseClient(BaseClient):
+    """
+    A Client for interacting with remote APIs via aiohttp.  It mirrors
+    BaseClient, but every request method is a coroutine so many calls can
+    share a single event loop.
+    """
+    def _create_session(self):
+        """
+        aiohttp sessions have to be created from inside a running event loop,
+        so ours is created lazily by _get_session.
+        """
+        if aiohttp is None:
+            raise ImportError("The asynchronous client requires aiohttp, "
+                              "install it with `pip install pyrelic[async]`")
+        return None
+
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_connections * self.pool_maxsize,
+                                             limit_per_host=self.pool_maxsize,
+                                             keepalive_timeout=self.max_idle_time)
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    def _proxy_for(self, uri):
+        """
+        aiohttp takes a single proxy URL per request rather than a mapping
+        of schemes to proxies.
+        """
+        if not self.proxy:
+            return None
+        proxy = self.proxy.get(uri.split(':', 1)[0])
+        if proxy and '://' not in proxy:
+            proxy = "http://" + proxy
+        return proxy
+
+    def _flatten_parameters(self, parameters):
+        """
+        requests expands list values into repeated keys and drops None
+        values, aiohttp does neither, so we do it here.
+        """
+        flattened = []
+        for key, value in (parameters or {}).items():
+            if value is None:
+                continue
+            if not isinstance(value, (list, tuple)):
+                value = [value]
+            for item in value:
+                flattened.append((key, str(item)))
+        return flattened
+
+    def _http_error(self, status, reason, uri):
+        response = requests.Response()
+        response.status_code = status
+        response.reason = reason
+        response.url = uri
+        message = "{status} Error: {reason} for url: {uri}".format(status=status, reason=reason, uri=uri)
+        return requests.HTTPError(message, response=response)
+
+    async def _make_request(self, method, uri, timeout=None, params=None, data=None, endpoint=None, parser=None):
+        """
+        The asynchronous equivalent of BaseClient._make_request: retry on
+        connection errors, convert non 200 responses through
+        _handle_api_error and hand the response body, as bytes, to our
+        parser.
+        """
+        with self._observe(endpoint) as record:
+            body = await self._send(method, uri, timeout=timeout, params=params, data=data, record=record)
+            return self._parse(body, record, parser)
+
+    async def _send(self, method, uri, timeout=None, params=None, data=None, record=None):
+        session = self._get_session()
+        policy = self.retry_policy
+        breaker = self.circuit_breaker
+        host = breaker.host(uri) if breaker is not None else None
+        policy.request()
+        attempts = 0
+        while True:
+            retry_after = None
+            is_timeout = False
+            status = None
+            if breaker is not None:
+                breaker.before(host)
+            start = clock()
+            try:
+                async with session.request(method, uri,
+                                           params=self._flatten_parameters(params),
+                                           data=self._flatten_parameters(data) or None,
+                                           headers=self.headers,
+                                           proxy=self._proxy_for(uri),
+                                           timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                    status, reason = response.status, response.reason
+                    headers_at = clock()
+                    if policy.retry_status(status, method):
+                        retry_after = response.headers.get('Retry-After')
+                    else:
+                        body = await response.read()
+                        if record is not None:
+                            record.bytes += len(body)
+                    if record is not None:
+                        record.status = status
+                        record.connect += headers_at - start
+                        record.transfer += clock() - headers_at
+            except aiohttp.ClientConnectionError as e:
+                error = e
+            except asyncio.TimeoutError as e:
+                error, is_timeout = e, True
+            except Exception:
+                if breaker is not None:
+                    breaker.record(host, True)
+                raise
+            except BaseException:
+                # Cancelled or interrupted, the host's health is unknown
+                if breaker is not None:
+                    breaker.release(host)
+                raise
+            finally:
+                if record is not None and status is None:
+                    record.connect += clock() - start
+            if breaker is not None:
+                breaker.record(host, status is None or status >= 500)
+            if status is not None:
+                if not policy.retry_status(status, method):
+                    break
+                error = None
+
+            attempts += 1
+            if record is not None:
+                record.retries = attempts
+            delay = policy.delay(attempts, timeout=is_timeout, retry_after=retry_after, method=method)
+            if delay is None:
+                if error is not None:
+                    raise requests.RequestException(str(error))
+                body = None
+                break
+            msg = "Attempting retry {attempts} after {delay:.2f} seconds".format(attempts=attempts, delay=delay)
+            logger.error(error.__doc__ if error is not None else "{0} response".format(status))
+            logger.error(msg)
+            await asyncio.sleep(delay)
+
+        if status >= 400:
+            self._handle_api_error(self._http_error(status, reason, uri))
+        return body
+
+    async def _api_rate_limit_exceeded(self, endpoint):
+        """
+        Made to be overridden
+        """
+
+    async def _make_get_request(self, uri, parameters=None, timeout=None, endpoint=None, rate_limited=False,
+                                cached=True, parser=None):
+        if not timeout:
+            timeout = self.timeout
+        if self.cache is None or endpoint is None or not cached:
+            if rate_limited:
+                await self._api_rate_limit_exceeded(endpoint)
+            return await self._make_request("GET", uri, params=parameters, timeout=timeout, endpoint=endpoint,
+                                            parser=parser)
+
+        with self._observe(endpoint) as record:
+            key = self.cache.key(endpoint, uri, parameters)
+            hit = self.cache.get(key)
+            if hit is not None:
+                record.cache_hit = True
+                return copy.copy(hit) if self.cache.parsed else self._parse(hit, record, parser)
+
+            if rate_limited:
+                await self._api_rate_limit_exceeded(endpoint)
+            body = await self._send("GET", uri, params=parameters, timeout=timeout, record=record)
+            parsed = self._parse(body, record, parser)
+            self.cache.set(key, copy.copy(parsed) if self.cache.parsed else body, len(body))
+            return parsed
+
+    async def _make_post_request(self, uri, payload, timeout=None, endpoint=None, parser=None):
+        if not timeout:
+            timeout = self.timeout
+        return await self._make_request("POST", uri, data=payload, timeout=timeout, endpoint=endpoint,
+                                        parser=parser)
+
+    async def _make_delete_request(self, uri, timeout=None, endpoint=None, parser=None):
+        if not timeout:
+            timeout = self.timeout
+        return await self._make_request("DELETE", uri, timeout=timeout, endpoint=endpoint, parser=parser)
+
+    async def close(self):
+        """
+        Release the pooled connections held by our session.
+        """
+        if self.session is not None:
+            await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
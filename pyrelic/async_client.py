@@ -0,0 +1,183 @@
+import asyncio
+
+from .async_base_client import AsyncBaseClient
+from .catalog import MetricCatalog
+from .client import BULK_DELETE_ERRORS, Client
+from .concurrency import chunks
+from .exceptions import NewRelicApiRateLimitException
+from .frame import MetricFrame
+from .metric import Metric
+from .planner import plan_windows, stitch
+from .utils import clock
+
+
+class AsyncClient(AsyncBaseClient, Client):
+    """
+    An asyncio Client for interacting with New Relic resources.
+
+    Every API method is a coroutine with the same arguments and return
+    values as its Client counterpart.  Requests are built, parsed and have
+    their errors mapped by the very same Client helpers, only the transport
+    differs.  The streaming iter_* methods are not available, use the
+    get_* coroutines instead.
+    """
+    def __init__(self, *args, **kwargs):
+        super(AsyncClient, self).__init__(*args, **kwargs)
+        # Rather than quietly ignore them
+        for option in ('metric_store', 'coalescer'):
+            if getattr(self, option) is not None:
+                raise NotImplementedError("AsyncClient does not support {0}".format(option))
+
+    async def _api_rate_limit_exceeded(self, endpoint, wait=None):
+        """
+        Like Client._api_rate_limit_exceeded, but waiting for a token does
+        not block the event loop.
+        """
+        if wait is None:
+            wait = self.wait_on_rate_limit
+        start = clock()
+        while True:
+            delay = self.rate_limiter.reserve(endpoint)
+            if not delay:
+                self._observe_rate_limit(endpoint, clock() - start)
+                return
+            if not wait:
+                raise NewRelicApiRateLimitException(delay)
+            await asyncio.sleep(delay)
+
+    async def view_applications(self):
+        return await self._make_get_request(self._view_applications_uri(), endpoint='view_applications',
+                                            parser=self.parser.applications)
+
+    async def delete_applications(self, applications):
+        return await self._make_post_request(self._delete_applications_uri(), applications,
+                                             endpoint='delete_applications',
+                                             parser=self.parser.application_deletions)
+
+    async def bulk_delete_applications(self, applications, batch_size=100, max_workers=None, rate_limited=False):
+        semaphore = asyncio.Semaphore(max_workers or self.max_workers)
+
+        async def delete(batch):
+            parameter, items = batch
+            key = 'id' if parameter == 'app_id' else 'name'
+            async with semaphore:
+                try:
+                    if rate_limited:
+                        await self._api_rate_limit_exceeded('delete_applications', wait=True)
+                    results = await self._make_post_request(self._delete_applications_uri(),
+                                                            self._bulk_applications_payload(parameter, items),
+                                                            endpoint='delete_applications',
+                                                            parser=self.parser.application_results)
+                except BULK_DELETE_ERRORS as e:
+                    return self._deletions(items, key, error=e)
+            return self._deletions(items, key, results)
+
+        batches = self._bulk_application_batches(applications, batch_size)
+        return self._deletion_report(await asyncio.gather(*[delete(batch) for batch in batches]))
+
+    async def get_application_summary_metrics(self, application_ids=None, max_workers=None):
+        await self._api_rate_limit_exceeded('get_application_summary_metrics')
+        if application_ids is None:
+            application_ids = [application.app_id for application in await self.view_applications()]
+        semaphore = asyncio.Semaphore(max_workers or self.max_workers)
+
+        async def fetch(index, application_id):
+            async with semaphore:
+                if index:
+                    await self._api_rate_limit_exceeded('get_application_summary_metrics', wait=True)
+                return await self.get_threshold_values(application_id)
+
+        summaries = await asyncio.gather(*[fetch(index, application_id)
+                                           for index, application_id in enumerate(application_ids)])
+        return self._summary_metrics(application_ids, summaries)
+
+    async def notify_deployment(self, application_id=None, application_name=None, description=None, revision=None, changelog=None, user=None):
+        deploy_event = self._deployment_payload(application_id, application_name, description,
+                                                revision, changelog, user)
+        return await self._make_post_request(self._notify_deployment_uri(), deploy_event,
+                                             endpoint='notify_deployment', parser=self.parser.deployment)
+
+    async def get_metric_names(self, agent_id, re=None, limit=5000):
+        parameters = {'re': re, 'limit': limit}
+        return await self._make_get_request(self._metric_names_uri(agent_id), parameters=parameters,
+                                            timeout=max(self.timeout, 5.0),
+                                            endpoint='get_metric_names', rate_limited=True,
+                                            parser=self.parser.metric_names)
+
+    async def metric_catalog(self, agent_id):
+        """
+        Like Client.metric_catalog, without the background refresh: call
+        catalog.update(await client.get_metric_names(agent_id)) instead.
+        """
+        return MetricCatalog(agent_id=agent_id, names=await self.get_metric_names(agent_id))
+
+    def iter_metric_names(self, agent_id, re=None, limit=5000):
+        raise NotImplementedError("AsyncClient can't stream metric names, use get_metric_names")
+
+    def iter_all_metric_names(self, agent_id, limit=5000, checkpoint=None):
+        raise NotImplementedError("AsyncClient can't page through metric names, use get_metric_names")
+
+    def iter_metric_data(self, applications, metrics, field, begin, end, summary=False, chunk=None):
+        raise NotImplementedError("AsyncClient can't stream metric data, use get_metric_data")
+
+    async def get_metric_data(self, applications, metrics, field, begin, end, summary=False,
+                              shard_size=None, max_workers=None, as_frame=False, chunk=None):
+        await self._api_rate_limit_exceeded('get_metric_data')
+        shards = chunks(applications, shard_size)
+        windows = plan_windows(begin, end, chunk) if chunk and not summary else [(begin, end)]
+        semaphore = asyncio.Semaphore(max_workers or self.max_workers)
+
+        async def fetch(index, shard, window):
+            async with semaphore:
+                if index:
+                    await self._api_rate_limit_exceeded('get_metric_data', wait=True)
+                return await self._fetch_metric_elements(shard, metrics, field, window[0], window[1], summary)
+
+        requests = [(shard, window) for shard in shards for window in windows]
+        fetched = await asyncio.gather(*[fetch(index, shard, window)
+                                         for index, (shard, window) in enumerate(requests)])
+        elements = []
+        for shard in range(len(shards)):
+            shard_elements = fetched[shard * len(windows):(shard + 1) * len(windows)]
+            if len(windows) > 1:
+                elements.extend(stitch(shard_elements, self._app_attribute(applications), applications))
+            else:
+                elements.extend(shard_elements[0])
+        if as_frame:
+            return MetricFrame.from_elements(elements)
+        return [Metric(element) for element in elements]
+
+    async def _fetch_metric_elements(self, applications, metrics, field, begin, end, summary):
+        parameters = self._metric_data_parameters(applications, metrics, field, begin, end, summary)
+        return await self._make_get_request(self._metric_data_uri(), parameters=parameters,
+                                            timeout=max(self.timeout, 5.0), endpoint='get_metric_data',
+                                            cached=False, parser=self.parser.metric_elements)
+
+    async def get_threshold_values(self, application_id):
+        return await self._make_get_request(self._threshold_values_uri(application_id),
+                                            endpoint='get_threshold_values', parser=self.parser.threshold_values)
+
+    async def view_servers(self):
+        return await self._make_get_request(self._view_servers_uri(), endpoint='view_servers',
+                                            parser=self.parser.servers)
+
+    async def delete_servers(self, server_id):
+        return await self._make_delete_request(self._delete_servers_uri(server_id), endpoint='delete_servers',
+                                               parser=self.parser.server_deletions)
+
+    async def bulk_delete_servers(self, server_ids, max_workers=None, rate_limited=False):
+        semaphore = asyncio.Semaphore(max_workers or self.max_workers)
+
+        async def delete(item):
+            async with semaphore:
+                try:
+                    if rate_limited:
+                        await self._api_rate_limit_exceeded('delete_servers', wait=True)
+                    results = await self._make_delete_request(self._delete_servers_uri(item[1]),
+                                                              endpoint='delete_servers',
+                                                              parser=self.parser.server_results)
+                except BULK_DELETE_ERRORS as e:
+                    return self._deletions([item], 'id', error=e)
+            return self._deletions([item], 'id', results)
+
+        return self._deletion_report(await asyncio.gather(*[delete(item) for item in enumerate(server_ids)]))
@@ -1,8 +1,15 @@
+import contextlib
+import copy
 import six
 import logging
 import requests
 from time import sleep
 
+from .retry import RetryPolicy
+from .session import PooledSession
+from .stats import ClientStats, RequestRecord
+from .utils import clock
+
 
 logger = logging.getLogger(__name__)
 
@@ -11,12 +18,53 @@ class BaseClient(object):
     """
     A Client for interacting with remote APIs via python requests
     """
-    def __init__(self, proxy=None, retries=3, retry_delay=1, timeout=1.000):
+    def __init__(self, proxy=None, retries=3, retry_delay=1, timeout=1.000,
+                 session=None, pool_connections=10, pool_maxsize=10,
+                 max_idle_time=None, cache=None, retry_policy=None, circuit_breaker=None, observers=None):
+        """
+        A Session may be passed in to share one connection pool between
+        several clients, otherwise a new PooledSession is created from the
+        pool_connections (number of hosts), pool_maxsize (connections per
+        host) and max_idle_time (seconds before idle sockets are dropped)
+        settings.
+
+        A ResponseCache may be passed in to serve repeated GET requests from
+        memory.
+
+        Failed requests are retried according to retry_policy, by default a
+        RetryPolicy making up to retries retries with jittered exponential
+        backoff starting from retry_delay seconds.
+
+        With a CircuitBreaker, requests to a host that keeps failing raise
+        NewRelicApiCircuitOpenException straight away instead of waiting on
+        timeouts and retries.
+
+        Every request is reported to our ClientStats (see stats()) and to any
+        other Observers passed in.
+        """
         self.retries = retries
         self.retry_delay = retry_delay
         self.timeout = timeout
         self.proxy = self._normalize_proxy(proxy)
         self.headers = None
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_idle_time = max_idle_time
+        if session is None:
+            session = self._create_session()
+        self.session = session
+        self.cache = cache
+        if retry_policy is None:
+            retry_policy = RetryPolicy(retries=retries, backoff=retry_delay)
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+        self.request_stats = ClientStats()
+        self.observers = [self.request_stats] + list(observers or [])
+
+    def _create_session(self):
+        return PooledSession(pool_connections=self.pool_connections,
+                             pool_maxsize=self.pool_maxsize,
+                             max_idle_time=self.max_idle_time)
 
     def _parser(self, text):
         """
@@ -30,21 +78,27 @@ class BaseClient(object):
         """
         raise error
 
+    def _api_rate_limit_exceeded(self, endpoint):
+        """
+        Made to be overridden
+        """
+
     def _normalize_proxy(self, proxy):
         if isinstance(proxy, six.string_types) and ':' in proxy:
             return {"http": proxy, "https": proxy}
         elif isinstance(proxy, dict):
             return proxy
 
-    def _make_request(self, request, uri, **kwargs):
+    def _make_request(self, request, uri, endpoint=None, parser=None, **kwargs):
         """
         This is final step of calling out to the remote API.  We set up our
         headers, proxy, debugging etc. The only things in **kwargs are
         parameters that are overridden on an API method basis (like timeout)
 
-        We have a simple attempt/while loop to implement retries w/ delays to
-        avoid the brittleness of talking over the network to remote services.
-        These settings can be overridden when creating the Client.
+        Retries w/ delays avoid the brittleness of talking over the network
+        to remote services.  Which failures are retried, and how long we wait
+        in between, is up to our RetryPolicy, which can be overridden when
+        creating the Client.
 
         We catch the 'requests' exceptions during our retries and eventually
         raise our own NewRelicApiException if we are unsuccessful in contacting
@@ -52,57 +106,213 @@ class BaseClient(object):
         and raise an appropriate exception according to the New Relic API
         documentation.
 
-        Finally we pass back the response text to our XML parser since we have
-        no business parsing that here. It could be argued that handling API
-        exceptions/errors shouldn't belong in this method but it is simple
-        enough for now.
+        Finally we pass back the response body to our XML parser (or the
+        parser given for this request) since we have no business parsing
+        that here.  The body goes over as the bytes received, once urllib3
+        has undone any gzip/deflate content encoding, without decoding it
+        to text: the parser reads the encoding from the XML declaration.
+
+        It could be argued that handling API exceptions/errors shouldn't
+        belong in this method but it is simple enough for now.
+        """
+        with self._observe(endpoint) as record:
+            response = self._send(request, uri, record=record, **kwargs)
+            return self._parse(response.content, record, parser)
+
+    def stats(self):
+        """
+        Return a snapshot of the counters and latency, size and rate limit
+        wait histograms kept for each API method, see ClientStats.
+        """
+        return self.request_stats.snapshot()
+
+    @contextlib.contextmanager
+    def _observe(self, endpoint):
+        """
+        Time the block and hand its RequestRecord to our observers, even
+        when it raises.
+        """
+        record = RequestRecord(endpoint)
+        start = clock()
+        try:
+            yield record
+        except Exception as e:
+            record.error = type(e).__name__
+            raise
+        finally:
+            record.latency = clock() - start
+            for observer in self.observers:
+                observer.on_request(record)
+
+    def _observe_rate_limit(self, endpoint, waited):
+        for observer in self.observers:
+            observer.on_rate_limit(endpoint, waited)
+
+    def _parse(self, body, record, parser=None):
+        start = clock()
+        try:
+            return (parser or self._parser)(body)
+        finally:
+            record.parse = clock() - start
+
+    def _send(self, request, uri, record=None, **kwargs):
         """
+        Perform the request with retries and error handling as described in
+        _make_request, returning the unparsed response.  Timings, sizes and
+        retries are added to record when given.
+        """
+        policy = self.retry_policy
+        breaker = self.circuit_breaker
+        host = breaker.host(uri) if breaker is not None else None
+        # requests' get, post and delete functions and Session methods
+        method = getattr(request, '__name__', '').upper() or None
+        policy.request()
         attempts = 0
-        response = None
-        while attempts <= self.retries:
+        while True:
+            response = None
+            timeout = False
+            retry_after = None
+            if breaker is not None:
+                breaker.before(host)
+            start = clock()
             try:
                 response = request(uri, headers=self.headers, proxies=self.proxy, **kwargs)
+            except (requests.ConnectionError, requests.HTTPError) as e:
+                error = e
+            except requests.Timeout as e:
+                error, timeout = e, True
+            except Exception:
+                if breaker is not None:
+                    breaker.record(host, True)
+                raise
+            except BaseException:
+                # Cancelled or interrupted, the host's health is unknown
+                if breaker is not None:
+                    breaker.release(host)
+                raise
+            finally:
+                if record is not None:
+                    self._record_attempt(record, clock() - start, response, kwargs.get('stream'))
+            if breaker is not None:
+                breaker.record(host, response is None or response.status_code >= 500)
+            if response is not None:
+                if not policy.retry_status(response.status_code, method):
+                    break
+                error = None
+                retry_after = response.headers.get('Retry-After')
 
-            except (requests.ConnectionError, requests.HTTPError) as ce:
-                attempts += 1
-                msg = "Attempting retry {attempts} after {delay} seconds".format(attempts=attempts, delay=self.retry_delay)
-                logger.error(ce.__doc__)
-                logger.error(msg)
-                sleep(self.retry_delay)
-            else:
+            attempts += 1
+            if record is not None:
+                record.retries = attempts
+            delay = policy.delay(attempts, timeout=timeout, retry_after=retry_after, method=method)
+            if delay is None:
+                if response is None:
+                    raise error
                 break
-        if response is not None:
-            try:
-                response.raise_for_status()
-            except Exception as e:
-                self._handle_api_error(e)
-        else:
-            raise requests.RequestException
-        return self._parser(response.text)
+            if response is not None:
+                response.close()
+            msg = "Attempting retry {attempts} after {delay:.2f} seconds".format(attempts=attempts, delay=delay)
+            logger.error(error.__doc__ if error is not None else "{0} response".format(response.status_code))
+            logger.error(msg)
+            sleep(delay)
 
-    def _make_get_request(self, uri, parameters=None, timeout=None):
+        if record is not None:
+            record.retries = attempts
+        try:
+            response.raise_for_status()
+        except Exception as e:
+            if kwargs.get('stream'):
+                # Nobody will read this body, give its connection back to the pool
+                response.close()
+            self._handle_api_error(e)
+        return response
+
+    def _record_attempt(self, record, elapsed, response, stream):
+        """
+        Split the time spent on an attempt into waiting for the response
+        headers and reading the body.  Streamed bodies are read later, by
+        the parser.
+        """
+        if response is None:
+            record.connect += elapsed
+            return
+        headers = min(elapsed, response.elapsed.total_seconds())
+        record.connect += headers
+        record.transfer += elapsed - headers
+        record.status = response.status_code
+        if not stream:
+            record.bytes += len(response.content)
+
+    def _make_get_request(self, uri, parameters=None, timeout=None, endpoint=None, rate_limited=False,
+                          cached=True, parser=None):
         """
         Given a request add in the required parameters and return the parsed
         XML object.
+
+        endpoint names the API method making the request.  When we have a
+        cache, responses for named endpoints are served from and stored in
+        it unless cached is False.  rate_limited requests take a rate limit
+        token for endpoint, but only when they actually go out over the
+        network.  parser replaces our _parser for this request.
         """
         if not timeout:
             timeout = self.timeout
-        return self._make_request(requests.get, uri, params=parameters, timeout=timeout)
+        if self.cache is None or endpoint is None or not cached:
+            if rate_limited:
+                self._api_rate_limit_exceeded(endpoint)
+            return self._make_request(self.session.get, uri, endpoint=endpoint, parser=parser, params=parameters,
+                                      timeout=timeout)
 
-    def _make_post_request(self, uri, payload, timeout=None):
+        with self._observe(endpoint) as record:
+            key = self.cache.key(endpoint, uri, parameters)
+            hit = self.cache.get(key)
+            if hit is not None:
+                record.cache_hit = True
+                return copy.copy(hit) if self.cache.parsed else self._parse(hit, record, parser)
+
+            if rate_limited:
+                self._api_rate_limit_exceeded(endpoint)
+            body = self._send(self.session.get, uri, record=record, params=parameters, timeout=timeout).content
+            parsed = self._parse(body, record, parser)
+            self.cache.set(key, copy.copy(parsed) if self.cache.parsed else body, len(body))
+            return parsed
+
+    def _make_streaming_get_request(self, uri, parameters=None, timeout=None, endpoint=None):
+        """
+        Given a request add in the required parameters and return the
+        response without reading its body, so it can be parsed incrementally
+        from response.raw.  The caller is responsible for closing it.
+        """
+        if not timeout:
+            timeout = self.timeout
+        with self._observe(endpoint) as record:
+            response = self._send(self.session.get, uri, record=record, params=parameters, timeout=timeout,
+                                  stream=True)
+        # Let urllib3 undo any gzip/deflate transfer encoding for us.
+        response.raw.decode_content = True
+        return response
+
+    def _make_post_request(self, uri, payload, timeout=None, endpoint=None, parser=None):
         """
         Given a request add in the required parameters and return the parsed
         XML object.
         """
         if not timeout:
             timeout = self.timeout
-        return self._make_request(requests.post, uri, data=payload, timeout=timeout)
+        return self._make_request(self.session.post, uri, endpoint=endpoint, parser=parser, data=payload,
+                                  timeout=timeout)
 
-    def _make_delete_request(self, uri, timeout=None):
+    def _make_delete_request(self, uri, timeout=None, endpoint=None, parser=None):
         """
         Given a request add in the required parameters and return the parsed
         XML object.
         """
         if not timeout:
             timeout = self.timeout
-        return self._make_request(requests.delete, uri, timeout=timeout)
+        return self._make_request(self.session.delete, uri, endpoint=endpoint, parser=parser, timeout=timeout)
+
+    def close(self):
+        """
+        Release the pooled connections held by our session.
+        """
+        self.session.close()
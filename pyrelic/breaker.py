@@ -0,0 +1,138 @@
+import threading
+from collections import deque
+
+from six.moves.urllib.parse import urlparse
+
+from .exceptions import NewRelicApiCircuitOpenException
+from .utils import clock
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class _Circuit(object):
+    __slots__ = ('state', 'outcomes', 'failures', 'opened_at', 'probes', 'successes')
+
+    def __init__(self):
+        self.state = CLOSED
+        self.outcomes = deque()
+        self.failures = 0
+        self.opened_at = None
+        self.probes = 0
+        self.successes = 0
+
+
+class CircuitBreaker(object):
+    """
+    A thread-safe circuit breaker per remote host.
+
+    While closed, the outcome of every attempt made in the last `window`
+    seconds is kept.  Once at least `minimum_requests` attempts were made and
+    `failure_threshold` (a ratio) of them failed, the circuit opens and
+    requests to that host fail fast with NewRelicApiCircuitOpenException.
+
+    After `reset_timeout` seconds the circuit is half-open: up to `probes`
+    requests at a time are let through.  If `probes` of them succeed the
+    circuit closes again, a single failure opens it for another
+    `reset_timeout` seconds.
+
+    Connection errors, timeouts and 5xx responses count as failures; any
+    other response shows the host is up.
+    """
+    def __init__(self, failure_threshold=0.5, minimum_requests=10, window=60, reset_timeout=30, probes=1):
+        self.failure_threshold = failure_threshold
+        self.minimum_requests = minimum_requests
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.probes = probes
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def host(self, uri):
+        return urlparse(uri).netloc
+
+    def state(self, host):
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None:
+                return CLOSED
+            if circuit.state == OPEN and clock() - circuit.opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return circuit.state
+
+    def before(self, host):
+        """
+        Called before every attempt.  Raises NewRelicApiCircuitOpenException
+        if the request must not be sent.
+        """
+        with self._lock:
+            circuit = self._circuits.setdefault(host, _Circuit())
+            if circuit.state == CLOSED:
+                return
+            if circuit.state == OPEN:
+                remaining = self.reset_timeout - (clock() - circuit.opened_at)
+                if remaining > 0:
+                    raise NewRelicApiCircuitOpenException(
+                        "Circuit for {0} is open, retry in {1:.1f} seconds".format(host, remaining),
+                        host=host, retry_in=remaining)
+                circuit.state = HALF_OPEN
+                circuit.probes = 0
+                circuit.successes = 0
+            if circuit.probes >= self.probes:
+                raise NewRelicApiCircuitOpenException(
+                    "Circuit for {0} is half-open and waiting on probe requests".format(host),
+                    host=host, retry_in=0)
+            circuit.probes += 1
+
+    def record(self, host, failed):
+        """
+        Called with the outcome of every attempt let through by before.
+        """
+        with self._lock:
+            circuit = self._circuits.setdefault(host, _Circuit())
+            now = clock()
+            if circuit.state == HALF_OPEN:
+                circuit.probes -= 1
+                if failed:
+                    self._open(circuit, now)
+                else:
+                    circuit.successes += 1
+                    if circuit.successes >= self.probes:
+                        self._close(circuit)
+                return
+            if circuit.state == OPEN:
+                return
+
+            circuit.outcomes.append((now, failed))
+            circuit.failures += failed
+            while circuit.outcomes and circuit.outcomes[0][0] <= now - self.window:
+                circuit.failures -= circuit.outcomes.popleft()[1]
+            total = len(circuit.outcomes)
+            if total >= self.minimum_requests and circuit.failures >= self.failure_threshold * total:
+                self._open(circuit, now)
+
+    def release(self, host):
+        """
+        Called instead of record when an attempt let through by before was
+        abandoned (cancelled or interrupted) without an outcome, so that a
+        half-open circuit doesn't wait on it forever.
+        """
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is not None and circuit.state == HALF_OPEN and circuit.probes > 0:
+                circuit.probes -= 1
+
+    def _open(self, circuit, now):
+        circuit.state = OPEN
+        circuit.opened_at = now
+        circuit.outcomes.clear()
+        circuit.failures = 0
+
+    def _close(self, circuit):
+        circuit.state = CLOSED
+        circuit.outcomes.clear()
+        circuit.failures = 0
+        circuit.probes = 0
+        circuit.successes = 0
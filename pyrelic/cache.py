@@ -0,0 +1,79 @@
+import threading
+from collections import OrderedDict
+
+from .utils import clock
+
+
+class ResponseCache(object):
+    """
+    A thread-safe TTL + LRU cache for API responses.
+
+    Entries are keyed by endpoint (the API method name), URI and request
+    parameters.  Each endpoint can have its own time to live through `ttls`,
+    a dictionary of endpoint name to seconds, falling back to `ttl`.  The
+    least recently used entries are evicted once the cache holds more than
+    `max_entries` responses or more than `max_bytes` bytes of response
+    bodies.
+
+    By default the raw response body is kept and parsed again on every hit;
+    with parsed=True the parsed XML tree is kept instead.
+    """
+    def __init__(self, ttl=60, ttls=None, max_entries=1024, max_bytes=None, parsed=False):
+        self.ttl = ttl
+        self.ttls = ttls or {}
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.parsed = parsed
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, endpoint, uri, parameters=None):
+        frozen = []
+        for name, value in sorted((parameters or {}).items()):
+            if isinstance(value, list):
+                value = tuple(value)
+            frozen.append((name, value))
+        return (endpoint, uri, tuple(frozen))
+
+    def get(self, key):
+        """
+        Return the cached value for key, or None if it is missing or stale.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, size, expires = entry
+            if expires <= clock():
+                self._remove(key)
+                return None
+            # Mark as most recently used
+            del self._entries[key]
+            self._entries[key] = entry
+            return value
+
+    def set(self, key, value, size):
+        ttl = self.ttls.get(key[0], self.ttl)
+        if not ttl or (self.max_bytes is not None and size > self.max_bytes):
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, clock() + ttl)
+            self.size += size
+            while self._entries and (len(self._entries) > self.max_entries or
+                                     (self.max_bytes is not None and self.size > self.max_bytes)):
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        value, size, expires = self._entries.pop(key)
+        self.size -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,273 @@
+import fnmatch
+import logging
+import re
+import threading
+
+import requests
+
+from .exceptions import NewRelicApiException
+
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = '/'
+
+
+class _Node(object):
+    __slots__ = ('children', 'name')
+
+    def __init__(self):
+        self.children = {}
+        # The full metric name when a metric ends at this node
+        self.name = None
+
+
+def literal_prefix(pattern):
+    """
+    Return the literal text an anchored (^...) regular expression requires
+    its matches to start with, '' if there is none.
+    """
+    if not pattern.startswith('^'):
+        return ''
+    prefix = []
+    index = 1
+    while index < len(pattern):
+        char = pattern[index]
+        if char == '\\' and index + 1 < len(pattern) and not pattern[index + 1].isalnum():
+            char = pattern[index + 1]
+            index += 1
+        elif char in '.^$*+?{}[]\\|()':
+            break
+        prefix.append(char)
+        index += 1
+    # A quantifier allowing none of the last character makes it optional,
+    # and an alternation makes all of it
+    following = pattern[index:index + 1]
+    if following == '|' or '|' in pattern:
+        return ''
+    if following and following in '*?{':
+        prefix = prefix[:-1]
+    return "".join(prefix)
+
+
+class MetricCatalog(object):
+    """
+    A local index of the metric names of one application, built from
+    get_metric_names so that finding metrics does not cost a rate limited
+    API call per pattern.
+
+    Names are kept in a trie over their '/' separated segments, which
+    answers prefix() and glob() queries by walking only the matching
+    branches, and field names in an inverted index of field to metric
+    names.  regex() uses re.search, like the API's re parameter, narrowing
+    the candidates to a prefix first when the pattern is anchored.  Every
+    query takes an optional field, limiting the results to metrics that
+    have it, and returns a sorted list of names.
+
+    refresh() fetches the names again and applies only the difference to
+    the index; start(interval) does so in a background thread.
+    """
+    def __init__(self, client=None, agent_id=None, names=None):
+        self.client = client
+        self.agent_id = agent_id
+        self._root = _Node()
+        self._names = {}
+        self._fields = {}
+        self._lock = threading.RLock()
+        self._thread = None
+        self._stop = threading.Event()
+        if names is not None:
+            self.update(names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def fields(self, name):
+        """
+        Return the fields of a metric, None if we don't know it.
+        """
+        fields = self._names.get(name)
+        return list(fields) if fields is not None else None
+
+    def field_names(self):
+        with self._lock:
+            return sorted(self._fields)
+
+    def prefix(self, prefix, field=None):
+        """
+        Return the metrics whose name starts with prefix.
+        """
+        segments = prefix.split(SEPARATOR)
+        with self._lock:
+            node = self._root
+            for segment in segments[:-1]:
+                node = node.children.get(segment)
+                if node is None:
+                    return []
+            last = segments[-1]
+            names = []
+            for segment, child in node.children.items():
+                if segment.startswith(last):
+                    self._collect(child, names)
+            return self._filter(names, field)
+
+    def glob(self, pattern, field=None):
+        """
+        Return the metrics matching a shell style pattern, matched segment
+        by segment: '*', '?' and '[...]' stay within a segment while '**'
+        matches any number of segments.
+        """
+        with self._lock:
+            names = []
+            self._glob(self._root, pattern.split(SEPARATOR), names)
+            return self._filter(sorted(set(names)), field)
+
+    def regex(self, pattern, field=None):
+        """
+        Return the metrics a regular expression matches anywhere in their
+        name.
+        """
+        compiled = re.compile(pattern)
+        with self._lock:
+            prefix = literal_prefix(pattern)
+            candidates = self.prefix(prefix) if prefix else self._names
+            return self._filter([name for name in candidates if compiled.search(name)], field)
+
+    def with_field(self, field):
+        """
+        Return the metrics that have field.
+        """
+        with self._lock:
+            return sorted(self._fields.get(field, ()))
+
+    def update(self, names):
+        """
+        Make the index hold exactly names, a dictionary of metric name to
+        its fields as returned by get_metric_names, touching only what
+        changed.  Returns the added and removed metric names.
+        """
+        with self._lock:
+            removed = [name for name in self._names if name not in names]
+            for name in removed:
+                self._remove(name)
+            added = []
+            for name, fields in names.items():
+                old = self._names.get(name)
+                if old is None:
+                    added.append(name)
+                    self._insert(name)
+                elif old == fields:
+                    continue
+                else:
+                    self._unindex(name, old)
+                self._names[name] = list(fields)
+                for field in fields:
+                    self._fields.setdefault(field, set()).add(name)
+            return sorted(added), sorted(removed)
+
+    def refresh(self):
+        """
+        Fetch the application's metric names and update the index.  This is
+        a rate limited get_metric_names call.
+        """
+        return self.update(self.client.get_metric_names(self.agent_id))
+
+    def start(self, interval=300, delay=False):
+        """
+        Refresh every interval seconds in a background thread, starting
+        straight away unless delay is set.  Failed refreshes are logged and
+        tried again at the next interval.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval, delay), name="pyrelic-catalog")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, interval, delay):
+        if delay:
+            self._stop.wait(interval)
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except (NewRelicApiException, requests.RequestException) as e:
+                logger.error("Refreshing the metric catalog of {0} failed: {1!r}".format(self.agent_id, e))
+            except Exception:
+                # Keep refreshing, whatever went wrong may not happen again
+                logger.exception("Refreshing the metric catalog of {0} failed".format(self.agent_id))
+            self._stop.wait(interval)
+
+    def _insert(self, name):
+        node = self._root
+        for segment in name.split(SEPARATOR):
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = _Node()
+            node = child
+        node.name = name
+
+    def _remove(self, name):
+        self._unindex(name, self._names.pop(name))
+        path = [self._root]
+        segments = name.split(SEPARATOR)
+        for segment in segments:
+            path.append(path[-1].children[segment])
+        path[-1].name = None
+        # Prune the branches nothing ends in anymore
+        for node, parent, segment in zip(reversed(path[1:]), reversed(path[:-1]), reversed(segments)):
+            if node.children or node.name is not None:
+                break
+            del parent.children[segment]
+
+    def _unindex(self, name, fields):
+        for field in fields:
+            names = self._fields.get(field)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self._fields[field]
+
+    def _collect(self, node, names):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.name is not None:
+                names.append(node.name)
+            stack.extend(node.children.values())
+
+    def _glob(self, node, segments, names):
+        if not segments:
+            if node.name is not None:
+                names.append(node.name)
+            return
+        segment, rest = segments[0], segments[1:]
+        if segment == '**':
+            # Match no segment at all, or one more and stay on '**'
+            self._glob(node, rest, names)
+            for child in node.children.values():
+                self._glob(child, segments, names)
+        elif not any(char in segment for char in '*?['):
+            child = node.children.get(segment)
+            if child is not None:
+                self._glob(child, rest, names)
+        else:
+            for name, child in node.children.items():
+                if fnmatch.fnmatchcase(name, segment):
+                    self._glob(child, rest, names)
+
+    def _filter(self, names, field):
+        if field is not None:
+            with_field = self._fields.get(field, ())
+            names = [name for name in names if name in with_field]
+        return sorted(names)
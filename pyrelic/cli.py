@@ -0,0 +1,109 @@
+"""
+The pyrelic command line tool.
+
+    pyrelic export --app 1234 --metric Database/all --field average_value \\
+        --begin 2012-03-01T00:00:00Z --end 2012-06-01T00:00:00Z --output march.parquet
+
+Credentials are read from --account-id and --api-key or the
+NEW_RELIC_ACCOUNT_ID and NEW_RELIC_API_KEY environment variables.
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+
+import requests
+
+from .client import Client
+from .exceptions import NewRelicApiException
+from .export import DEFAULT_CHUNK, COLUMNS, FORMATS, export_metric_data, guess_format, open_writer
+from .utils import to_epoch
+
+
+def _timestamp(value):
+    try:
+        to_epoch(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("{0!r} is not a timestamp like 2012-03-28T15:48:00Z".format(value))
+    return value
+
+
+def _listed(values):
+    """
+    Flatten options that may be repeated and/or comma separated.
+    """
+    return [item for value in values or () for item in value.split(',') if item]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='pyrelic', description="Work with the New Relic API")
+    parser.add_argument('--account-id', default=os.environ.get('NEW_RELIC_ACCOUNT_ID'))
+    parser.add_argument('--api-key', default=os.environ.get('NEW_RELIC_API_KEY'))
+    commands = parser.add_subparsers(dest='command')
+
+    export = commands.add_parser('export', help="stream metric data to CSV, JSON lines or Parquet")
+    export.add_argument('--app', action='append', required=True,
+                        help="application IDs or names, repeated or comma separated")
+    export.add_argument('--metric', action='append', required=True,
+                        help="metric names, repeated or comma separated")
+    export.add_argument('--field', action='append', required=True,
+                        help="metric fields, repeated or comma separated")
+    export.add_argument('--begin', type=_timestamp, required=True)
+    export.add_argument('--end', type=_timestamp, required=True)
+    export.add_argument('--output', '-o', default='-', help="file to write to, standard output by default")
+    export.add_argument('--format', choices=sorted(FORMATS),
+                        help="output format, guessed from the output file name (csv by default)")
+    export.add_argument('--chunk', type=int, default=DEFAULT_CHUNK,
+                        help="seconds of data per request (default %(default)s)")
+    export.add_argument('--shard-size', type=int, help="applications per request (default all)")
+    export.add_argument('--max-workers', type=int, default=4, help="concurrent requests (default %(default)s)")
+    export.add_argument('--quiet', '-q', action='store_true', help="don't report progress")
+    return parser
+
+
+def export(args, stderr):
+    client = Client(account_id=args.account_id, api_key=args.api_key, max_workers=args.max_workers,
+                    timeout=30, wait_on_rate_limit=True)
+    fields = _listed(args.field)
+    writer, stream = open_writer(args.format or guess_format(args.output) or 'csv', args.output,
+                                 COLUMNS + tuple(fields))
+
+    def progress(done, total, rows):
+        stderr.write("\rExported {0}/{1} requests, {2} rows".format(done, total, rows))
+        if done == total:
+            stderr.write("\n")
+        stderr.flush()
+
+    try:
+        export_metric_data(client, _listed(args.app), _listed(args.metric), fields, args.begin, args.end, writer,
+                           chunk=args.chunk, shard_size=args.shard_size, max_workers=args.max_workers,
+                           progress=None if args.quiet else progress)
+    finally:
+        writer.close()
+        if stream is not None:
+            stream.close()
+
+
+def main(argv=None, stderr=None):
+    stderr = stderr or sys.stderr
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help(stderr)
+        return 2
+    if not args.account_id or not args.api_key:
+        parser.error("an account ID and API key are needed, pass --account-id and --api-key "
+                     "or set NEW_RELIC_ACCOUNT_ID and NEW_RELIC_API_KEY")
+    if to_epoch(args.begin) >= to_epoch(args.end):
+        parser.error("--begin must be before --end")
+    try:
+        export(args, stderr)
+    except (NewRelicApiException, requests.RequestException, ValueError, ImportError) as e:
+        print("pyrelic: {0}: {1}".format(type(e).__name__, e), file=stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
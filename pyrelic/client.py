@@ -1,33 +1,79 @@
-import datetime
+import itertools
+import json
+import os
 
-from xml.etree import ElementTree as etree
+import requests
 
 from .exceptions import (
-    NewRelicApiRateLimitException,
     NewRelicApiException,
     NewRelicCredentialException,
     NewRelicInvalidApiKeyException,
     NewRelicInvalidParameterException,
     NewRelicUnknownApplicationException
 )
-from .application import Application
 from .base_client import BaseClient
+from .catalog import MetricCatalog
+from .concurrency import bounded_map, chunks
+from .deletion import Deletion, DeletionReport
+from .frame import MetricFrame
 from .metric import Metric
-from .threshold import Threshold
-from .server import Server
+from .parsers import get_parser
+from .planner import chunk_seconds, name_partition_pattern, plan_windows, span_windows, split_partition, stitch
+from .rate_limit import RateLimiter, SharedRateLimiter
+from .utils import clock, from_epoch, to_epoch
+
+# What fails a single request of a bulk delete, without stopping the others
+BULK_DELETE_ERRORS = (NewRelicApiException, requests.RequestException)
 
 
 class Client(BaseClient):
     """
     A Client for interacting with New Relic resources
     """
-    def __init__(self, account_id=None, api_key=None, proxy=None, retries=3, retry_delay=1, timeout=1.000):
+    # The hosts serving the two halves of the API, they can be pointed
+    # elsewhere (a proxy or a stub server) per instance
+    api_endpoint = "https://api.newrelic.com"
+    rpm_endpoint = "https://rpm.newrelic.com"
+
+    def __init__(self, account_id=None, api_key=None, proxy=None, retries=3, retry_delay=1, timeout=1.000,
+                 session=None, pool_connections=10, pool_maxsize=10, max_idle_time=None, max_workers=4,
+                 rate_limiter=None, wait_on_rate_limit=False, cache=None, metric_store=None, coalescer=None,
+                 retry_policy=None, circuit_breaker=None, observers=None, parser=None):
         """
         Create a NewRelic REST API client
         Required Parameters: account_id, api_key
-        Optional Parameters: proxy, retries, retry_delay, timeout
+        Optional Parameters: proxy, retries, retry_delay, timeout, session,
+                             pool_connections, pool_maxsize, max_idle_time,
+                             max_workers, rate_limiter, wait_on_rate_limit,
+                             cache, metric_store, coalescer, retry_policy,
+                             circuit_breaker, observers, parser
+
+        A RateLimiter may be shared between Clients using the same account.
+        Passing rate_limiter='shared' uses a SharedRateLimiter so that every
+        process on this machine using the same account and API key shares
+        one budget.  With wait_on_rate_limit rate limited calls sleep until they are
+        allowed instead of raising NewRelicApiRateLimitException.
+
+        With a ResponseCache view_applications, view_servers,
+        get_metric_names and get_threshold_values are served from memory
+        while fresh; cached get_metric_names calls do not count against the
+        rate limit.
+
+        With a MetricStore get_metric_data only asks New Relic for the parts
+        of the requested time window it has not fetched before.
+
+        With a RequestCoalescer concurrent get_metric_data calls for the same
+        field and time window are merged into a single API call.
+
+        parser picks how responses are parsed: 'etree', 'lxml', 'sax' or a
+        parser instance, see pyrelic.parsers.  By default the fastest one
+        available is used.
         """
-        super(Client, self).__init__(proxy=proxy, retries=retries, retry_delay=retry_delay, timeout=timeout)
+        super(Client, self).__init__(proxy=proxy, retries=retries, retry_delay=retry_delay, timeout=timeout,
+                                     session=session, pool_connections=pool_connections,
+                                     pool_maxsize=pool_maxsize, max_idle_time=max_idle_time, cache=cache,
+                                     retry_policy=retry_policy, circuit_breaker=circuit_breaker,
+                                     observers=observers)
 
         if not account_id or not api_key:
             raise NewRelicCredentialException("""
@@ -39,21 +85,41 @@ client = pyrelic.Client(account_id='12345', api_key='1234567890abcdef123456789')
 
         self.account_id = account_id
         self.api_key = api_key
-        self.headers = {'x-api-key': api_key}
+        self.max_workers = max_workers
+        if rate_limiter is None:
+            rate_limiter = RateLimiter()
+        elif rate_limiter == 'shared':
+            rate_limiter = SharedRateLimiter(account_id, api_key)
+        self.rate_limiter = rate_limiter
+        self.wait_on_rate_limit = wait_on_rate_limit
+        self.metric_store = metric_store
+        self.coalescer = coalescer
+        # Metric data compresses very well, ask for it compressed whatever
+        # the session's defaults
+        self.headers = {'x-api-key': api_key, 'Accept-Encoding': 'gzip, deflate'}
+        self.parser = get_parser(parser)
         self._parser = self._parse_xml
 
     def _parse_xml(self, response):
         """
-        Run our XML parser (lxml in this case) over our response text.  Lxml
-        doesn't enjoy having xml/encoding information in the header so we strip
-        that out if necessary. We return a parsed XML object that can be
-        used by the calling API method and massaged into a more appropriate
-        format.
+        Run our XML parser over the response body.  We return a parsed XML
+        object that can be used by the calling API method and massaged into a
+        more appropriate format.
+        """
+        return self.parser.parse(response)
+
+    def _iterparse(self, response, tag):
+        """
+        Incrementally parse a streamed response with our parser, yielding
+        every element called tag as soon as it is complete.  Memory use does
+        not grow with the size of the response.  The response is closed when
+        we are done.
         """
-        if response.startswith('\n'):
-            response = response[1:]
-        tree = etree.fromstring(response)
-        return tree
+        try:
+            for element in self.parser.iterparse(_XmlStream(response.raw), tag):
+                yield element
+        finally:
+            response.close()
 
     def _handle_api_error(self, error):
         """
@@ -62,7 +128,7 @@ client = pyrelic.Client(account_id='12345', api_key='1234567890abcdef123456789')
         for the user to handle as they see fit.
         """
         status_code = error.response.status_code
-        message = error.message
+        message = getattr(error, 'message', None) or str(error)
 
         if 403 == status_code:
             raise NewRelicInvalidApiKeyException(message)
@@ -73,31 +139,19 @@ client = pyrelic.Client(account_id='12345', api_key='1234567890abcdef123456789')
         else:
             raise NewRelicApiException(message)
 
-    def _api_rate_limit_exceeded(self, api_call, window=60):
+    def _api_rate_limit_exceeded(self, endpoint, wait=None):
         """
-        We want to keep track of the last time we sent a request to the NewRelic
-        API, but only for certain operations. This method will dynamically add
-        an attribute to the Client class with a unix timestamp with the name of
-        the API api_call we make so that we can check it later.  We return the
-        amount of time until we can perform another API call so that appropriate
-        waiting can be implemented.
+        Some New Relic API calls are rate limited, so before making one we
+        take a token for it from our RateLimiter.  Depending on wait
+        (defaulting to wait_on_rate_limit) we either sleep until the call is
+        allowed or raise a NewRelicApiRateLimitException holding the number
+        of seconds to wait.
         """
-        current = datetime.datetime.now()
-        try:
-            previous = getattr(self, api_call.__name__ + "_window")
-            # Force the calling of our property so we can
-            # handle not having set it yet.
-            previous.__str__
-        except AttributeError:
-            now = datetime.datetime.now()
-            outside_window = datetime.timedelta(seconds=window+1)
-            previous = now - outside_window
-
-        if current - previous > datetime.timedelta(seconds=window):
-            setattr(self, api_call.__name__ + "_window", current)
-        else:
-            timeout = window - (current - previous).seconds
-            raise NewRelicApiRateLimitException(str(timeout))
+        if wait is None:
+            wait = self.wait_on_rate_limit
+        start = clock()
+        self.rate_limiter.acquire(endpoint, wait=wait)
+        self._observe_rate_limit(endpoint, clock() - start)
 
     def view_applications(self):
         """
@@ -107,17 +161,12 @@ client = pyrelic.Client(account_id='12345', api_key='1234567890abcdef123456789')
         Errors: 403 Invalid API Key
         Method: Get
         """
-        endpoint = "https://rpm.newrelic.com"
-        uri = "{endpoint}/accounts/{id}/applications.xml".format(endpoint=endpoint, id=self.account_id)
-        response = self._make_get_request(uri)
-        applications = []
+        return self._make_get_request(self._view_applications_uri(), endpoint='view_applications',
+                                      parser=self.parser.applications)
 
-        for application in response.findall('.//application'):
-            application_properties = {}
-            for field in application:
-                application_properties[field.tag] = field.text
-            applications.append(Application(application_properties))
-        return applications
+    def _view_applications_uri(self):
+        endpoint = self.rpm_endpoint
+        return "{endpoint}/accounts/{id}/applications.xml".format(endpoint=endpoint, id=self.account_id)
 
     def delete_applications(self, applications):
         """
@@ -128,24 +177,86 @@ client = pyrelic.Client(account_id='12345', api_key='1234567890abcdef123456789')
         Errors: None Explicit, failed deletions will be in XML
         Method: Post
         """
-        endpoint = "https://api.newrelic.com"
-        uri = "{endpoint}/api/v1/accounts/{account_id}/applications/delete.xml"\
-              .format(endpoint=endpoint, account_id=self.account_id)
-        payload = applications
-        response = self._make_post_request(uri, payload)
-        failed_deletions = {}
+        return self._make_post_request(self._delete_applications_uri(), applications,
+                                       endpoint='delete_applications', parser=self.parser.application_deletions)
+
+    def _delete_applications_uri(self):
+        endpoint = self.api_endpoint
+        return "{endpoint}/api/v1/accounts/{account_id}/applications/delete.xml"\
+               .format(endpoint=endpoint, account_id=self.account_id)
+
+    def bulk_delete_applications(self, applications, batch_size=100, max_workers=None, rate_limited=False):
+        """
+        Requires: account ID, list of application IDs (or names)
+        Returns: a DeletionReport with a Deletion for every application
+        Endpoint: api.newrelic.com
+        Errors: None, failed requests are reported against their applications
+        Method: Post
 
-        for application in response.findall('.//application'):
-            if not 'deleted' in application.findall('.//result')[0].text:
-                failed_deletions['app_id'] = application.get('id')
+        Applications are deleted batch_size at a time, with up to
+        max_workers requests in flight (defaults to the Client max_workers).
+        With rate_limited every request first takes a token for
+        delete_applications from our RateLimiter, waiting for one if need
+        be, so give it a limit of its own: RateLimiter(limits=...).
+        """
+        def delete(batch):
+            parameter, items = batch
+            key = 'id' if parameter == 'app_id' else 'name'
+            try:
+                if rate_limited:
+                    self._api_rate_limit_exceeded('delete_applications', wait=True)
+                results = self._make_post_request(self._delete_applications_uri(),
+                                                  self._bulk_applications_payload(parameter, items),
+                                                  endpoint='delete_applications',
+                                                  parser=self.parser.application_results)
+            except BULK_DELETE_ERRORS as e:
+                return self._deletions(items, key, error=e)
+            return self._deletions(items, key, results)
+
+        batches = self._bulk_application_batches(applications, batch_size)
+        return self._deletion_report(bounded_map(delete, batches, max_workers or self.max_workers))
+
+    def _bulk_application_batches(self, applications, batch_size):
+        """
+        Split applications into batches of one delete request each.  IDs and
+        names go in different parameters so they are batched separately, and
+        every application keeps its position for the report.
+        """
+        groups = {}
+        for position, application in enumerate(applications):
+            groups.setdefault(self._application_parameter([application]), []).append((position, application))
+        return [(parameter, batch) for parameter in sorted(groups) for batch in chunks(groups[parameter], batch_size)]
 
-        return failed_deletions
+    def _bulk_applications_payload(self, parameter, batch):
+        if len(batch) > 1:
+            parameter = parameter + "[]"
+        return {parameter: [application for _, application in batch]}
 
-    def get_application_summary_metrics(self, application_ids):
+    def _deletions(self, batch, key, results=None, error=None):
+        """
+        Match the (position, item) pairs of a delete request up with New
+        Relic's results by their 'id' or 'name'.
+        """
+        by_key = dict((result[key], result) for result in results or [])
+        deletions = []
+        for position, item in batch:
+            result = by_key.get(str(item), {})
+            deletions.append((position, Deletion(item, name=result.get('name'), result=result.get('result'),
+                                                 error=error)))
+        return deletions
+
+    def _deletion_report(self, batches):
+        deletions = [deletion for batch in batches for deletion in batch]
+        deletions.sort(key=lambda deletion: deletion[0])
+        return DeletionReport(deletion for _, deletion in deletions)
+
+    def get_application_summary_metrics(self, application_ids=None, max_workers=None):
         """
         Requires: account ID
         Optional: list of application IDs,
                   excluding this will return all application metrics
+                  max_workers, the number of applications fetched
+                  concurrently (defaults to the Client max_workers)
         Restrictions: Rate limit to 1x per minute
         Endpoint: rpm.newrelic.com
         Errors: 403 Invalid API Key, 404 Unknown application
@@ -158,8 +269,29 @@ client = pyrelic.Client(account_id='12345', api_key='1234567890abcdef123456789')
                             metric_value,
                             formatted_metric_value,
                             threshold_value)
+
+        The summary metrics of an application are its threshold values, so
+        every application is one get_threshold_values request.  Each of
+        them takes a rate limit token of its own: the first is checked like
+        any other call, the others wait for theirs.
         """
-        raise NotImplemented
+        self._api_rate_limit_exceeded('get_application_summary_metrics')
+        if application_ids is None:
+            application_ids = [application.app_id for application in self.view_applications()]
+
+        def fetch(request):
+            index, application_id = request
+            if index:
+                self._api_rate_limit_exceeded('get_application_summary_metrics', wait=True)
+            return self.get_threshold_values(application_id)
+        summaries = bounded_map(fetch, enumerate(application_ids), max_workers or self.max_workers)
+        return self._summary_metrics(application_ids, summaries)
+
+    def _summary_metrics(self, application_ids, summaries):
+        return dict((app_id, [(threshold.name, threshold.begin_time, threshold.end_time, threshold.metric_value,
+                               threshold.formatted_metric_value, threshold.threshold_value)
+                              for threshold in thresholds])
+                    for app_id, thresholds in zip(application_ids, summaries))
 
     def get_dashboard_html_fragment(self):
         raise NotImplemented
@@ -175,10 +307,16 @@ client = pyrelic.Client(account_id='12345', api_key='1234567890abcdef123456789')
         :param user:
         :return: A dictionary containing all of the returned keys from the API
         """
+        deploy_event = self._deployment_payload(application_id, application_name, description,
+                                                revision, changelog, user)
+        return self._make_post_request(self._notify_deployment_uri(), deploy_event, endpoint='notify_deployment',
+                                       parser=self.parser.deployment)
 
-        endpoint = "https://rpm.newrelic.com"
-        uri = "{endpoint}/deployments.xml".format(endpoint=endpoint)
+    def _notify_deployment_uri(self):
+        endpoint = self.rpm_endpoint
+        return "{endpoint}/deployments.xml".format(endpoint=endpoint)
 
+    def _deployment_payload(self, application_id, application_name, description, revision, changelog, user):
         deploy_event = {}
 
         if not application_id is None:
@@ -200,13 +338,7 @@ client = pyrelic.Client(account_id='12345', api_key='1234567890abcdef123456789')
         if not user is None:
             deploy_event['deployment[user]'] = user
 
-        response = self._make_post_request(uri, deploy_event)
-        result = {}
-
-        for value in response:
-            result[value.tag] = value.text
-
-        return result
+        return deploy_event
 
     def get_metric_names(self, agent_id, re=None, limit=5000):
         """
@@ -220,34 +352,113 @@ client = pyrelic.Client(account_id='12345', api_key='1234567890abcdef123456789')
         Errors: 403 Invalid API Key, 422 Invalid Parameters
         Endpoint: api.newrelic.com
         """
-        # Make sure we play it slow
-        self._api_rate_limit_exceeded(self.get_metric_names)
-
         # Construct our GET request parameters into a nice dictionary
         parameters = {'re': re, 'limit': limit}
 
-        endpoint = "https://api.newrelic.com"
-        uri = "{endpoint}/api/v1/applications/{agent_id}/metrics.xml"\
-              .format(endpoint=endpoint, agent_id=agent_id)
-
         # A longer timeout is needed due to the amount of
-        # data that can be returned without a regex search
-        response = self._make_get_request(uri, parameters=parameters, timeout=max(self.timeout, 5.0))
-
-        # Parse the response. It seems clearer to return a dict of
-        # metrics/fields instead of a list of metric objects. It might be more
-        # consistent with the retrieval of metric data to make them objects but
-        # since the attributes in each type of metric object are different
-        # (and we aren't going to make heavyweight objects) we don't want to.
-        metrics = {}
-        for metric in response.findall('.//metric'):
-            fields = []
-            for field in metric.findall('.//field'):
-                fields.append(field.get('name'))
-            metrics[metric.get('name')] = fields
-        return metrics
-
-    def get_metric_data(self, applications, metrics, field, begin, end, summary=False):
+        # data that can be returned without a regex search.
+        # Make sure we play it slow, unless the answer is cached.
+        return self._make_get_request(self._metric_names_uri(agent_id), parameters=parameters,
+                                      timeout=max(self.timeout, 5.0),
+                                      endpoint='get_metric_names', rate_limited=True,
+                                      parser=self.parser.metric_names)
+
+    def _metric_names_uri(self, agent_id):
+        endpoint = self.api_endpoint
+        return "{endpoint}/api/v1/applications/{agent_id}/metrics.xml"\
+               .format(endpoint=endpoint, agent_id=agent_id)
+
+    def metric_catalog(self, agent_id, refresh_interval=None):
+        """
+        Return a MetricCatalog indexing the application's metric names, to
+        search them locally rather than with get_metric_names' re
+        parameter.  It is built with one (rate limited) get_metric_names
+        call and, given a refresh_interval in seconds, kept up to date in
+        the background.
+        """
+        catalog = MetricCatalog(self, agent_id)
+        catalog.refresh()
+        if refresh_interval:
+            catalog.start(refresh_interval, delay=True)
+        return catalog
+
+    def iter_metric_names(self, agent_id, re=None, limit=5000):
+        """
+        A streaming version of get_metric_names.  The response is parsed as
+        it is downloaded and (metric name, list of fields) tuples are yielded
+        one at a time instead of building a dictionary.
+        Restrictions: Rate limit to 1x per minute (checked when called)
+        """
+        self._api_rate_limit_exceeded('get_metric_names')
+        parameters = {'re': re, 'limit': limit}
+        response = self._make_streaming_get_request(self._metric_names_uri(agent_id), parameters=parameters,
+                                                    timeout=max(self.timeout, 5.0), endpoint='iter_metric_names')
+        return self._iter_metric_names(response)
+
+    def iter_all_metric_names(self, agent_id, limit=5000, checkpoint=None):
+        """
+        Yield (metric name, list of fields) tuples for every metric of an
+        application, however many it has.
+
+        A get_metric_names call returns at most limit metrics, so the names
+        are partitioned by prefix through the re parameter.  A partition
+        whose page comes back full is split on the next character of its
+        names and fetched again; only the pages of complete partitions are
+        yielded, so every name comes up once and memory use is bounded by
+        one page.  Each page waits for its get_metric_names rate limit
+        token.
+
+        With checkpoint, a file path, the partitions left to fetch are saved
+        after every page and an interrupted run picks up from there.  Names
+        of the page being yielded when it was interrupted are yielded again.
+        """
+        if limit < 2:
+            raise ValueError("limit must be at least 2 to partition metric names")
+        pending = self._load_name_checkpoint(checkpoint, agent_id) or [('', None)]
+        while pending:
+            prefix, excluded = pending[-1]
+            self._api_rate_limit_exceeded('get_metric_names', wait=True)
+            parameters = {'re': name_partition_pattern(prefix, excluded), 'limit': limit}
+            names = self._make_get_request(self._metric_names_uri(agent_id), parameters=parameters,
+                                           timeout=max(self.timeout, 5.0), endpoint='get_metric_names',
+                                           cached=False, parser=self.parser.metric_names)
+            pending.pop()
+            if len(names) >= limit:
+                pending.extend(reversed(split_partition(prefix, excluded, names)))
+            else:
+                for name in sorted(names):
+                    yield name, names[name]
+            self._save_name_checkpoint(checkpoint, agent_id, pending)
+
+    def _load_name_checkpoint(self, path, agent_id):
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path) as f:
+            state = json.load(f)
+        if state['agent_id'] != str(agent_id):
+            raise ValueError("{0} is a checkpoint for application {1}, not {2}".format(
+                path, state['agent_id'], agent_id))
+        return [tuple(partition) for partition in state['pending']]
+
+    def _save_name_checkpoint(self, path, agent_id, pending):
+        if path is None:
+            return
+        if not pending:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        # Write the whole file aside and rename it over the old one, so an
+        # interruption never leaves a truncated checkpoint
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'agent_id': str(agent_id), 'pending': pending}, f)
+        getattr(os, 'replace', os.rename)(path + '.tmp', path)
+
+    def _iter_metric_names(self, response):
+        for metric in self._iterparse(response, 'metric'):
+            yield metric.get('name'), [field.get('name') for field in metric.findall('.//field')]
+
+    def get_metric_data(self, applications, metrics, field, begin, end, summary=False,
+                        shard_size=None, max_workers=None, as_frame=False, chunk=None):
         """
         Requires: account ID,
                   list of application IDs,
@@ -255,6 +466,22 @@ client = pyrelic.Client(account_id='12345', api_key='1234567890abcdef123456789')
                   metric fields,
                   begin,
                   end
+        Optional: shard_size, split the applications into requests of at most
+                  this many applications which are fetched concurrently on up
+                  to max_workers threads (defaults to the Client max_workers).
+                  chunk, split the begin/end window into windows of at most
+                  chunk (seconds or a timedelta) fetched concurrently in the
+                  same way, then stitched back together in order without
+                  duplicate periods.
+                  Every request takes a rate limit token of its own: the
+                  first is checked like any other call, the others wait for
+                  theirs.
+                  as_frame, return a columnar MetricFrame (requires numpy)
+                  instead of a list of Metric objects.
+                  When the Client has a metric_store, only the sub-windows
+                  missing from the store are fetched (and no rate limit token
+                  is taken if nothing is missing).  Summaries are never
+                  stored.
         Method: Get
         Endpoint: api.newrelic.com
         Restrictions: Rate limit to 1x per minute
@@ -267,22 +494,149 @@ client = pyrelic.Client(account_id='12345', api_key='1234567890abcdef123456789')
         #       to query by common time frames based off the time period folding
         #       of the metrics returned by the New Relic API.
 
+        if max_workers is None:
+            max_workers = self.max_workers
+
+        if self.coalescer is None:
+            elements = self._get_metric_elements(applications, metrics, field, begin, end, summary,
+                                                 shard_size, max_workers, chunk)
+        else:
+            def fetch(merged_applications, merged_metrics):
+                return self._get_metric_elements(merged_applications, merged_metrics, field, begin, end, summary,
+                                                 shard_size, max_workers, chunk)
+            key = (self._application_parameter(applications),
+                   tuple(field) if isinstance(field, (list, tuple)) else field, begin, end, bool(summary))
+            elements = self.coalescer.submit(key, applications, metrics, fetch, self._app_attribute(applications))
+
+        if as_frame:
+            return MetricFrame.from_elements(elements)
+        return [Metric(element) for element in elements]
+
+    def _get_metric_elements(self, applications, metrics, field, begin, end, summary, shard_size, max_workers,
+                             chunk):
+        if self.metric_store is not None and not summary:
+            return self._get_stored_metric_elements(applications, metrics, field, begin, end, shard_size,
+                                                    max_workers, chunk)
+
         # Make sure we aren't going to hit an API timeout
-        self._api_rate_limit_exceeded(self.get_metric_data)
+        self._api_rate_limit_exceeded('get_metric_data')
+
+        shards = chunks(applications, shard_size)
+        windows = plan_windows(begin, end, chunk) if chunk and not summary else [(begin, end)]
+        if len(shards) == 1 and len(windows) == 1:
+            return self._fetch_metric_elements(applications, metrics, field, begin, end, summary)
+
+        def fetch(request):
+            index, (shard, (window_begin, window_end)) = request
+            # The token taken above pays for the first request only
+            if index:
+                self._api_rate_limit_exceeded('get_metric_data', wait=True)
+            return self._fetch_metric_elements(shard, metrics, field, window_begin, window_end, summary)
+
+        # Every shard is fetched one window at a time, the windows of a shard
+        # are stitched back together and the shards are merged back in the
+        # order of the applications we were passed.
+        fetched = bounded_map(fetch, enumerate([(shard, window) for shard in shards for window in windows]),
+                              max_workers)
+        app_attribute = self._app_attribute(applications)
+        elements = []
+        for shard in range(len(shards)):
+            shard_elements = fetched[shard * len(windows):(shard + 1) * len(windows)]
+            if len(windows) > 1:
+                elements.extend(stitch(shard_elements, app_attribute, applications))
+            else:
+                elements.extend(shard_elements[0])
+        return elements
+
+    def _fetch_metric_elements(self, applications, metrics, field, begin, end, summary):
+        parameters = self._metric_data_parameters(applications, metrics, field, begin, end, summary)
 
-        # Just in case the API needs parameters to be in order
-        parameters = {}
+        # A longer timeout is needed due to the
+        # amount of data that can be returned
+        return self._make_get_request(self._metric_data_uri(), parameters=parameters,
+                                      timeout=max(self.timeout, 5.0), endpoint='get_metric_data', cached=False,
+                                      parser=self.parser.metric_elements)
 
-        # Figure out what we were passed and set our parameter correctly
+    def _get_stored_metric_elements(self, applications, metrics, field, begin, end, shard_size, max_workers,
+                                    chunk=None):
+        """
+        Work out which (application, metric, field) windows are missing from
+        our metric store, fetch just those (at most shard_size applications
+        per request), then answer the whole request from the store.
+
+        New Relic picks the period length from the length of the window we
+        ask for, so every request spans exactly as long as the window we
+        were asked for (or the chunk, if given) and the answer only holds
+        periods of the length such a window gets.
+        """
+        store = self.metric_store
+        apps = [str(app) for app in applications]
+        fields = list(field) if isinstance(field, (list, tuple)) else [field]
+        begin, end = to_epoch(begin), to_epoch(end)
+        span = min(end - begin, chunk_seconds(chunk)) if chunk else end - begin
+        period = store.resolution(span)
+
+        # Group everything that is missing the same window into one request
+        gaps = {}
+        for app in apps:
+            for metric in metrics:
+                for name in fields:
+                    # Until we know the period length everything is missing
+                    missing = store.missing(app, metric, name, begin, end, period) if period else [(begin, end)]
+                    for gap in missing:
+                        for window in span_windows(gap[0], gap[1], span):
+                            gap_apps, gap_metrics = gaps.setdefault(window, ([], []))
+                            if app not in gap_apps:
+                                gap_apps.append(app)
+                            if metric not in gap_metrics:
+                                gap_metrics.append(metric)
+
+        if gaps:
+            self._api_rate_limit_exceeded('get_metric_data')
+            app_attribute = self._app_attribute(apps)
+
+            def fetch(request):
+                index, (gap, shard) = request
+                if index:
+                    self._api_rate_limit_exceeded('get_metric_data', wait=True)
+                gap_metrics = gaps[gap][1]
+                elements = self._fetch_metric_elements(shard, gap_metrics, field,
+                                                       from_epoch(gap[0]), from_epoch(gap[1]), False)
+                store.add(shard, gap_metrics, fields, gap[0], gap[1], elements,
+                          lambda element: element.get(app_attribute))
+            bounded_map(fetch, enumerate([(gap, shard) for gap in sorted(gaps)
+                                          for shard in chunks(gaps[gap][0], shard_size)]), max_workers)
+            period = store.resolution(span)
+
+        if period is None:
+            # New Relic had no data at all for a window this long
+            return []
+        return store.load(apps, metrics, fields, begin, end, period)
+
+    def _application_parameter(self, applications):
+        """
+        Figure out what we were passed and name our parameter correctly
+        """
         # TODO: allow querying by something other than an application name/id,
         # such as server id or agent id
         try:
             int(applications[0])
         except ValueError:
-            app_string = "app"
-        else:
-            app_string = "app_id"
+            return "app"
+        return "app_id"
+
+    def _app_attribute(self, applications):
+        """
+        Metric data names its application in the attribute matching how we
+        asked for it
+        """
+        return 'agent_id' if self._application_parameter(applications) == 'app_id' else 'app'
+
+    def _metric_data_parameters(self, applications, metrics, field, begin, end, summary):
+        # Just in case the API needs parameters to be in order
+        parameters = {}
 
+        app_string = self._application_parameter(applications)
         if len(applications) > 1:
             app_string = app_string + "[]"
 
@@ -293,21 +647,44 @@ client = pyrelic.Client(account_id='12345', api_key='1234567890abcdef123456789')
         parameters['begin'] = begin
         parameters['end'] = end
         parameters['summary'] = int(summary)
+        return parameters
 
-        endpoint = "https://api.newrelic.com"
-        uri = "{endpoint}/api/v1/accounts/{account_id}/metrics/data.xml"\
-              .format(endpoint=endpoint, account_id=self.account_id)
-        # A longer timeout is needed due to the
-        # amount of data that can be returned
-        response = self._make_get_request(uri, parameters=parameters, timeout=max(self.timeout, 5.0))
+    def _metric_data_uri(self):
+        endpoint = self.api_endpoint
+        return "{endpoint}/api/v1/accounts/{account_id}/metrics/data.xml"\
+               .format(endpoint=endpoint, account_id=self.account_id)
 
-        # Parsing our response into lightweight objects and creating a list.
-        # The dividing factor is the time period covered by the metric,
-        # there should be no overlaps in time.
-        metrics = []
-        for metric in response.findall('.//metric'):
-            metrics.append(Metric(metric))
-        return metrics
+    def iter_metric_data(self, applications, metrics, field, begin, end, summary=False, chunk=None):
+        """
+        A streaming version of get_metric_data.  The response is parsed as
+        it is downloaded and Metric objects are yielded as soon as each one
+        is complete instead of building a list.
+        Optional: chunk, split the begin/end window into windows of at most
+                  chunk (seconds or a timedelta) which are streamed one
+                  after the other, skipping periods repeated at the window
+                  boundaries.  Only one response is open at a time.
+        Restrictions: Rate limit to 1x per minute (checked when called)
+        """
+        self._api_rate_limit_exceeded('get_metric_data')
+        windows = plan_windows(begin, end, chunk) if chunk and not summary else [(begin, end)]
+
+        def stream(window):
+            parameters = self._metric_data_parameters(applications, metrics, field, window[0], window[1], summary)
+            return self._make_streaming_get_request(self._metric_data_uri(), parameters=parameters,
+                                                    timeout=max(self.timeout, 5.0), endpoint='iter_metric_data')
+        # Open the first response straight away so errors are raised here
+        first = stream(windows[0])
+        return self._iter_metric_data(itertools.chain([first], (stream(window) for window in windows[1:])))
+
+    def _iter_metric_data(self, responses):
+        last_end = {}
+        for response in responses:
+            for metric in self._iterparse(response, 'metric'):
+                series = (metric.get('agent_id'), metric.get('app'), metric.get('name'))
+                if series in last_end and to_epoch(metric.get('begin')) < last_end[series]:
+                    continue
+                last_end[series] = to_epoch(metric.get('end'))
+                yield Metric(metric)
 
     def get_threshold_values(self, application_id):
         """
@@ -320,19 +697,13 @@ client = pyrelic.Client(account_id='12345', api_key='1234567890abcdef123456789')
                  about its start/end time, metric name, metric value, and the
                  current threshold
         """
-        endpoint = "https://rpm.newrelic.com"
+        return self._make_get_request(self._threshold_values_uri(application_id), endpoint='get_threshold_values',
+                                      parser=self.parser.threshold_values)
+
+    def _threshold_values_uri(self, application_id):
+        endpoint = self.rpm_endpoint
         remote_file = "threshold_values.xml"
-        uri = "{endpoint}/accounts/{account_id}/applications/{app_id}/{xml}".format(endpoint=endpoint, account_id=self.account_id, app_id=application_id, xml=remote_file)
-        response = self._make_get_request(uri)
-        thresholds = []
-
-        for threshold_value in response.findall('.//threshold_value'):
-            properties = {}
-            # a little ugly, but the output works fine.
-            for tag, text in threshold_value.items():
-                properties[tag] = text
-            thresholds.append(Threshold(properties))
-        return thresholds
+        return "{endpoint}/accounts/{account_id}/applications/{app_id}/{xml}".format(endpoint=endpoint, account_id=self.account_id, app_id=application_id, xml=remote_file)
 
     def view_servers(self):
         """
@@ -342,17 +713,12 @@ client = pyrelic.Client(account_id='12345', api_key='1234567890abcdef123456789')
         Errors: 403 Invalid API Key
         Method: Get
         """
-        endpoint = "https://api.newrelic.com"
-        uri = "{endpoint}/api/v1/accounts/{id}/servers.xml".format(endpoint=endpoint, id=self.account_id)
-        response = self._make_get_request(uri)
-        servers = []
+        return self._make_get_request(self._view_servers_uri(), endpoint='view_servers',
+                                      parser=self.parser.servers)
 
-        for server in response.findall('.//server'):
-            server_properties = {}
-            for field in server:
-                server_properties[field.tag] = field.text
-            servers.append(Server(server_properties))
-        return servers
+    def _view_servers_uri(self):
+        endpoint = self.api_endpoint
+        return "{endpoint}/api/v1/accounts/{id}/servers.xml".format(endpoint=endpoint, id=self.account_id)
 
     def delete_servers(self, server_id):
         """
@@ -363,15 +729,59 @@ client = pyrelic.Client(account_id='12345', api_key='1234567890abcdef123456789')
         Errors: 403 Invalid API Key
         Method: Delete
         """
-        endpoint = "https://api.newrelic.com"
-        uri = "{endpoint}/api/v1/accounts/{account_id}/servers/{server_id}.xml".format(
+        return self._make_delete_request(self._delete_servers_uri(server_id), endpoint='delete_servers',
+                                         parser=self.parser.server_deletions)
+
+    def bulk_delete_servers(self, server_ids, max_workers=None, rate_limited=False):
+        """
+        Requires: account ID, list of server IDs
+        Returns: a DeletionReport with a Deletion for every server
+        Endpoint: api.newrelic.com
+        Errors: None, failed requests are reported against their servers
+        Method: Delete
+
+        The API deletes one server per request, so up to max_workers of them
+        (defaults to the Client max_workers) are deleted concurrently.
+        rate_limited works as for bulk_delete_applications, with tokens for
+        delete_servers.
+        """
+        def delete(item):
+            try:
+                if rate_limited:
+                    self._api_rate_limit_exceeded('delete_servers', wait=True)
+                results = self._make_delete_request(self._delete_servers_uri(item[1]), endpoint='delete_servers',
+                                                    parser=self.parser.server_results)
+            except BULK_DELETE_ERRORS as e:
+                return self._deletions([item], 'id', error=e)
+            return self._deletions([item], 'id', results)
+
+        return self._deletion_report(bounded_map(delete, list(enumerate(server_ids)),
+                                                 max_workers or self.max_workers))
+
+    def _delete_servers_uri(self, server_id):
+        endpoint = self.api_endpoint
+        return "{endpoint}/api/v1/accounts/{account_id}/servers/{server_id}.xml".format(
             endpoint=endpoint,
             account_id=self.account_id,
             server_id=server_id)
-        response = self._make_delete_request(uri)
-        failed_deletions = []
-        for server in response.findall('.//server'):
-            if not 'deleted' in server.findall('.//result')[0].text:
-                failed_deletions.append({'server_id': server.get('id')})
 
-        return failed_deletions
+
+class _XmlStream(object):
+    """
+    A file-like wrapper around a raw response that skips the whitespace New
+    Relic sends before the XML declaration, which iterparse would otherwise
+    reject.
+    """
+    def __init__(self, raw):
+        self.raw = raw
+        self.started = False
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        while not self.started and data:
+            data = data.lstrip()
+            if data:
+                self.started = True
+            else:
+                data = self.raw.read(size)
+        return data
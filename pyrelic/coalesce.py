@@ -0,0 +1,103 @@
+import sys
+import threading
+import time
+
+import six
+
+
+class _Batch(object):
+    """
+    The applications and metrics asked for by the callers waiting on one
+    merged request.
+    """
+    def __init__(self):
+        self.applications = []
+        self.metrics = []
+        self.elements = None
+        self.error = None
+        self.done = threading.Event()
+
+    def add(self, applications, metrics):
+        for application in applications:
+            if application not in self.applications:
+                self.applications.append(application)
+        for metric in metrics:
+            if metric not in self.metrics:
+                self.metrics.append(metric)
+
+    def grown(self, applications, metrics):
+        """
+        Return how many (applications, metrics) this batch would hold if
+        the given ones were added to it.
+        """
+        return (len(set(self.applications).union(applications)),
+                len(set(self.metrics).union(metrics)))
+
+
+class RequestCoalescer(object):
+    """
+    Merge get_metric_data calls made from different threads for the same
+    field, time window and summary flag into a single API call.
+
+    The first caller for a given request waits `window` seconds for others
+    to join it, then fetches the union of everyone's applications and
+    metrics while the rest wait.  Each caller gets back only the metrics it
+    asked for, and the whole batch uses a single rate limit token.  Errors
+    raised by the merged call are raised in every caller.
+
+    `max_applications` and `max_metrics` cap the size of a merged request
+    (its URL grows with every application and metric); once a batch is full
+    the next caller starts a new one.
+    """
+    def __init__(self, window=0.05, max_applications=None, max_metrics=None):
+        self.window = window
+        self.max_applications = max_applications
+        self.max_metrics = max_metrics
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _fits(self, batch, applications, metrics):
+        application_count, metric_count = batch.grown(applications, metrics)
+        if self.max_applications is not None and application_count > self.max_applications:
+            return False
+        if self.max_metrics is not None and metric_count > self.max_metrics:
+            return False
+        return True
+
+    def submit(self, key, applications, metrics, fetch, app_attribute):
+        """
+        Join (or start) the batch for key.  fetch(applications, metrics) is
+        called once per batch and must return the <metric> elements for
+        them; the elements whose app_attribute and name match our own
+        applications and metrics are returned.
+        """
+        applications = [str(application) for application in applications]
+        with self._lock:
+            batch = self._pending.get(key)
+            leader = batch is None or not self._fits(batch, applications, metrics)
+            if leader:
+                batch = self._pending[key] = _Batch()
+            batch.add(applications, metrics)
+
+        if leader:
+            time.sleep(self.window)
+            with self._lock:
+                # A full batch may already have been replaced by a new one
+                if self._pending.get(key) is batch:
+                    del self._pending[key]
+            try:
+                batch.elements = fetch(batch.applications, batch.metrics)
+            except Exception:
+                batch.error = sys.exc_info()
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            six.reraise(*batch.error)
+        if len(batch.applications) == len(set(applications)) and len(batch.metrics) == len(set(metrics)):
+            return batch.elements
+        wanted_applications, wanted_metrics = set(applications), set(metrics)
+        return [element for element in batch.elements
+                if element.get(app_attribute) in wanted_applications and element.get('name') in wanted_metrics]
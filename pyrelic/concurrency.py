@@ -0,0 +1,29 @@
+from multiprocessing.pool import ThreadPool
+
+
+def chunks(items, size):
+    """
+    Split a sequence into consecutive lists of at most size items.
+    """
+    items = list(items)
+    if not size or size < 1:
+        return [items]
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def bounded_map(func, items, max_workers):
+    """
+    Call func on every item using at most max_workers threads and return the
+    results in the same order as items.  The first exception raised by func
+    is re-raised in the calling thread.
+    """
+    items = list(items)
+    if max_workers is None or max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    pool = ThreadPool(min(max_workers, len(items)))
+    try:
+        return pool.map(func, items, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
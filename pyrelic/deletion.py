@@ -0,0 +1,47 @@
+from .record import Record
+
+
+class Deletion(Record):
+    """
+    The outcome of deleting one application or server in a bulk delete.
+    item is what we were asked to delete (an ID, or an application name),
+    name the name New Relic reported for it and result New Relic's own
+    result text.  result is None when the response did not mention the
+    item at all, and error holds the exception that failed the request it
+    was part of, if any.
+    """
+    __slots__ = ('item', 'name', 'deleted', 'result', 'error')
+
+    def __init__(self, item, name=None, result=None, error=None):
+        super(Deletion, self).__init__()
+        self.item = item
+        self.name = name
+        self.result = result
+        self.error = error
+        self.deleted = error is None and result is not None and 'deleted' in result
+
+
+class DeletionReport(object):
+    """
+    A Deletion for every item of a bulk delete, in the order they were
+    passed in.
+    """
+    def __init__(self, deletions):
+        self.deletions = list(deletions)
+
+    @property
+    def deleted(self):
+        return [deletion for deletion in self.deletions if deletion.deleted]
+
+    @property
+    def failed(self):
+        return [deletion for deletion in self.deletions if not deletion.deleted]
+
+    def __iter__(self):
+        return iter(self.deletions)
+
+    def __len__(self):
+        return len(self.deletions)
+
+    def __repr__(self):
+        return "<DeletionReport deleted={0} failed={1}>".format(len(self.deleted), len(self.failed))
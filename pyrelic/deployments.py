@@ -0,0 +1,247 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+import requests
+
+from .exceptions import (
+    NewRelicApiException,
+    NewRelicInvalidApiKeyException,
+    NewRelicInvalidParameterException,
+    NewRelicUnknownApplicationException
+)
+from .retry import RetryPolicy
+
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS deployments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    leased_until REAL NOT NULL DEFAULT 0,
+    dead INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS deployments_due ON deployments (dead, next_attempt);
+"""
+
+# Retrying these will not make them succeed
+PERMANENT_ERRORS = (NewRelicInvalidApiKeyException, NewRelicInvalidParameterException,
+                    NewRelicUnknownApplicationException)
+TRANSIENT_ERRORS = (NewRelicApiException, requests.RequestException)
+
+
+def describe(error):
+    """
+    Our exceptions don't keep their message, so name the exception too.
+    """
+    message = str(error)
+    return "{0}: {1}".format(type(error).__name__, message) if message else type(error).__name__
+
+
+class DeploymentQueue(object):
+    """
+    Sends deployment notifications in the background.
+
+    notify() takes the same arguments as Client.notify_deployment, writes
+    the event to an on-disk (SQLite, WAL mode) spool at path and returns
+    straight away.  max_workers threads send spooled events, retrying
+    failures according to retry_policy, by default with jittered backoff
+    for up to about an hour.
+
+    An event only leaves the spool once New Relic has accepted it, so
+    events left behind by a crash, or by a close() that timed out, are sent
+    by the next DeploymentQueue opened on the same spool: delivery is at
+    least once.  Workers lease the events they are sending for lease
+    seconds, which lets several processes share a spool.
+
+    Events New Relic rejects (bad parameters, unknown application, invalid
+    API key) or that run out of retries stay in the spool, see failed() and
+    retry_failed().
+    """
+    def __init__(self, client, path, max_workers=4, retry_policy=None, lease=300, poll_interval=1.0,
+                 start=True):
+        self.client = client
+        self.path = path
+        self.max_workers = max_workers
+        if retry_policy is None:
+            retry_policy = RetryPolicy(retries=15, backoff=5, max_delay=600, budget=False)
+        self.retry_policy = retry_policy
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._workers = []
+        self._stopped = False
+        if start:
+            self.start()
+
+    def start(self):
+        """
+        Start the worker threads, if they are not running yet.
+        """
+        if self._workers:
+            return
+        self._stopped = False
+        for number in range(self.max_workers):
+            worker = threading.Thread(target=self._work, name="pyrelic-deployments-{0}".format(number))
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def notify(self, application_id=None, application_name=None, description=None, revision=None, changelog=None,
+               user=None):
+        """
+        Spool a deployment notification and return its id.  Missing
+        parameters raise NewRelicInvalidParameterException here rather than
+        in the background.
+        """
+        payload = self.client._deployment_payload(application_id, application_name, description, revision,
+                                                  changelog, user)
+        with self._lock:
+            with self._db:
+                event_id = self._db.execute("INSERT INTO deployments (payload) VALUES (?)",
+                                            (json.dumps(payload, sort_keys=True),)).lastrowid
+        with self._condition:
+            self._condition.notify()
+        return event_id
+
+    def pending(self):
+        """
+        Return the number of events still to be sent.
+        """
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM deployments WHERE dead = 0").fetchone()[0]
+
+    def failed(self):
+        """
+        Return (id, payload, error) for every event we gave up on.
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT id, payload, error FROM deployments WHERE dead = 1 ORDER BY id")\
+                .fetchall()
+        return [(event_id, json.loads(payload), error) for event_id, payload, error in rows]
+
+    def retry_failed(self):
+        """
+        Put the events we gave up on back in the queue.
+        """
+        with self._lock:
+            with self._db:
+                self._db.execute("UPDATE deployments SET dead = 0, attempts = 0, next_attempt = 0 WHERE dead = 1")
+        with self._condition:
+            self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Wait until every spooled event has been sent (or given up on), for
+        at most timeout seconds.  Returns whether the queue was emptied.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._condition:
+            while self.pending():
+                remaining = self.poll_interval
+                if deadline is not None:
+                    remaining = min(remaining, deadline - time.time())
+                    if remaining <= 0:
+                        return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self, timeout=None):
+        """
+        Flush for at most timeout seconds, then stop the workers.  Events
+        that could not be sent in time stay in the spool for next time.
+        """
+        flushed = self.flush(timeout) if self._workers else not self.pending()
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        self._db.close()
+        return flushed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _work(self):
+        while not self._stopped:
+            try:
+                event = self._claim()
+                if event is not None:
+                    self._send(*event)
+            except Exception:
+                # Keep the worker alive whatever happens, the spool is only
+                # drained while workers run
+                logger.exception("Deployment queue worker failed")
+                event = None
+            if event is None:
+                with self._condition:
+                    if not self._stopped:
+                        self._condition.wait(self.poll_interval)
+                continue
+            with self._condition:
+                self._condition.notify_all()
+
+    def _claim(self):
+        """
+        Lease the oldest event that is due, if any.  The lease is taken with
+        a conditional update so two processes never take the same event.
+        """
+        now = time.time()
+        with self._lock:
+            with self._db:
+                row = self._db.execute(
+                    "SELECT id, payload, attempts FROM deployments WHERE dead = 0 AND next_attempt <= ? "
+                    "AND leased_until <= ? ORDER BY id LIMIT 1", (now, now)).fetchone()
+                if row is None:
+                    return None
+                claimed = self._db.execute(
+                    "UPDATE deployments SET leased_until = ? WHERE id = ? AND leased_until <= ?",
+                    (now + self.lease, row[0], now)).rowcount
+        return row if claimed else None
+
+    def _send(self, event_id, payload, attempts):
+        client = self.client
+        try:
+            client._make_post_request(client._notify_deployment_uri(), json.loads(payload),
+                                      endpoint='notify_deployment', parser=client.parser.deployment)
+        except PERMANENT_ERRORS as e:
+            logger.error("Deployment notification {0} rejected: {1}".format(event_id, describe(e)))
+            self._update("UPDATE deployments SET dead = 1, leased_until = 0, error = ? WHERE id = ?",
+                         (describe(e), event_id))
+        except Exception as e:
+            # Anything unexpected, like an HTML maintenance page we cannot
+            # parse, is retried as if it were transient
+            if not isinstance(e, TRANSIENT_ERRORS):
+                logger.exception("Unexpected error sending deployment notification {0}".format(event_id))
+            attempts += 1
+            delay = self.retry_policy.delay(attempts)
+            if delay is None:
+                logger.error("Giving up on deployment notification {0}: {1}".format(event_id, describe(e)))
+                self._update("UPDATE deployments SET dead = 1, attempts = ?, leased_until = 0, error = ? "
+                             "WHERE id = ?", (attempts, describe(e), event_id))
+                return
+            logger.error("Deployment notification {0} failed, retrying in {1:.2f} seconds".format(event_id, delay))
+            self._update("UPDATE deployments SET attempts = ?, next_attempt = ?, leased_until = 0, error = ? "
+                         "WHERE id = ?", (attempts, time.time() + delay, describe(e), event_id))
+        else:
+            self._update("DELETE FROM deployments WHERE id = ?", (event_id,))
+
+    def _update(self, statement, parameters):
+        with self._lock:
+            with self._db:
+                self._db.execute(statement, parameters)
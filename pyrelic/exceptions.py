@@ -27,3 +27,11 @@ class NewRelicApiRateLimitException(NewRelicApiException):
     def __init__(self, message):
         super(NewRelicApiRateLimitException, self).__init__(message)
         self.timeout = message
+
+
+class NewRelicApiCircuitOpenException(NewRelicApiException):
+    def __init__(self, message, host=None, retry_in=None):
+        super(NewRelicApiCircuitOpenException, self).__init__(message)
+        self.message = message
+        self.host = host
+        self.retry_in = retry_in
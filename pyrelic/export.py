@@ -0,0 +1,204 @@
+import csv
+import io
+import json
+import os
+import sys
+
+import six
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+from .concurrency import bounded_map, chunks
+from .planner import plan_windows
+from .utils import to_epoch
+
+
+# Every row starts with these, followed by one column per field
+COLUMNS = ('app', 'agent_id', 'name', 'begin', 'end')
+
+DEFAULT_CHUNK = 86400
+
+
+def _number(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return None
+
+
+class CsvWriter(object):
+    """
+    Writes rows to a text stream as CSV, starting with a header line.
+    Field values are written exactly as New Relic returned them, missing
+    ones as empty cells.
+    """
+    def __init__(self, stream, columns):
+        self.stream = stream
+        self.columns = tuple(columns)
+        self._writer = csv.writer(stream)
+        self._writer.writerow(self.columns)
+
+    def write(self, rows):
+        self._writer.writerows([['' if value is None else value for value in row] for row in rows])
+        self.stream.flush()
+
+    def close(self):
+        self.stream.flush()
+
+
+class JsonLinesWriter(object):
+    """
+    Writes rows to a text stream as one JSON object per line, field values
+    as numbers (null when missing).
+    """
+    def __init__(self, stream, columns):
+        self.stream = stream
+        self.columns = tuple(columns)
+        self._fields = len(COLUMNS)
+
+    def write(self, rows):
+        lines = []
+        for row in rows:
+            values = list(row[:self._fields]) + [_number(value) for value in row[self._fields:]]
+            lines.append(json.dumps(dict(zip(self.columns, values)), sort_keys=True))
+        if lines:
+            self.stream.write(six.text_type("\n".join(lines) + "\n"))
+        self.stream.flush()
+
+    def close(self):
+        self.stream.flush()
+
+
+class ParquetWriter(object):
+    """
+    Writes rows to a Parquet file (requires pyarrow), each write() call
+    becoming one row group.  Field values are stored as doubles.
+    """
+    def __init__(self, path, columns):
+        if pyarrow is None:
+            raise ImportError("ParquetWriter requires pyarrow, install it with `pip install pyrelic[parquet]`")
+        self.columns = tuple(columns)
+        types = [pyarrow.string()] * len(COLUMNS) + [pyarrow.float64()] * (len(self.columns) - len(COLUMNS))
+        self.schema = pyarrow.schema(list(zip(self.columns, types)))
+        self._writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        if not rows:
+            return
+        columns = []
+        for position, column in enumerate(self.columns):
+            values = [row[position] for row in rows]
+            if position >= len(COLUMNS):
+                values = [_number(value) for value in values]
+            columns.append(pyarrow.array(values, type=self.schema.field(column).type))
+        self._writer.write_table(pyarrow.Table.from_arrays(columns, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+FORMATS = {
+    'csv': CsvWriter,
+    'jsonl': JsonLinesWriter,
+    'parquet': ParquetWriter,
+}
+
+EXTENSIONS = {
+    '.csv': 'csv',
+    '.json': 'jsonl',
+    '.jsonl': 'jsonl',
+    '.parquet': 'parquet',
+}
+
+
+def guess_format(path):
+    """
+    Return the export format matching a file name's extension, None if
+    there is none.
+    """
+    return EXTENSIONS.get(os.path.splitext(path or '')[1].lower())
+
+
+def open_writer(format, path, columns):
+    """
+    Open a writer for format (one of FORMATS) on path, '-' or None meaning
+    standard output for the text formats.  Returns the writer and the file
+    to close once done, None for standard output.
+    """
+    if format not in FORMATS:
+        raise ValueError("Unknown export format {0!r}, use one of {1}".format(format, ", ".join(sorted(FORMATS))))
+    if format == 'parquet':
+        if path in (None, '-'):
+            raise ValueError("Parquet exports need an output file")
+        return ParquetWriter(path, columns), None
+    if path in (None, '-'):
+        return FORMATS[format](sys.stdout, columns), None
+    if six.PY2:
+        stream = open(path, 'wb') if format == 'csv' else io.open(path, 'w', encoding='utf-8')
+    else:
+        stream = io.open(path, 'w', encoding='utf-8', newline='')
+    try:
+        return FORMATS[format](stream, columns), stream
+    except Exception:
+        stream.close()
+        raise
+
+
+def export_metric_data(client, applications, metrics, fields, begin, end, writer, chunk=DEFAULT_CHUNK,
+                       shard_size=None, max_workers=None, progress=None):
+    """
+    Fetch metric data for a long window and many applications and hand it
+    to writer (see FORMATS) as it arrives instead of building one list.
+
+    The window is split into chunks of at most chunk seconds (or a
+    timedelta) and the applications into shards of at most shard_size.
+    Requests are fetched max_workers at a time (defaults to the Client
+    max_workers), window after window, and the rows of each batch are
+    written in one write() call, so at most one batch of responses is held
+    in memory.  Periods repeated at window boundaries are only written
+    once.  Every request takes a rate limit token of its own: the first is
+    checked like any other call, the others wait for theirs.
+
+    progress, when given, is called after every batch with the number of
+    requests done, the total number of requests and the rows written so
+    far.  Returns the number of rows written.
+    """
+    if max_workers is None:
+        max_workers = client.max_workers
+    fields = list(fields) if isinstance(fields, (list, tuple)) else [fields]
+
+    client._api_rate_limit_exceeded('get_metric_data')
+
+    windows = plan_windows(begin, end, chunk) if chunk else [(begin, end)]
+    requests = [(window, shard) for window in windows for shard in chunks(applications, shard_size)]
+
+    def fetch(request):
+        index, ((window_begin, window_end), shard) = request
+        if index:
+            client._api_rate_limit_exceeded('get_metric_data', wait=True)
+        return client._fetch_metric_elements(shard, metrics, fields, window_begin, window_end, False)
+
+    last_end = {}
+    done = rows_written = 0
+    for batch in chunks(enumerate(requests), max(1, max_workers or 1)):
+        rows = []
+        for elements in bounded_map(fetch, batch, max_workers):
+            for element in elements:
+                series = (element.get('agent_id'), element.get('app'), element.get('name'))
+                period_begin = to_epoch(element.get('begin'))
+                if period_begin < last_end.get(series, period_begin):
+                    continue
+                last_end[series] = to_epoch(element.get('end'))
+                values = dict((field.get('name'), field.text) for field in element.findall('.//field'))
+                rows.append(tuple(element.get(column) for column in COLUMNS) +
+                            tuple(values.get(field) for field in fields))
+        writer.write(rows)
+        done += len(batch)
+        rows_written += len(rows)
+        if progress is not None:
+            progress(done, len(requests), rows_written)
+    return rows_written
@@ -0,0 +1,166 @@
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+from .utils import intern_string, to_epoch
+
+
+AGGREGATIONS = ('sum', 'mean', 'min', 'max', 'count')
+
+
+class MetricFrame(object):
+    """
+    A columnar container for the data returned from a "get_metric_data"
+    call.  Instead of one Metric object per time period we keep parallel
+    NumPy arrays:
+
+        app_id: the agent_id of each row (int64 when every id is numeric)
+        name:   the metric name of each row (interned strings)
+        begin:  the start of each period in seconds since the epoch (int64)
+        end:    the end of each period in seconds since the epoch (int64)
+        fields: a dictionary of field name to float64 values (NaN if missing)
+    """
+    def __init__(self, app_id, name, begin, end, fields):
+        if np is None:
+            raise ImportError("MetricFrame requires numpy, install it with `pip install pyrelic[frame]`")
+        self.app_id = np.asarray(app_id)
+        self.name = np.asarray(name, dtype=object)
+        self.begin = np.asarray(begin, dtype=np.int64)
+        self.end = np.asarray(end, dtype=np.int64)
+        self.fields = dict((k, np.asarray(v, dtype=np.float64)) for k, v in fields.items())
+
+    @classmethod
+    def from_elements(cls, elements):
+        """
+        Build a frame straight from the <metric> elements of a response
+        without creating intermediate Metric objects.
+        """
+        app_ids, names, begins, ends = [], [], [], []
+        fields = {}
+        for row, metric in enumerate(elements):
+            app_ids.append(metric.get('agent_id'))
+            names.append(intern_string(metric.get('name')))
+            begins.append(to_epoch(metric.get('begin')))
+            ends.append(to_epoch(metric.get('end')))
+            for field in metric.findall('.//field'):
+                values = fields.get(field.get('name'))
+                if values is None:
+                    values = fields[intern_string(field.get('name'))] = [float('nan')] * row
+                values.append(float(field.text) if field.text else float('nan'))
+            for values in fields.values():
+                if len(values) == row:
+                    values.append(float('nan'))
+        return cls(_app_id_array(app_ids), names, begins, ends, fields)
+
+    @classmethod
+    def concat(cls, frames):
+        """
+        Stack several frames on top of each other, in order.
+        """
+        frames = list(frames)
+        if not frames:
+            return cls([], [], [], [], {})
+        rows = [len(frame) for frame in frames]
+        names = set()
+        for frame in frames:
+            names.update(frame.fields)
+        fields = {}
+        for field in names:
+            fields[field] = np.concatenate([
+                frame.fields[field] if field in frame.fields else np.full(count, np.nan)
+                for frame, count in zip(frames, rows)])
+        return cls(_app_id_array(np.concatenate([frame.app_id for frame in frames])),
+                   np.concatenate([frame.name for frame in frames]),
+                   np.concatenate([frame.begin for frame in frames]),
+                   np.concatenate([frame.end for frame in frames]),
+                   fields)
+
+    def __len__(self):
+        return len(self.begin)
+
+    def __getitem__(self, field):
+        return self.fields[field]
+
+    def take(self, rows):
+        """
+        Return a new frame with only the given rows (a boolean mask or an
+        array of indices).
+        """
+        return MetricFrame(self.app_id[rows], self.name[rows], self.begin[rows], self.end[rows],
+                           dict((k, v[rows]) for k, v in self.fields.items()))
+
+    def filter(self, mask=None, name=None, app_id=None, begin=None, end=None):
+        """
+        Return the rows matching every given condition.  name and app_id
+        may be a single value or a list of values, begin and end limit the
+        periods to those starting at or after begin and ending at or before
+        end.
+        """
+        rows = np.ones(len(self), dtype=bool)
+        if mask is not None:
+            rows &= np.asarray(mask, dtype=bool)
+        if name is not None:
+            rows &= np.isin(self.name, _as_list(name))
+        if app_id is not None:
+            rows &= np.isin(self.app_id, np.asarray(_as_list(app_id), dtype=self.app_id.dtype))
+        if begin is not None:
+            rows &= self.begin >= to_epoch(begin)
+        if end is not None:
+            rows &= self.end <= to_epoch(end)
+        return self.take(rows)
+
+    def aggregate(self, field, how='sum', by=None):
+        """
+        Aggregate a field with one of sum, mean, min, max or count.  NaN
+        values are ignored.  Without by a single number is returned,
+        otherwise by names a column ('app_id', 'name', 'begin' or 'end') and
+        a tuple of (unique keys, aggregated values) arrays is returned.
+        """
+        if how not in AGGREGATIONS:
+            raise ValueError("how must be one of {0}".format(', '.join(AGGREGATIONS)))
+        values = self.fields[field]
+        present = ~np.isnan(values)
+        if by is None:
+            keys, groups = np.zeros(1), np.zeros(len(self), dtype=np.intp)
+        else:
+            keys, groups = np.unique(getattr(self, by), return_inverse=True)
+        groups, values = groups[present], values[present]
+
+        counts = np.bincount(groups, minlength=len(keys)).astype(np.float64)
+        if how == 'count':
+            result = counts
+        elif how in ('sum', 'mean'):
+            result = np.bincount(groups, weights=values, minlength=len(keys))
+            if how == 'mean':
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    result = result / counts
+        else:
+            result = np.full(len(keys), np.inf if how == 'min' else -np.inf)
+            (np.minimum if how == 'min' else np.maximum).at(result, groups, values)
+            result[counts == 0] = np.nan
+
+        if by is None:
+            return result[0]
+        return keys, result
+
+    def groupby(self, by, field, how='sum'):
+        """
+        Aggregate a field per distinct value of a column, returning a
+        dictionary of key to aggregated value.
+        """
+        keys, values = self.aggregate(field, how=how, by=by)
+        return dict(zip(keys.tolist(), values.tolist()))
+
+
+def _as_list(value):
+    if isinstance(value, (list, tuple, set)) or (np is not None and isinstance(value, np.ndarray)):
+        return list(value)
+    return [value]
+
+
+def _app_id_array(app_ids):
+    try:
+        return np.asarray(app_ids, dtype=np.int64)
+    except (TypeError, ValueError):
+        return np.asarray(app_ids, dtype=object)
@@ -1,15 +1,79 @@
-class Metric(object):
+from .record import Record
+from .utils import intern_string
+
+
+# Metrics from one response nearly always share the same attribute and field
+# names, so each distinct tuple of names maps to one shared index dictionary.
+_INDEXES = {}
+
+
+def _index_for(names):
+    index = _INDEXES.get(names)
+    if index is None:
+        index = dict((name, position) for position, name in enumerate(names))
+        index = _INDEXES.setdefault(names, index)
+    return index
+
+
+class Metric(Record):
     """
     An object to contain the data for one time period in a "get_metric_data"
     call. The properties are dynamic and based off the field names in the XML
     response
+
+    The values are kept in a tuple and looked up through an index shared by
+    every Metric with the same properties, so a Metric costs no more than
+    two slots and a tuple.
     """
+    __slots__ = ('_index', '_values')
+
     def __init__(self, metric):
         super(Metric, self).__init__()
+        names = []
+        values = []
         for k, v in metric.items():
-            setattr(self, k, v)
+            names.append(intern_string(k))
+            # Attributes like app, name, begin and end repeat across periods
+            values.append(intern_string(v))
         for field in metric.findall('.//field'):
             # Each field has a 'name=metric_type' section.
             # We want to have this accessible in the object by calling the
             # metric_type property of the object directly
-            setattr(self, field.attrib['name'], field.text)
+            names.append(intern_string(field.attrib['name']))
+            values.append(field.text)
+        object.__setattr__(self, '_index', _index_for(tuple(names)))
+        object.__setattr__(self, '_values', tuple(values))
+
+    def __getattr__(self, name):
+        if name in Metric.__slots__:
+            raise AttributeError(name)
+        try:
+            return self._values[self._index[name]]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        items = self.items()
+        if name in self._index:
+            items = [(k, value if k == name else v) for k, v in items]
+        else:
+            items.append((intern_string(name), value))
+        object.__setattr__(self, '_index', _index_for(tuple(k for k, v in items)))
+        object.__setattr__(self, '_values', tuple(v for k, v in items))
+
+    @property
+    def __dict__(self):
+        """
+        A copy of our properties, so vars(metric) still lists them.
+        Changing it doesn't change the Metric.
+        """
+        return dict(self.items())
+
+    def __dir__(self):
+        return sorted(set(dir(type(self))) | set(self._index))
+
+    def items(self):
+        """
+        Return (name, value) pairs for every property of this Metric.
+        """
+        return [(name, self._values[position]) for name, position in sorted(self._index.items(), key=lambda item: item[1])]
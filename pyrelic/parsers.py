@@ -0,0 +1,373 @@
+from xml.etree import ElementTree
+from xml.parsers import expat
+
+import six
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # pragma: no cover
+    lxml_etree = None
+
+try:
+    # ElementTree is backed by this C accelerator on Python 3 (but not on
+    # Python 2 or PyPy, where it is pure Python)
+    import _elementtree  # noqa
+    ACCELERATED_ETREE = True
+except ImportError:  # pragma: no cover
+    ACCELERATED_ETREE = False
+
+from .application import Application
+from .metric import Metric
+from .server import Server
+from .threshold import Threshold
+
+
+READ_SIZE = 64 * 1024
+
+
+def _strip(data):
+    """
+    New Relic sends whitespace before the XML declaration, which no parser
+    accepts.  Response bodies are bytes: rather than copying them without
+    the whitespace we hand the parsers a memoryview starting after it.
+    """
+    if isinstance(data, six.text_type):
+        return data.lstrip()
+    start = 0
+    while data[start:start + 1].isspace():
+        start += 1
+    if not start:
+        return data
+    # Python 2's parsers don't accept buffers
+    return data[start:] if six.PY2 else memoryview(data)[start:]
+
+
+def _bytes(data):
+    """
+    The body without leading whitespace, encoding text to UTF-8 for parsers
+    that only take bytes.
+    """
+    data = _strip(data)
+    if isinstance(data, six.text_type):
+        return data.encode('utf-8')
+    return data
+
+
+class EtreeParser(object):
+    """
+    Turns New Relic responses into our records using the standard library's
+    ElementTree.  Responses are the raw bytes of the body, as sent, or text.
+    Every other parser implements the same methods:
+
+        parse(text): the response as an ElementTree element
+        applications(text), servers(text), threshold_values(text): lists of
+            Application, Server and Threshold records
+        application_deletions(text), server_deletions(text): the failed
+            deletions
+        application_results(text), server_results(text): a dictionary of
+            the id, name and result of every item of a delete response
+        deployment(text): a dictionary of the deployment's properties
+        metric_names(text): a dictionary of metric name to its field names
+        metric_elements(text): the <metric> elements of a metric data
+            response, as used by Metric, MetricFrame and MetricStore
+        metric_data(text): a list of Metric records
+        iterparse(stream, tag): yield the <tag> elements of a file-like
+            object as soon as each one is complete
+    """
+    name = 'etree'
+
+    def parse(self, text):
+        return ElementTree.fromstring(_strip(text))
+
+    def _select(self, tree, tag):
+        return tree.findall('.//' + tag)
+
+    def _children(self, element):
+        return dict((child.tag, child.text) for child in element)
+
+    def applications(self, text):
+        return [Application(self._children(application))
+                for application in self._select(self.parse(text), 'application')]
+
+    def application_deletions(self, text):
+        failed_deletions = {}
+        for application in self._select(self.parse(text), 'application'):
+            if 'deleted' not in application.findall('.//result')[0].text:
+                failed_deletions['app_id'] = application.get('id')
+        return failed_deletions
+
+    def deployment(self, text):
+        return self._children(self.parse(text))
+
+    def metric_names(self, text):
+        # It seems clearer to return a dict of metrics/fields instead of a
+        # list of metric objects, since the fields of each metric differ.
+        metrics = {}
+        for metric in self._select(self.parse(text), 'metric'):
+            metrics[metric.get('name')] = [field.get('name') for field in metric.findall('.//field')]
+        return metrics
+
+    def metric_elements(self, text):
+        return self._select(self.parse(text), 'metric')
+
+    def metric_data(self, text):
+        return [Metric(metric) for metric in self.metric_elements(text)]
+
+    def threshold_values(self, text):
+        return [Threshold(dict(threshold_value.items()))
+                for threshold_value in self._select(self.parse(text), 'threshold_value')]
+
+    def servers(self, text):
+        return [Server(self._children(server)) for server in self._select(self.parse(text), 'server')]
+
+    def server_deletions(self, text):
+        failed_deletions = []
+        for server in self._select(self.parse(text), 'server'):
+            if 'deleted' not in server.findall('.//result')[0].text:
+                failed_deletions.append({'server_id': server.get('id')})
+        return failed_deletions
+
+    def _results(self, text, tag):
+        return [{'id': element.get('id'), 'name': element.get('name'), 'result': element.findtext('result')}
+                for element in self._select(self.parse(text), tag)]
+
+    def application_results(self, text):
+        return self._results(text, 'application')
+
+    def server_results(self, text):
+        return self._results(text, 'server')
+
+    def iterparse(self, stream, tag):
+        """
+        Elements are cleared from the tree once the caller has moved on, so
+        memory use does not grow with the size of the response.
+        """
+        root = None
+        for event, element in ElementTree.iterparse(stream, events=('start', 'end')):
+            if root is None:
+                root = element
+            elif event == 'end' and element.tag == tag:
+                yield element
+                root.clear()
+
+
+class LxmlParser(EtreeParser):
+    """
+    An EtreeParser using lxml, selecting elements with XPath expressions
+    compiled once up front.
+    """
+    name = 'lxml'
+    TAGS = ('application', 'metric', 'server', 'threshold_value')
+
+    def __init__(self):
+        if lxml_etree is None:
+            raise ImportError("LxmlParser requires lxml, install it with `pip install pyrelic[lxml]`")
+        self._xpaths = dict((tag, lxml_etree.XPath('//' + tag)) for tag in self.TAGS)
+
+    def parse(self, text):
+        # lxml refuses unicode strings holding an encoding declaration
+        return lxml_etree.fromstring(_bytes(text))
+
+    def _select(self, tree, tag):
+        return self._xpaths[tag](tree)
+
+    def _children(self, element):
+        return dict((child.tag, child.text) for child in element if isinstance(child.tag, six.string_types))
+
+    def iterparse(self, stream, tag):
+        for event, element in lxml_etree.iterparse(stream, events=('end',), tag=tag):
+            yield element
+            # Drop the element and everything before it
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+
+class SaxField(object):
+    """
+    A <field> of a SaxElement.
+    """
+    __slots__ = ('attrib', 'text')
+
+    def __init__(self, attrib):
+        self.attrib = attrib
+        self.text = None
+
+    def get(self, key, default=None):
+        return self.attrib.get(key, default)
+
+
+class SaxElement(object):
+    """
+    What SaxParser keeps of a record element: its attributes, the text of
+    its direct children and its <field> descendants.  It implements the
+    parts of the ElementTree API used on <metric> elements by Metric,
+    MetricFrame, MetricStore and the metric data planner.
+    """
+    __slots__ = ('tag', 'attrib', 'children', 'fields')
+
+    def __init__(self, tag, attrib):
+        self.tag = tag
+        self.attrib = attrib
+        self.children = {}
+        self.fields = []
+
+    def get(self, key, default=None):
+        return self.attrib.get(key, default)
+
+    def items(self):
+        return list(self.attrib.items())
+
+    def findall(self, path):
+        if path not in ('field', './/field'):
+            raise ValueError("SaxElement only supports finding fields, not {0!r}".format(path))
+        return self.fields
+
+
+class _Collector(object):
+    """
+    expat handlers building a SaxElement for every <tag> element.
+    """
+    def __init__(self, tag):
+        self.tag = tag
+        self.elements = []
+        self._element = None
+        self._depth = 0
+        self._child = None
+        self._field = None
+        self._text = []
+
+    def start(self, name, attributes):
+        # With ordered_attributes expat hands us [name, value, name, value...]
+        attrib = dict(zip(attributes[::2], attributes[1::2]))
+        if self._element is None:
+            if name == self.tag:
+                self._element = SaxElement(name, attrib)
+                self._depth = 0
+            return
+        self._depth += 1
+        if name == 'field':
+            self._field = SaxField(attrib)
+            self._text = []
+        elif self._depth == 1:
+            self._child = name
+            self._text = []
+
+    def end(self, name):
+        element = self._element
+        if element is None:
+            return
+        if self._depth == 0:
+            self.elements.append(element)
+            self._element = None
+            return
+        if self._field is not None and name == 'field':
+            self._field.text = "".join(self._text) or None
+            element.fields.append(self._field)
+            self._field = None
+        elif self._depth == 1 and self._child is not None:
+            element.children[self._child] = "".join(self._text) or None
+            self._child = None
+        self._depth -= 1
+
+    def data(self, text):
+        if self._field is not None or self._child is not None:
+            self._text.append(text)
+
+    def parser(self):
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.ordered_attributes = True
+        parser.StartElementHandler = self.start
+        parser.EndElementHandler = self.end
+        parser.CharacterDataHandler = self.data
+        return parser
+
+
+class SaxParser(EtreeParser):
+    """
+    An event driven parser on top of expat.  Records are built straight
+    from the parser's callbacks and no document tree is kept, so memory use
+    stays flat however large the response.  parse() still returns an
+    ElementTree element for generic use.
+    """
+    name = 'sax'
+
+    def _collect(self, text, tag):
+        collector = _Collector(tag)
+        collector.parser().Parse(_bytes(text), True)
+        return collector.elements
+
+    def applications(self, text):
+        return [Application(application.children) for application in self._collect(text, 'application')]
+
+    def application_deletions(self, text):
+        failed_deletions = {}
+        for application in self._collect(text, 'application'):
+            if 'deleted' not in (application.children.get('result') or ''):
+                failed_deletions['app_id'] = application.get('id')
+        return failed_deletions
+
+    def deployment(self, text):
+        return self._collect(text, 'deployment')[0].children
+
+    def metric_names(self, text):
+        return dict((metric.get('name'), [field.get('name') for field in metric.fields])
+                    for metric in self._collect(text, 'metric'))
+
+    def metric_elements(self, text):
+        return self._collect(text, 'metric')
+
+    def threshold_values(self, text):
+        return [Threshold(threshold_value.attrib) for threshold_value in self._collect(text, 'threshold_value')]
+
+    def servers(self, text):
+        return [Server(server.children) for server in self._collect(text, 'server')]
+
+    def server_deletions(self, text):
+        return [{'server_id': server.get('id')} for server in self._collect(text, 'server')
+                if 'deleted' not in (server.children.get('result') or '')]
+
+    def _results(self, text, tag):
+        return [{'id': element.get('id'), 'name': element.get('name'), 'result': element.children.get('result')}
+                for element in self._collect(text, tag)]
+
+    def iterparse(self, stream, tag):
+        collector = _Collector(tag)
+        parser = collector.parser()
+        while True:
+            data = stream.read(READ_SIZE)
+            parser.Parse(data, not data)
+            for element in collector.elements:
+                yield element
+            del collector.elements[:]
+            if not data:
+                return
+
+
+PARSERS = {
+    'etree': EtreeParser,
+    'lxml': LxmlParser,
+    'sax': SaxParser,
+}
+
+
+def get_parser(parser=None):
+    """
+    Return a parser instance given one, its name or None for the fastest one
+    available.  That is ElementTree when it is backed by its C accelerator:
+    lxml parses slightly faster, but reading attributes through its element
+    proxies more than makes up for it on large metric data responses (see
+    benchmarks/).  Without the accelerator lxml is used if it is installed,
+    then expat.
+    """
+    if parser is None:
+        if ACCELERATED_ETREE:
+            return EtreeParser()
+        return LxmlParser() if lxml_etree is not None else SaxParser()
+    if isinstance(parser, six.string_types):
+        try:
+            return PARSERS[parser]()
+        except KeyError:
+            raise ValueError("Unknown parser {0!r}, choose from {1}".format(parser, ", ".join(sorted(PARSERS))))
+    return parser
@@ -0,0 +1,100 @@
+import datetime
+import re
+
+from .utils import from_epoch, to_epoch
+
+
+def chunk_seconds(chunk):
+    """
+    Convert a chunk (seconds or a timedelta) into whole minutes of seconds,
+    since that is the finest period New Relic reports.
+    """
+    if isinstance(chunk, datetime.timedelta):
+        chunk = chunk.days * 86400 + chunk.seconds
+    return max(60, int(-(-chunk // 60) * 60))
+
+
+def plan_windows(begin, end, chunk):
+    """
+    Split the begin/end window into consecutive windows of at most chunk
+    (seconds or a timedelta).  Boundaries after the first fall on whole
+    multiples of the chunk size, itself rounded up to whole minutes since
+    that is the finest period New Relic reports.  Returns a list of
+    (begin, end) New Relic timestamps.
+    """
+    chunk = chunk_seconds(chunk)
+    begin, end = to_epoch(begin), to_epoch(end)
+
+    windows = []
+    cursor = begin
+    while cursor < end:
+        boundary = min(end, (cursor // chunk + 1) * chunk)
+        windows.append((from_epoch(cursor), from_epoch(boundary)))
+        cursor = boundary
+    return windows
+
+
+def span_windows(begin, end, span):
+    """
+    Cover the begin/end epoch window with windows of exactly span seconds,
+    the last one ending at end, so that New Relic answers each of them with
+    the period length it would use for a window of span seconds.  The first
+    window may start before begin.  Returns a list of (begin, end) epochs.
+    """
+    windows = []
+    cursor = end
+    while cursor > begin:
+        windows.append((cursor - span, cursor))
+        cursor -= span
+    return windows[::-1]
+
+
+def stitch(element_lists, app_attribute, applications=()):
+    """
+    Merge the <metric> elements fetched for consecutive windows into one
+    list ordered by application, metric name and period.  Applications
+    come in the order of applications, when given, any others after them.
+    Periods that were returned by two neighbouring windows, or that overlap
+    a period we already have for the same metric, are dropped.
+    """
+    positions = dict((str(app), position) for position, app in enumerate(applications))
+
+    def key(element):
+        app = element.get(app_attribute) or ''
+        return (positions.get(app, len(positions)), app, element.get('name') or '', to_epoch(element.get('begin')))
+
+    stitched = []
+    last_end = {}
+    # sorted() is stable, so periods keep the order of the windows they came from
+    for element in sorted((e for elements in element_lists for e in elements), key=key):
+        _, app, name, begin = key(element)
+        if begin < last_end.get((app, name), begin):
+            continue
+        last_end[(app, name)] = to_epoch(element.get('end'))
+        stitched.append(element)
+    return stitched
+
+
+def name_partition_pattern(prefix, excluded=None):
+    """
+    Return the re parameter selecting a partition of the metric names:
+    those starting with prefix or, when excluded is given, prefix itself
+    and the names whose next character is not in excluded.
+    """
+    pattern = '^' + re.escape(prefix)
+    if excluded:
+        pattern += '([^' + ''.join(re.escape(char) for char in excluded) + ']|$)'
+    return pattern
+
+
+def split_partition(prefix, excluded, names):
+    """
+    Split a partition whose page of names came back full.  Every next
+    character seen after prefix gets a partition of its own and what is
+    left (names continuing with a character we have not seen yet) stays in
+    a partition excluding them all.  Returns a list of (prefix, excluded)
+    partitions.
+    """
+    following = set(name[len(prefix)] for name in names if len(name) > len(prefix))
+    rest = "".join(sorted(set(excluded or '') | following))
+    return [(prefix + char, None) for char in sorted(following)] + [(prefix, rest)]
@@ -0,0 +1,178 @@
+import contextlib
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+from .exceptions import NewRelicApiRateLimitException
+from .utils import clock
+
+
+def refill(tokens, updated, now, rate, per, burst):
+    """
+    Top a bucket up with the tokens earned since it was last updated,
+    never holding more than burst tokens.
+    """
+    return min(float(burst), tokens + max(0, now - updated) * rate / per)
+
+
+class RateLimiter(object):
+    """
+    Thread-safe token buckets, one per API endpoint.
+
+    Every endpoint gets `rate` calls per `per` seconds and may save up to
+    `burst` of them.  Endpoints with different limits can be configured
+    through `limits`, a dictionary of endpoint name to (rate, per, burst).
+    The defaults match New Relic's limit of one call per minute.
+    """
+    def __init__(self, rate=1, per=60.0, burst=1, limits=None):
+        self.rate = rate
+        self.per = per
+        self.burst = burst
+        self.limits = limits or {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def limits_for(self, endpoint):
+        return self.limits.get(endpoint, (self.rate, self.per, self.burst))
+
+    def reserve(self, endpoint):
+        """
+        Try to take a token for endpoint.  Returns 0 when a token was taken,
+        otherwise the number of seconds until one will be available.
+        """
+        rate, per, burst = self.limits_for(endpoint)
+        with self._locked():
+            now = self._now()
+            tokens, updated = self._load(endpoint, burst, now)
+            tokens, delay = self._take(refill(tokens, updated, now, rate, per, burst), rate, per)
+            self._store(endpoint, tokens, now)
+        return delay
+
+    def _locked(self):
+        return self._lock
+
+    def _now(self):
+        return clock()
+
+    def _load(self, endpoint, burst, now):
+        return self._buckets.get(endpoint, (float(burst), now))
+
+    def _store(self, endpoint, tokens, now):
+        self._buckets[endpoint] = (tokens, now)
+
+    def _take(self, tokens, rate, per):
+        if tokens >= 1:
+            return tokens - 1, 0
+        return tokens, (1 - tokens) * per / rate
+
+    def acquire(self, endpoint, wait=False):
+        """
+        Take a token for endpoint.  If none is available we either sleep
+        until one is (wait=True) or raise a NewRelicApiRateLimitException
+        whose timeout is the number of seconds to wait.
+        """
+        while True:
+            delay = self.reserve(endpoint)
+            if not delay:
+                return
+            if not wait:
+                raise NewRelicApiRateLimitException(delay)
+            time.sleep(delay)
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    A RateLimiter whose buckets live in a memory mapped file so that every
+    process on this machine using the same account and API key shares one
+    budget.  Access is serialised with an flock on the file (POSIX only).
+
+    The file holds a fixed number of slots, each a SHA1 of the endpoint name
+    followed by the bucket's tokens and last update time (wall clock time,
+    since monotonic clocks are not comparable between processes).
+    """
+    SLOT = struct.Struct('<20sdd')
+    SLOTS = 64
+
+    def __init__(self, account_id, api_key, path=None, rate=1, per=60.0, burst=1, limits=None):
+        if fcntl is None:
+            raise ImportError("SharedRateLimiter requires fcntl, which is not available on this platform")
+        super(SharedRateLimiter, self).__init__(rate=rate, per=per, burst=burst, limits=limits)
+        if path is None:
+            key = hashlib.sha1("{0}:{1}".format(account_id, api_key).encode('utf-8')).hexdigest()
+            path = os.path.join(tempfile.gettempdir(), "pyrelic-ratelimit-{0}".format(key))
+        self.path = path
+        self._pid = None
+        self._file = None
+        self._map = None
+
+    def _open(self):
+        """
+        (Re)open the state file.  A forked child must not reuse its parent's
+        file description, since flock locks are shared through it.
+        """
+        if self._pid == os.getpid():
+            return
+        size = self.SLOT.size * self.SLOTS
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._file = os.fdopen(fd, 'r+b')
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._file.fileno()).st_size < size:
+                self._file.truncate(size)
+        finally:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._pid = os.getpid()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._lock:
+            self._open()
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def _now(self):
+        return time.time()
+
+    def _slot(self, endpoint):
+        """
+        Find the slot for endpoint, claiming an empty one if needed.
+        Returns (offset, existing) where existing tells if the slot was
+        already in use.
+        """
+        digest = hashlib.sha1(endpoint.encode('utf-8')).digest()
+        empty = None
+        for slot in range(self.SLOTS):
+            offset = slot * self.SLOT.size
+            key = self._map[offset:offset + 20]
+            if key == digest:
+                return offset, True
+            if empty is None and key == b'\0' * 20:
+                empty = offset
+        if empty is None:
+            raise ValueError("No free rate limit slots left in {0}".format(self.path))
+        self._map[empty:empty + 20] = digest
+        return empty, False
+
+    def _load(self, endpoint, burst, now):
+        offset, existing = self._slot(endpoint)
+        if not existing:
+            return float(burst), now
+        _, tokens, updated = self.SLOT.unpack_from(self._map, offset)
+        return tokens, updated
+
+    def _store(self, endpoint, tokens, now):
+        offset, _ = self._slot(endpoint)
+        self.SLOT.pack_into(self._map, offset, hashlib.sha1(endpoint.encode('utf-8')).digest(), tokens, now)
@@ -0,0 +1,27 @@
+class Record(object):
+    """
+    The base for our result objects.  Records use __slots__ rather than a
+    per-instance __dict__ and keep the values exactly as New Relic sent them
+    (strings), so nothing is converted unless it is asked for.
+    """
+    __slots__ = ()
+
+    def as_number(self, attribute):
+        """
+        Return an attribute converted to an int (or a float if it is not a
+        whole number).  Missing values are returned as None.
+        """
+        value = getattr(self, attribute)
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            return float(value)
+
+    def __getstate__(self):
+        return dict((slot, getattr(self, slot)) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            object.__setattr__(self, slot, value)
@@ -0,0 +1,121 @@
+import calendar
+import random
+import threading
+import time
+
+from email.utils import parsedate_tz
+
+
+def parse_retry_after(value):
+    """
+    Return the number of seconds a Retry-After header asks us to wait.  It
+    may hold a number of seconds or an HTTP date; None is returned for
+    anything we cannot parse.
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+    timestamp = calendar.timegm(parsed[:9]) - (parsed[9] or 0)
+    return max(0, timestamp - time.time())
+
+
+class RetryBudget(object):
+    """
+    Caps retries to a share of a client's traffic.
+
+    Every request deposits `ratio` of a token and every retry withdraws a
+    whole one, so over time at most `ratio` retries are made per request.
+    The balance starts at and never grows beyond `min_retries`, which lets
+    a quiet client still retry a few times while a client whose requests
+    are all failing quickly stops adding load.
+    """
+    def __init__(self, ratio=0.2, min_retries=10):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self._tokens = float(min_retries)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(float(self.min_retries), self._tokens + self.ratio)
+
+    def withdraw(self):
+        """
+        Take a token for a retry, returning False if the budget is spent.
+        """
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class RetryPolicy(object):
+    """
+    Decides whether and when a failed request is retried.
+
+    Connection errors are always retried.  Timeouts (when `retry_timeouts`
+    is set) and responses whose status is in `statuses` are only retried
+    for the HTTP methods in `methods`, GET by default: a POST that timed
+    out may well have been processed, and sending it again would, say,
+    record a deployment twice.  Add 'POST' or 'DELETE' to opt in.
+
+    Retry number n waits a
+    random time between 0 and min(max_delay, backoff * 2 ** (n - 1)) seconds
+    ("full jitter"), so clients that failed together do not retry together,
+    unless the response carried a Retry-After header, which is honoured as
+    long as it is not longer than `max_retry_after`.
+
+    A RetryBudget (one is created per policy by default, pass budget=False
+    to disable it) caps the share of retries in the overall traffic.
+    """
+    def __init__(self, retries=3, backoff=1, max_delay=30, statuses=(502, 503, 504), retry_timeouts=True,
+                 max_retry_after=120, budget=None, methods=('GET', 'HEAD', 'OPTIONS')):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.statuses = frozenset(statuses)
+        self.retry_timeouts = retry_timeouts
+        self.max_retry_after = max_retry_after
+        self.methods = frozenset(method.upper() for method in methods)
+        if budget is None:
+            budget = RetryBudget()
+        self.budget = budget or None
+
+    def request(self):
+        """
+        Called once for every request, before its first attempt.
+        """
+        if self.budget is not None:
+            self.budget.deposit()
+
+    def retry_method(self, method):
+        """
+        Whether timeouts and retry statuses of a request using method may be
+        retried.  None, an unknown method, is not filtered.
+        """
+        return method is None or method.upper() in self.methods
+
+    def retry_status(self, status, method=None):
+        return status in self.statuses and self.retry_method(method)
+
+    def delay(self, attempt, timeout=False, retry_after=None, method=None):
+        """
+        Return the number of seconds to wait before retry number attempt, or
+        None if we should give up.
+        """
+        if attempt > self.retries or (timeout and not (self.retry_timeouts and self.retry_method(method))):
+            return None
+        retry_after = parse_retry_after(retry_after)
+        if retry_after is not None and retry_after > self.max_retry_after:
+            return None
+        if self.budget is not None and not self.budget.withdraw():
+            return None
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.max_delay, self.backoff * 2 ** (attempt - 1)))
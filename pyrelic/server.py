@@ -1,8 +1,13 @@
-class Server(object):
+from .record import Record
+
+
+class Server(Record):
     """
     A simple dumb object for easily containing the data returned from a
     "view_servers" call
     """
+    __slots__ = ('overview_url', 'hostname', 'server_id')
+
     def __init__(self, properties):
         self.overview_url = properties['overview-url']
         self.hostname = properties['hostname']
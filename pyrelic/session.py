@@ -0,0 +1,51 @@
+import threading
+from time import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PooledSession(requests.Session):
+    """
+    A requests Session that keeps a pool of keep-alive connections per host.
+
+    A single PooledSession can be handed to several Clients so that they all
+    reuse the same sockets instead of paying for a new TCP + TLS handshake on
+    every API call.  Connections that have been idle for longer than
+    max_idle_time seconds are dropped before the next request so we never try
+    to reuse a socket the remote end has most likely already closed.
+    """
+    def __init__(self, pool_connections=10, pool_maxsize=10, max_idle_time=None):
+        super(PooledSession, self).__init__()
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_idle_time = max_idle_time
+        self._last_used = None
+        self._lock = threading.Lock()
+
+        # Retries are handled by BaseClient, so the adapter should never
+        # retry on its own.
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize,
+                              max_retries=0)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def _drop_idle_connections(self):
+        """
+        Close every pooled connection if the session has not been used for
+        longer than max_idle_time.  The adapters lazily open new connections
+        on the next request.
+        """
+        now = time()
+        with self._lock:
+            idle = self._last_used is not None and self.max_idle_time is not None \
+                and now - self._last_used > self.max_idle_time
+            self._last_used = now
+        if idle:
+            for adapter in self.adapters.values():
+                adapter.poolmanager.clear()
+
+    def request(self, method, url, *args, **kwargs):
+        self._drop_idle_connections()
+        return super(PooledSession, self).request(method, url, *args, **kwargs)
@@ -0,0 +1,204 @@
+import threading
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1024, 10240, 102400, 1048576, 10485760, 104857600)
+
+
+class RequestRecord(object):
+    """
+    What happened during one API request.  Times are in seconds: connect is
+    the time until the response headers arrived (so it includes the time
+    New Relic spent on the request), transfer the time spent reading the
+    body and parse the time spent in our parser.  latency is the wall time
+    of the whole call including retries and the delays between them.
+    """
+    __slots__ = ('endpoint', 'latency', 'connect', 'transfer', 'parse', 'bytes', 'retries', 'cache_hit',
+                 'status', 'error')
+
+    def __init__(self, endpoint=None):
+        self.endpoint = endpoint
+        self.latency = 0.0
+        self.connect = 0.0
+        self.transfer = 0.0
+        self.parse = 0.0
+        self.bytes = 0
+        self.retries = 0
+        self.cache_hit = False
+        self.status = None
+        self.error = None
+
+
+class Observer(object):
+    """
+    Receives a RequestRecord for every API call a client makes and the time
+    spent waiting on the rate limiter.  Made to be overridden, instances
+    are passed to the client through observers=[...].  Observers are called
+    from whichever thread made the request and must not raise.
+    """
+    def on_request(self, record):
+        pass
+
+    def on_rate_limit(self, endpoint, waited):
+        pass
+
+
+class Histogram(object):
+    """
+    A cumulative histogram with fixed bucket upper bounds, as used by
+    Prometheus.
+    """
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """
+        Estimate a quantile by interpolating within its bucket.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0
+        for index, count in enumerate(self.counts):
+            upper = self.buckets[index] if index < len(self.buckets) else self.max
+            if count and seen + count >= rank:
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = upper
+        return self.max
+
+    def snapshot(self):
+        cumulative = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': cumulative,
+        }
+
+
+class _EndpointStats(object):
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.connect = Histogram(LATENCY_BUCKETS)
+        self.transfer = Histogram(LATENCY_BUCKETS)
+        self.parse = Histogram(LATENCY_BUCKETS)
+        self.bytes = Histogram(SIZE_BUCKETS)
+        self.rate_limit_wait = Histogram(LATENCY_BUCKETS)
+
+    def snapshot(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'cache_hits': self.cache_hits,
+            'latency': self.latency.snapshot(),
+            'connect': self.connect.snapshot(),
+            'transfer': self.transfer.snapshot(),
+            'parse': self.parse.snapshot(),
+            'bytes': self.bytes.snapshot(),
+            'rate_limit_wait': self.rate_limit_wait.snapshot(),
+        }
+
+
+class ClientStats(Observer):
+    """
+    An Observer rolling records up into per endpoint counters and
+    histograms.  Every client has one, see BaseClient.stats().
+    """
+    HISTOGRAMS = ('latency', 'connect', 'transfer', 'parse', 'bytes', 'rate_limit_wait')
+    COUNTERS = ('requests', 'errors', 'retries', 'cache_hits')
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _endpoint(self, endpoint):
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints[endpoint] = _EndpointStats()
+        return stats
+
+    def on_request(self, record):
+        with self._lock:
+            stats = self._endpoint(record.endpoint or 'other')
+            stats.requests += 1
+            stats.latency.observe(record.latency)
+            if record.cache_hit:
+                stats.cache_hits += 1
+                return
+            stats.retries += record.retries
+            if record.error is not None:
+                stats.errors += 1
+            stats.connect.observe(record.connect)
+            stats.transfer.observe(record.transfer)
+            stats.parse.observe(record.parse)
+            stats.bytes.observe(record.bytes)
+
+    def on_rate_limit(self, endpoint, waited):
+        with self._lock:
+            self._endpoint(endpoint or 'other').rate_limit_wait.observe(waited)
+
+    def snapshot(self):
+        """
+        Return a dictionary of endpoint name to its counters and histogram
+        summaries.
+        """
+        with self._lock:
+            return dict((endpoint, stats.snapshot()) for endpoint, stats in self._endpoints.items())
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def prometheus(self, prefix='pyrelic'):
+        """
+        Render our counters and histograms in the Prometheus text exposition
+        format.  Times are in seconds and sizes in bytes.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for counter in self.COUNTERS:
+            name = "{0}_{1}_total".format(prefix, counter)
+            lines.append("# TYPE {0} counter".format(name))
+            for endpoint in sorted(snapshot):
+                lines.append('{0}{{endpoint="{1}"}} {2}'.format(name, endpoint, snapshot[endpoint][counter]))
+        for histogram in self.HISTOGRAMS:
+            if histogram == 'bytes':
+                name = "{0}_response_bytes".format(prefix)
+            else:
+                name = "{0}_{1}_seconds".format(prefix, histogram)
+            lines.append("# TYPE {0} histogram".format(name))
+            for endpoint in sorted(snapshot):
+                values = snapshot[endpoint][histogram]
+                for bound, count in values['buckets']:
+                    le = '+Inf' if bound == float('inf') else repr(float(bound))
+                    lines.append('{0}_bucket{{endpoint="{1}",le="{2}"}} {3}'.format(name, endpoint, le, count))
+                lines.append('{0}_sum{{endpoint="{1}"}} {2!r}'.format(name, endpoint, float(values['sum'])))
+                lines.append('{0}_count{{endpoint="{1}"}} {2}'.format(name, endpoint, values['count']))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,237 @@
+import json
+import sqlite3
+import threading
+import time
+
+from xml.etree import ElementTree as etree
+
+from .utils import to_epoch
+
+
+# Bumped whenever the tables change.  The store is a cache, so a store with
+# an older schema is simply emptied.
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS periods (
+    app TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    period INTEGER NOT NULL,
+    begin INTEGER NOT NULL,
+    begin_at TEXT NOT NULL,
+    end_at TEXT NOT NULL,
+    attributes TEXT NOT NULL,
+    PRIMARY KEY (app, metric, period, begin)
+);
+CREATE TABLE IF NOT EXISTS field_values (
+    app TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    period INTEGER NOT NULL,
+    begin INTEGER NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (app, metric, period, begin, field)
+);
+CREATE TABLE IF NOT EXISTS coverage (
+    app TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    field TEXT NOT NULL,
+    period INTEGER NOT NULL,
+    begin INTEGER NOT NULL,
+    end INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS coverage_key ON coverage (app, metric, field, period, begin);
+CREATE TABLE IF NOT EXISTS resolutions (
+    span INTEGER PRIMARY KEY,
+    period INTEGER NOT NULL
+);
+"""
+
+TABLES = ('periods', 'field_values', 'coverage', 'resolutions')
+
+
+class MetricStore(object):
+    """
+    An on-disk (SQLite, WAL mode) store of metric data periods.
+
+    New Relic picks the length of the periods it returns from the length of
+    the window asked for, so periods are stored by length and besides them
+    we record which (application, metric, field, period length) time ranges
+    have already been fetched, and which period length each window length
+    (span) got.  The Client only asks New Relic for the sub-windows it does
+    not have yet, at the resolution of the window it was asked for, and
+    never mixes resolutions.
+
+    Data for the last min_age seconds is stored but not marked as covered,
+    since New Relic may still be aggregating it; those windows are fetched
+    again next time.
+    """
+    def __init__(self, path, min_age=300):
+        self.path = path
+        self.min_age = min_age
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            with self._db:
+                for table in TABLES:
+                    self._db.execute("DROP TABLE IF EXISTS {0}".format(table))
+            self._db.execute("PRAGMA user_version = {0}".format(SCHEMA_VERSION))
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def resolution(self, span):
+        """
+        Return the period length New Relic uses for windows of span seconds,
+        None if we can't tell yet.  Longer windows never get shorter
+        periods, so a span between two known spans with the same period
+        gets that period too.
+        """
+        with self._lock:
+            below = self._db.execute("SELECT period FROM resolutions WHERE span <= ? ORDER BY span DESC LIMIT 1",
+                                     (span,)).fetchone()
+            above = self._db.execute("SELECT span, period FROM resolutions WHERE span >= ? ORDER BY span LIMIT 1",
+                                     (span,)).fetchone()
+        if above is not None and (above[0] == span or (below is not None and below[0] == above[1])):
+            return above[1]
+        return None
+
+    def missing(self, app, metric, field, begin, end, period):
+        """
+        Return the (begin, end) epoch windows between begin and end that are
+        not covered yet for this application, metric, field and period
+        length.
+        """
+        with self._lock:
+            covered = self._db.execute(
+                "SELECT begin, end FROM coverage WHERE app = ? AND metric = ? AND field = ? AND period = ? "
+                "AND begin < ? AND end > ? ORDER BY begin",
+                (app, metric, field, period, end, begin)).fetchall()
+        gaps = []
+        cursor = begin
+        for covered_begin, covered_end in covered:
+            if covered_begin > cursor:
+                gaps.append((cursor, covered_begin))
+            cursor = max(cursor, covered_end)
+        if cursor < end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def add(self, apps, metrics, fields, begin, end, elements, app_key):
+        """
+        Store the <metric> elements fetched for the begin/end epoch window
+        and mark the window as covered, at the period length of the
+        elements, for every requested application, metric and field.
+        app_key(element) returns the application key an element was
+        requested under.
+        """
+        periods = []
+        values = []
+        lengths = {}
+        # Every period of a metric has the same attributes but for begin and
+        # end, which get columns of their own so the rest is encoded once
+        encoded = {}
+        epochs = {}
+        for element in elements:
+            app = app_key(element)
+            name = element.get('name')
+            begin_at, end_at = element.get('begin'), element.get('end')
+            period_begin = epochs.get(begin_at)
+            if period_begin is None:
+                period_begin = epochs[begin_at] = to_epoch(begin_at)
+            period_end = epochs.get(end_at)
+            if period_end is None:
+                period_end = epochs[end_at] = to_epoch(end_at)
+            length = period_end - period_begin
+            lengths[length] = lengths.get(length, 0) + 1
+            others = tuple((k, v) for k, v in element.items() if k != 'begin' and k != 'end')
+            attributes = encoded.get(others)
+            if attributes is None:
+                attributes = encoded[others] = json.dumps(dict(others), sort_keys=True)
+            periods.append((app, name, length, period_begin, begin_at, end_at, attributes))
+            for field in element.findall('.//field'):
+                values.append((app, name, length, period_begin, field.get('name'), field.text))
+
+        span = end - begin
+        # An empty response doesn't tell us the period length, the spans we
+        # already know might
+        length = max(lengths, key=lengths.get) if lengths else self.resolution(span)
+        covered_end = min(end, int(time.time()) - self.min_age)
+        with self._lock:
+            with self._db:
+                self._db.executemany("INSERT OR REPLACE INTO periods "
+                                     "(app, metric, period, begin, begin_at, end_at, attributes) "
+                                     "VALUES (?, ?, ?, ?, ?, ?, ?)", periods)
+                self._db.executemany("INSERT OR REPLACE INTO field_values (app, metric, period, begin, field, value) "
+                                     "VALUES (?, ?, ?, ?, ?, ?)", values)
+                if lengths:
+                    self._db.execute("INSERT OR REPLACE INTO resolutions (span, period) VALUES (?, ?)",
+                                     (span, length))
+                if length is not None and covered_end > begin:
+                    for app in apps:
+                        for metric in metrics:
+                            for field in fields:
+                                self._cover(app, metric, field, length, begin, covered_end)
+
+    def _cover(self, app, metric, field, period, begin, end):
+        """
+        Record a covered window, merging it with any overlapping or adjacent
+        windows so coverage stays a short list of disjoint ranges.
+        """
+        key = (app, metric, field, period)
+        overlapping = self._db.execute(
+            "SELECT rowid, begin, end FROM coverage WHERE app = ? AND metric = ? AND field = ? AND period = ? "
+            "AND begin <= ? AND end >= ?", key + (end, begin)).fetchall()
+        for rowid, covered_begin, covered_end in overlapping:
+            begin = min(begin, covered_begin)
+            end = max(end, covered_end)
+            self._db.execute("DELETE FROM coverage WHERE rowid = ?", (rowid,))
+        self._db.execute("INSERT INTO coverage (app, metric, field, period, begin, end) VALUES (?, ?, ?, ?, ?, ?)",
+                         key + (begin, end))
+
+    def load(self, apps, metrics, fields, begin, end, period):
+        """
+        Return <metric> elements for the stored periods of the given length
+        starting between the begin and end epochs, holding only the
+        requested fields, ordered by application (in the order given),
+        metric name and period.
+        """
+        fields = list(fields)
+        # One query per application and metric, the field values joined in
+        statement = (
+            "SELECT p.begin, p.begin_at, p.end_at, p.attributes, f.field, f.value FROM periods p "
+            "LEFT JOIN field_values f ON f.app = p.app AND f.metric = p.metric AND f.period = p.period "
+            "AND f.begin = p.begin AND f.field IN ({0}) "
+            "WHERE p.app = ? AND p.metric = ? AND p.period = ? AND p.begin >= ? AND p.begin < ? "
+            "ORDER BY p.begin".format(", ".join("?" * len(fields))))
+        decoded = {}
+        elements = []
+        with self._lock:
+            for app in apps:
+                for metric in sorted(set(metrics)):
+                    rows = self._db.execute(statement, fields + [app, metric, period, begin, end]).fetchall()
+                    element = last = None
+                    found = {}
+                    for period_begin, begin_at, end_at, attributes, field, value in rows:
+                        if period_begin != last:
+                            self._add_fields(element, found, fields)
+                            attrib = decoded.get(attributes)
+                            if attrib is None:
+                                attrib = decoded[attributes] = json.loads(attributes)
+                            element = etree.Element('metric', attrib, begin=begin_at, end=end_at)
+                            elements.append(element)
+                            last = period_begin
+                            found = {}
+                        if field is not None:
+                            found[field] = value
+                    self._add_fields(element, found, fields)
+        return elements
+
+    def _add_fields(self, element, found, fields):
+        # Fields in the order they were asked for
+        if found:
+            for field in fields:
+                if field in found:
+                    etree.SubElement(element, 'field', {'name': field}).text = found[field]
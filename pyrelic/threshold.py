@@ -1,13 +1,19 @@
-class Threshold(object):
+from .record import Record
+from .utils import intern_string
+
+
+class Threshold(Record):
     """
     A simple dumb object for easily containing the data returned from a
     "threshold_values" call
     """
+    __slots__ = ('name', 'metric_value', 'formatted_metric_value', 'threshold_value', 'begin_time', 'end_time')
+
     def __init__(self, properties):
         super(Threshold, self).__init__()
-        self.name = properties['name']
+        self.name = intern_string(properties['name'])
         self.metric_value = properties['metric_value']
         self.formatted_metric_value = properties['formatted_metric_value']
-        self.threshold_value = properties['threshold_value']
-        self.begin_time = properties['begin_time']
-        self.end_time = properties['end_time']
+        self.threshold_value = intern_string(properties['threshold_value'])
+        self.begin_time = intern_string(properties['begin_time'])
+        self.end_time = intern_string(properties['end_time'])
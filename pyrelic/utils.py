@@ -0,0 +1,54 @@
+import calendar
+import datetime
+import time
+
+import six
+from six.moves import intern
+
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# A clock for measuring intervals that never goes backwards, when available
+clock = getattr(time, 'monotonic', time.time)
+
+
+def to_epoch(timestamp):
+    """
+    Convert a New Relic timestamp ('2011-04-20T15:47:00Z'), a datetime
+    (assumed to be UTC when naive) or a number of seconds into integer
+    seconds since the epoch.
+    """
+    if isinstance(timestamp, datetime.datetime):
+        return calendar.timegm(timestamp.utctimetuple())
+    if isinstance(timestamp, six.string_types):
+        # strptime is slow and we convert a lot of these, so read the
+        # fixed positions of the usual format directly
+        if len(timestamp) == 20 and timestamp[4] == '-' and timestamp[10] == 'T' and timestamp[19] == 'Z':
+            try:
+                parsed = datetime.datetime(int(timestamp[0:4]), int(timestamp[5:7]), int(timestamp[8:10]),
+                                           int(timestamp[11:13]), int(timestamp[14:16]), int(timestamp[17:19]))
+            except ValueError:
+                pass
+            else:
+                return calendar.timegm(parsed.timetuple())
+        return calendar.timegm(time.strptime(timestamp, TIMESTAMP_FORMAT))
+    return int(timestamp)
+
+
+def from_epoch(seconds):
+    """
+    Convert seconds since the epoch into a New Relic timestamp.
+    """
+    return time.strftime(TIMESTAMP_FORMAT, time.gmtime(seconds))
+
+
+def intern_string(value):
+    """
+    Intern a string so repeated values (metric names, field names, URLs...)
+    share a single object.  Values that cannot be interned, like None or
+    unicode on Python 2, are returned unchanged.
+    """
+    try:
+        return intern(value)
+    except TypeError:
+        return value
@@ -0,0 +1,214 @@
+import hashlib
+import heapq
+import logging
+import random
+import threading
+
+from multiprocessing.pool import ThreadPool
+
+import requests
+
+from .exceptions import NewRelicApiException
+from .record import Record
+from .utils import clock
+
+
+logger = logging.getLogger(__name__)
+
+
+class ThresholdChange(Record):
+    """
+    A threshold value of an application that changed since the previous
+    poll.  threshold is the new Threshold, None when it disappeared, and
+    previous_value and previous_level its metric_value and threshold_value
+    as last seen, None when it is new.
+    """
+    __slots__ = ('app_id', 'name', 'threshold', 'previous_value', 'previous_level')
+
+    def __init__(self, app_id, name, threshold, previous=None):
+        super(ThresholdChange, self).__init__()
+        self.app_id = app_id
+        self.name = name
+        self.threshold = threshold
+        self.previous_value, self.previous_level = previous or (None, None)
+
+    @property
+    def level_changed(self):
+        level = self.threshold.threshold_value if self.threshold is not None else None
+        return level != self.previous_level
+
+
+class ThresholdWatcher(object):
+    """
+    Polls the threshold values of many applications and tells callbacks
+    only about what changed.
+
+    Every application is polled every interval seconds, give or take jitter
+    (a fraction of the interval) so that polls spread out instead of
+    bunching up, with at most max_workers polls in flight (defaults to the
+    Client max_workers).  All we keep per application is a digest of the
+    last response, which lets identical responses skip parsing entirely,
+    and each threshold's metric value and level (threshold_value).
+
+    Callbacks added with add_callback(callback) are called with the list of
+    ThresholdChanges of a poll whenever it has any: thresholds whose value
+    or level changed (only the level with levels_only), appeared or
+    disappeared.  The first poll of an application reports all of its
+    thresholds as new.  Callbacks are called from the polling threads.
+    """
+    def __init__(self, client, application_ids=(), interval=60, jitter=0.1, max_workers=None, levels_only=False):
+        self.client = client
+        self.interval = interval
+        self.jitter = jitter
+        self.max_workers = max_workers or client.max_workers
+        self.levels_only = levels_only
+        self._callbacks = []
+        self._digests = {}
+        self._states = {}
+        self._applications = set()
+        self._schedule = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        for app_id in application_ids:
+            self.watch(app_id)
+
+    def add_callback(self, callback):
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        self._callbacks.remove(callback)
+
+    def watch(self, app_id):
+        """
+        Start polling an application, at a random point of the first
+        interval.
+        """
+        with self._lock:
+            if app_id in self._applications:
+                return
+            self._applications.add(app_id)
+            self._reschedule(app_id, random.uniform(0, self.interval))
+        self._wakeup.set()
+
+    def unwatch(self, app_id):
+        with self._lock:
+            self._applications.discard(app_id)
+            self._digests.pop(app_id, None)
+            self._states.pop(app_id, None)
+
+    def poll(self, app_id):
+        """
+        Fetch an application's threshold values now, hand any changes to
+        our callbacks and return them.
+        """
+        client = self.client
+        thresholds = client._make_get_request(client._threshold_values_uri(app_id), endpoint='get_threshold_values',
+                                              cached=False, parser=lambda body: self._parse(app_id, body))
+        if thresholds is None:
+            return []
+        changes = self._diff(app_id, thresholds)
+        if changes:
+            for callback in list(self._callbacks):
+                try:
+                    callback(changes)
+                except Exception:
+                    logger.exception("Threshold watcher callback {0!r} failed".format(callback))
+        return changes
+
+    def start(self):
+        """
+        Poll in the background until stop() is called.
+        """
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="pyrelic-threshold-watcher")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop polling, waiting for the polls in flight to finish.
+        """
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+
+    def _parse(self, app_id, body):
+        """
+        Parse a response unless it is exactly the one we saw last time, in
+        which case nothing changed and None is returned.
+        """
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        digest = hashlib.sha1(body).digest()
+        with self._lock:
+            if self._digests.get(app_id) == digest:
+                return None
+            self._digests[app_id] = digest
+        return self.client.parser.threshold_values(body)
+
+    def _diff(self, app_id, thresholds):
+        state = dict((threshold.name, (threshold.metric_value, threshold.threshold_value))
+                     for threshold in thresholds)
+        with self._lock:
+            previous = self._states.get(app_id, {})
+            self._states[app_id] = state
+        changes = []
+        for threshold in thresholds:
+            before = previous.get(threshold.name)
+            now = state[threshold.name]
+            if before is None or before[1] != now[1] or (not self.levels_only and before[0] != now[0]):
+                changes.append(ThresholdChange(app_id, threshold.name, threshold, before))
+        for name in previous:
+            if name not in state:
+                changes.append(ThresholdChange(app_id, name, None, previous[name]))
+        return changes
+
+    def _run(self):
+        pool = ThreadPool(self.max_workers)
+        try:
+            while not self._stopped.is_set():
+                now = clock()
+                due = []
+                with self._lock:
+                    while self._schedule and self._schedule[0][0] <= now:
+                        app_id = heapq.heappop(self._schedule)[1]
+                        if app_id in self._applications:
+                            due.append(app_id)
+                    wait = self._schedule[0][0] - now if self._schedule else self.interval
+                for app_id in due:
+                    pool.apply_async(self._poll_and_reschedule, (app_id,))
+                self._wakeup.wait(max(0, wait))
+                self._wakeup.clear()
+        finally:
+            pool.close()
+            pool.join()
+
+    def _poll_and_reschedule(self, app_id):
+        try:
+            self.poll(app_id)
+        except (NewRelicApiException, requests.RequestException) as e:
+            logger.error("Polling the threshold values of {0} failed: {1!r}".format(app_id, e))
+        except Exception:
+            # apply_async would swallow it silently
+            logger.exception("Polling the threshold values of {0} failed".format(app_id))
+        finally:
+            with self._lock:
+                if app_id in self._applications:
+                    self._reschedule(app_id, self.interval * (1 + random.uniform(-self.jitter, self.jitter)))
+                else:
+                    # Unwatched while we were polling it
+                    self._digests.pop(app_id, None)
+                    self._states.pop(app_id, None)
+            self._wakeup.set()
+
+    def _reschedule(self, app_id, delay):
+        # An application unwatched and watched again may still be scheduled
+        if all(scheduled != app_id for _, scheduled in self._schedule):
+            heapq.heappush(self._schedule, (clock() + delay, app_id))
@@ -5,7 +5,7 @@ from setuptools import setup, find_packages
 
 if __name__ == '__main__':
 
-    packages = find_packages(exclude=['*tests*'])
+    packages = find_packages(exclude=['*tests*', 'benchmarks'])
 
     setup(
         name="pyrelic",
@@ -18,7 +18,12 @@ if __name__ == '__main__':
         url='https://github.com/andrewgross/pyrelic',
         packages=packages,
         install_requires = ["six", "requests>=2.5.0"],
-        extras_require = { "tests": [
+        entry_points = {"console_scripts": ["pyrelic = pyrelic.cli:main"]},
+        extras_require = { "async": ["aiohttp>=3.0"],
+                           "frame": ["numpy"],
+                           "lxml": ["lxml"],
+                           "parquet": ["pyarrow"],
+                           "tests": [
             "mock==1.0.1",
             "sure==1.2.2",
             "nose==1.2.1",
@@ -0,0 +1,258 @@
+import asyncio
+
+import requests
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from pyrelic import (AsyncBaseClient,
+                     AsyncClient,
+                     CircuitBreaker,
+                     MetricStore,
+                     NewRelicInvalidApiKeyException,
+                     RequestCoalescer)
+
+from ..fixtures.sample_responses import (DELETE_SERVERS_SUCCESS_SAMPLE,
+                                         METRIC_DATA_SAMPLE,
+                                         THRESHOLD_VALUES_SAMPLE,
+                                         VIEW_APPLICATIONS_SAMPLE,
+                                         VIEW_SERVERS_SAMPLE)
+
+
+def run(coroutine):
+    return asyncio.new_event_loop().run_until_complete(coroutine)
+
+
+def serve(handler, check):
+    """
+    Run check(base_url) against a local aiohttp server using handler
+    """
+    async def go():
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', handler)
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            return await check(str(server.make_url('')))
+        finally:
+            await server.close()
+    return run(go())
+
+
+def fake_transport(client, body):
+    calls = []
+
+    async def fake_request(uri, parameters=None, timeout=None, endpoint=None, rate_limited=False, cached=True,
+                           parser=None):
+        calls.append((uri, parameters))
+        return (parser or client._parse_xml)(body)
+    client._make_get_request = fake_request
+    return calls
+
+
+def test_async_view_applications():
+    """
+    AsyncClient should be able to list Applications
+    """
+    # When I make an async API request to view applications
+    c = AsyncClient(account_id="1", api_key="2")
+    calls = fake_transport(c, VIEW_APPLICATIONS_SAMPLE)
+    result = run(c.view_applications())
+
+    # Then I should receive an array of Applications
+    result.should.be.a('list')
+    result[0].should.be.a('pyrelic.Application')
+    calls[0][0].should.equal("https://rpm.newrelic.com/accounts/1/applications.xml")
+
+
+def test_async_view_servers():
+    """
+    AsyncClient should be able to list Servers
+    """
+    # When I make an async API request to view servers
+    c = AsyncClient(account_id="1", api_key="2")
+    fake_transport(c, VIEW_SERVERS_SAMPLE)
+    result = run(c.view_servers())
+
+    # Then I should receive an array of Servers
+    result.should.have.length_of(2)
+    result[0].hostname.should.equal('my-hostname.newrelic.com')
+
+
+def test_async_get_metric_data():
+    """
+    AsyncClient should be able to list Metrics
+    """
+    # When I make an async API request to get metric data
+    c = AsyncClient(account_id="1", api_key="2")
+    calls = fake_transport(c, METRIC_DATA_SAMPLE)
+    result = run(c.get_metric_data(["123"], ["foo"], "bar", "baz", "qux"))
+
+    # Then I should receive an array of Metrics
+    result.should.have.length_of(5)
+    result[0].should.be.a('pyrelic.Metric')
+    calls[0][1].should.have.key('app_id').being.equal(["123"])
+
+
+def test_async_get_application_summary_metrics():
+    """
+    AsyncClient should fetch the summary metrics of several applications
+    """
+    # When I ask for the summary metrics of two applications
+    c = AsyncClient(account_id="1", api_key="2")
+    calls = fake_transport(c, THRESHOLD_VALUES_SAMPLE)
+    result = run(c.get_application_summary_metrics(["1", "2"]))
+
+    # Then each should be fetched
+    sorted(uri for uri, _ in calls).should.equal([
+        "https://rpm.newrelic.com/accounts/1/applications/1/threshold_values.xml",
+        "https://rpm.newrelic.com/accounts/1/applications/2/threshold_values.xml"])
+    result['2'][0][0].should.equal('Apdex')
+
+
+def test_async_bulk_delete_servers():
+    """
+    AsyncClient should delete servers concurrently and report on every one
+    """
+    async def fake_delete(uri, timeout=None, endpoint=None, parser=None):
+        server_id = uri.rsplit('/', 1)[-1].split('.')[0]
+        if server_id == '2':
+            raise NewRelicInvalidApiKeyException("403")
+        return parser(DELETE_SERVERS_SUCCESS_SAMPLE.replace('123456', server_id))
+
+    # When I delete servers, one of which fails
+    c = AsyncClient(account_id="1", api_key="2")
+    c._make_delete_request = fake_delete
+    report = run(c.bulk_delete_servers(["1", "2", "3"], max_workers=2))
+
+    # Then every server should be reported on, in order
+    [(d.item, d.deleted) for d in report].should.equal([("1", True), ("2", False), ("3", True)])
+    report.failed[0].error.should.be.a(NewRelicInvalidApiKeyException)
+
+
+def test_async_make_request():
+    """
+    AsyncBaseClient should send flattened parameters and parse the response
+    """
+    seen = {}
+
+    async def handler(request):
+        seen['query'] = list(request.query.items())
+        seen['headers'] = dict(request.headers)
+        return web.Response(text="hello")
+
+    async def check(url):
+        c = AsyncBaseClient()
+        c.headers = {'x-api-key': 'foo'}
+        c._parser = lambda body: body
+        async with c:
+            return await c._make_get_request(url + "/foo", parameters={'a[]': [1, 2], 'b': None})
+
+    # When I make an async GET request
+    result = serve(handler, check)
+
+    # Then the parameters should be expanded like requests does
+    result.should.equal(b"hello")
+    seen['query'].should.equal([('a[]', '1'), ('a[]', '2')])
+    seen['headers']['x-api-key'].should.equal('foo')
+
+
+def test_async_make_request_non_200():
+    """
+    AsyncClient should map HTTP errors like Client
+    """
+    async def handler(request):
+        return web.Response(status=403, text="nope")
+
+    async def check(url):
+        c = AsyncClient(account_id="1", api_key="2")
+        async with c:
+            await c._make_get_request(url + "/foo")
+
+    # When I make an async API request and receive a 403
+    # Then I should raise the same exception as Client
+    serve.when.called_with(handler, check).should.throw(NewRelicInvalidApiKeyException)
+
+
+def test_async_make_request_connection_error():
+    """
+    AsyncBaseClient should retry and then give up on connection errors
+    """
+    async def check():
+        c = AsyncBaseClient(retries=1, retry_delay=0)
+        async with c:
+            await c._make_get_request("http://127.0.0.1:1/foo")
+
+    # When I cannot connect to the remote API
+    # Then I should raise a requests exception
+    run.when.called_with(check()).should.throw(requests.RequestException)
+
+
+def test_async_cancelled_probe():
+    """
+    AsyncBaseClient should free a half-open probe slot when cancelled
+    """
+    calls = []
+
+    async def handler(request):
+        calls.append(request.path)
+        if len(calls) == 1:
+            await asyncio.sleep(5)
+        return web.Response(text="hello")
+
+    async def check(url):
+        breaker = CircuitBreaker(minimum_requests=1, reset_timeout=0.01)
+        breaker.before(breaker.host(url))
+        breaker.record(breaker.host(url), True)
+        await asyncio.sleep(0.02)
+        c = AsyncBaseClient(retries=0, circuit_breaker=breaker)
+        c._parser = lambda body: body
+        async with c:
+            # When the probe is cancelled
+            try:
+                await asyncio.wait_for(c._make_get_request(url + "/slow"), 0.2)
+            except asyncio.TimeoutError:
+                pass
+            # Then the next request should be let through as a probe
+            return await c._make_get_request(url + "/fast")
+
+    serve(handler, check).should.equal(b"hello")
+    calls.should.equal(["/slow", "/fast"])
+
+
+def test_async_iter_methods():
+    """
+    AsyncClient should refuse the streaming Client methods
+    """
+    c = AsyncClient(account_id="1", api_key="2")
+    c.iter_metric_names.when.called_with(123).should.throw(NotImplementedError)
+    c.iter_all_metric_names.when.called_with(123).should.throw(NotImplementedError)
+    c.iter_metric_data.when.called_with(["123"], ["Database/all"], "average_value",
+                                        "2011-04-20T15:47:00Z", "2011-04-20T15:52:00Z")\
+     .should.throw(NotImplementedError)
+
+
+def test_async_get_metric_data_chunked():
+    """
+    AsyncClient should split long metric data windows into chunks
+    """
+    # When I request a window in three minute chunks
+    c = AsyncClient(account_id="1", api_key="2")
+    calls = fake_transport(c, METRIC_DATA_SAMPLE)
+    result = run(c.get_metric_data(["123456"], ["ActiveRecord/all"], "average_response_time",
+                                   "2011-04-20T15:47:00Z", "2011-04-20T15:52:00Z", chunk=180))
+
+    # Then each chunk should be requested and stitched together without duplicates
+    sorted(parameters['begin'] for uri, parameters in calls).should.equal([
+        '2011-04-20T15:47:00Z', '2011-04-20T15:48:00Z', '2011-04-20T15:51:00Z'])
+    [m.begin[14:16] for m in result].should.equal(['47', '48', '49', '50', '51'])
+
+
+def test_async_unsupported_options():
+    """
+    AsyncClient should refuse options it would otherwise ignore
+    """
+    AsyncClient.when.called_with(account_id="1", api_key="2", metric_store=MetricStore(":memory:"))\
+        .should.throw(NotImplementedError)
+    AsyncClient.when.called_with(account_id="1", api_key="2", coalescer=RequestCoalescer())\
+        .should.throw(NotImplementedError)
@@ -1,9 +1,15 @@
 import requests
 import httpretty
 
+from mock import Mock
 from nose.tools import nottest
 
-from pyrelic import BaseClient
+from pyrelic import (BaseClient,
+                     CircuitBreaker,
+                     NewRelicApiCircuitOpenException,
+                     PooledSession,
+                     RetryBudget,
+                     RetryPolicy)
 
 
 @nottest  # Skip until we can properly simulate timeouts
@@ -64,3 +70,179 @@ def test_client_proxy_dict():
 
     # Then the Client should create the proxy config as a dictionary
     c.proxy.should.equal(proxy)
+
+
+def test_client_creates_pooled_session():
+    """
+    Base Client should create a pooled session
+    """
+    # When I create a client with pool settings
+    c = BaseClient(pool_connections=2, pool_maxsize=5, max_idle_time=30)
+
+    # Then the Client should own a PooledSession with those settings
+    c.session.should.be.a(PooledSession)
+    c.session.pool_connections.should.equal(2)
+    c.session.pool_maxsize.should.equal(5)
+    c.session.max_idle_time.should.equal(30)
+
+
+def test_client_shared_session():
+    """
+    Base Clients should be able to share a session
+    """
+    # When I create two clients with the same session
+    session = PooledSession()
+    first = BaseClient(session=session)
+    second = BaseClient(session=session)
+
+    # Then they should both use it
+    first.session.should.be(session)
+    second.session.should.be(session)
+
+
+@httpretty.activate
+def test_make_get_request_uses_session():
+    """
+    Base Client should send requests through its session
+    """
+    httpretty.register_uri(httpretty.GET, "http://foobar.com/",
+                           body="123", status=200)
+    # When I make a GET request
+    c = BaseClient()
+    c._parser = lambda body: body
+    c.session.request = Mock(wraps=c.session.request)
+    result = c._make_get_request("http://foobar.com/")
+
+    # Then it should go through the session
+    result.should.equal(b"123")
+    c.session.request.call_count.should.equal(1)
+
+
+@httpretty.activate
+def test_make_streaming_get_request_error_closes_response():
+    """
+    Base Client should close streamed responses it raises an error for
+    """
+    httpretty.register_uri(httpretty.GET, "http://foobar.com/", body="nope", status=404)
+    c = BaseClient()
+    responses = []
+    send = c.session.request
+
+    def request(*args, **kwargs):
+        response = send(*args, **kwargs)
+        response.close = Mock(wraps=response.close)
+        responses.append(response)
+        return response
+    c.session.request = request
+
+    # When a streamed request fails
+    c._make_streaming_get_request.when.called_with("http://foobar.com/").should.throw(requests.HTTPError)
+
+    # Then its connection should go back to the pool
+    responses[0].close.call_count.should.equal(1)
+
+
+@httpretty.activate
+def test_make_request_retries_unavailable():
+    """
+    Base Client should retry 503 responses, honouring Retry-After
+    """
+    statuses = [503, 503, 200]
+
+    def respond(request, uri, headers):
+        headers['Retry-After'] = '0'
+        return (statuses.pop(0), headers, "123")
+
+    httpretty.register_uri(httpretty.GET, "http://foobar.com/", body=respond)
+    # When the remote API is briefly unavailable
+    c = BaseClient(retries=3)
+    c._parser = lambda body: body
+
+    # Then the request should eventually succeed
+    c._make_get_request("http://foobar.com/").should.equal(b"123")
+    statuses.should.equal([])
+
+
+@httpretty.activate
+def test_make_request_does_not_retry_posts():
+    """
+    Base Client should not resend a POST on a 503 response
+    """
+    calls = []
+
+    def respond(request, uri, headers):
+        calls.append(uri)
+        return (503, headers, "")
+
+    httpretty.register_uri(httpretty.POST, "http://foobar.com/", body=respond)
+    # When a POST gets a 503
+    c = BaseClient(retries=3, retry_delay=0)
+
+    # Then it should not be sent again
+    c._make_request.when.called_with(c.session.post, "http://foobar.com/", data={'a': 1})\
+     .should.throw(requests.HTTPError)
+    calls.should.have.length_of(1)
+
+
+@httpretty.activate
+def test_make_request_retry_budget():
+    """
+    Base Client should stop retrying once its retry budget is spent
+    """
+    calls = []
+
+    def respond(request, uri, headers):
+        calls.append(uri)
+        return (503, headers, "")
+
+    httpretty.register_uri(httpretty.GET, "http://foobar.com/", body=respond)
+    # When every request fails and only one retry is budgeted
+    policy = RetryPolicy(retries=5, backoff=0, budget=RetryBudget(ratio=0, min_retries=1))
+    c = BaseClient(retry_policy=policy)
+
+    # Then the error should be raised after a single retry
+    c._make_request.when.called_with(c.session.get, "http://foobar.com/")\
+     .should.throw(requests.HTTPError)
+    calls.should.have.length_of(2)
+
+
+@httpretty.activate
+def test_make_request_circuit_breaker():
+    """
+    Base Client should fail fast once a host's circuit is open
+    """
+    calls = []
+
+    def respond(request, uri, headers):
+        calls.append(uri)
+        return (503, headers, "")
+
+    httpretty.register_uri(httpretty.GET, "http://foobar.com/", body=respond)
+    # When a host keeps failing
+    c = BaseClient(retries=0, circuit_breaker=CircuitBreaker(minimum_requests=2))
+    for _ in range(2):
+        c._make_request.when.called_with(c.session.get, "http://foobar.com/")\
+         .should.throw(requests.HTTPError)
+
+    # Then further requests should not be sent
+    c._make_request.when.called_with(c.session.get, "http://foobar.com/")\
+     .should.throw(NewRelicApiCircuitOpenException)
+    calls.should.have.length_of(2)
+
+
+def test_make_request_interrupted_probe():
+    """
+    Base Client should free a half-open probe slot when interrupted
+    """
+    breaker = CircuitBreaker(minimum_requests=1, reset_timeout=0)
+    breaker.before("foobar.com")
+    breaker.record("foobar.com", True)
+    c = BaseClient(retries=0, circuit_breaker=breaker)
+
+    # When a probe is interrupted
+    c._make_request.when.called_with(Mock(side_effect=KeyboardInterrupt), "http://foobar.com/")\
+     .should.throw(KeyboardInterrupt)
+
+    # Then another probe should be let through
+    breaker.state("foobar.com").should.equal("half-open")
+    breaker.before("foobar.com")
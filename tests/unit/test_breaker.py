@@ -0,0 +1,58 @@
+import time
+
+from pyrelic import CircuitBreaker, NewRelicApiCircuitOpenException
+
+
+def test_breaker_opens_on_failure_rate():
+    """
+    CircuitBreaker should open once enough requests to a host fail
+    """
+    breaker = CircuitBreaker(failure_threshold=0.5, minimum_requests=4)
+
+    # When half of the requests to a host fail
+    for failed in (False, True, False, True):
+        breaker.before("api.newrelic.com")
+        breaker.record("api.newrelic.com", failed)
+
+    # Then requests to that host should fail fast
+    breaker.state("api.newrelic.com").should.equal("open")
+    breaker.before.when.called_with("api.newrelic.com").should.throw(NewRelicApiCircuitOpenException)
+
+    # And other hosts should be unaffected
+    breaker.before("rpm.newrelic.com")
+
+
+def test_breaker_needs_minimum_requests():
+    """
+    CircuitBreaker should not open on a handful of failures
+    """
+    breaker = CircuitBreaker(minimum_requests=10)
+    for _ in range(9):
+        breaker.before("api.newrelic.com")
+        breaker.record("api.newrelic.com", True)
+    breaker.state("api.newrelic.com").should.equal("closed")
+
+
+def test_breaker_half_open_probe():
+    """
+    CircuitBreaker should let a probe through after the reset timeout
+    """
+    breaker = CircuitBreaker(minimum_requests=1, reset_timeout=0.01)
+    breaker.before("api.newrelic.com")
+    breaker.record("api.newrelic.com", True)
+    time.sleep(0.02)
+
+    # When the reset timeout has passed a single probe should be let through
+    breaker.state("api.newrelic.com").should.equal("half-open")
+    breaker.before("api.newrelic.com")
+    breaker.before.when.called_with("api.newrelic.com").should.throw(NewRelicApiCircuitOpenException)
+
+    # And a failed probe should open the circuit again
+    breaker.record("api.newrelic.com", True)
+    breaker.state("api.newrelic.com").should.equal("open")
+
+    # While a successful one should close it
+    time.sleep(0.02)
+    breaker.before("api.newrelic.com")
+    breaker.record("api.newrelic.com", False)
+    breaker.state("api.newrelic.com").should.equal("closed")
@@ -0,0 +1,76 @@
+import time
+
+from pyrelic import ResponseCache
+
+
+def test_cache_hit():
+    """
+    ResponseCache should return stored values
+    """
+    cache = ResponseCache()
+    key = cache.key("view_servers", "http://foo", {"b": [1, 2], "a": None})
+    cache.set(key, "value", 5)
+
+    cache.get(cache.key("view_servers", "http://foo", {"a": None, "b": [1, 2]})).should.equal("value")
+    cache.get(cache.key("view_servers", "http://foo", {"b": [2, 1]})).should.be.none
+
+
+def test_cache_ttl():
+    """
+    ResponseCache should expire entries after their endpoint's TTL
+    """
+    # When an endpoint has a short TTL
+    cache = ResponseCache(ttl=60, ttls={"get_metric_names": 0.01})
+    short = cache.key("get_metric_names", "http://foo")
+    long = cache.key("view_servers", "http://foo")
+    cache.set(short, "short", 5)
+    cache.set(long, "long", 4)
+    time.sleep(0.02)
+
+    # Then only its entries should expire
+    cache.get(short).should.be.none
+    cache.get(long).should.equal("long")
+    cache.size.should.equal(4)
+
+
+def test_cache_zero_ttl_disables_endpoint():
+    """
+    ResponseCache should not store endpoints with a TTL of 0
+    """
+    cache = ResponseCache(ttls={"view_servers": 0})
+    key = cache.key("view_servers", "http://foo")
+    cache.set(key, "value", 5)
+    len(cache).should.equal(0)
+
+
+def test_cache_evicts_least_recently_used():
+    """
+    ResponseCache should evict the least recently used entry when full
+    """
+    # When I fill the cache and read the oldest entry
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", 1, 1)
+    cache.set("b", 2, 1)
+    cache.get("a")
+    cache.set("c", 3, 1)
+
+    # Then the least recently used entry should be gone
+    cache.get("b").should.be.none
+    cache.get("a").should.equal(1)
+    cache.get("c").should.equal(3)
+
+
+def test_cache_evicts_by_bytes():
+    """
+    ResponseCache should evict entries to stay under max_bytes
+    """
+    cache = ResponseCache(max_bytes=10)
+    cache.set("a", 1, 6)
+    cache.set("b", 2, 6)
+    cache.get("a").should.be.none
+    cache.size.should.equal(6)
+
+    # And entries bigger than the cache should never be stored
+    cache.set("c", 3, 11)
+    cache.get("c").should.be.none
+    cache.get("b").should.equal(2)
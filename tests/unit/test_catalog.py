@@ -0,0 +1,160 @@
+import httpretty
+import re
+import threading
+
+from mock import Mock
+
+from pyrelic import Client, MetricCatalog
+from pyrelic.catalog import literal_prefix
+
+from ..fixtures.sample_responses import METRIC_NAMES_SAMPLE
+
+NAMES = {
+    'WebTransaction': ['average_response_time', 'call_count'],
+    'WebTransaction/Controller/users/show': ['average_response_time', 'call_count'],
+    'WebTransaction/Controller/users/index': ['average_response_time'],
+    'WebTransaction/Controller/admin/index': ['average_response_time'],
+    'Database/select/users': ['average_call_time'],
+    'Database/insert/users': ['average_call_time'],
+    'Errors/all': ['errors_per_minute'],
+}
+
+
+def test_catalog_prefix():
+    """
+    MetricCatalog should find metrics by name prefix
+    """
+    catalog = MetricCatalog(names=NAMES)
+    catalog.prefix('WebTransaction/Controller/users/').should.equal([
+        'WebTransaction/Controller/users/index', 'WebTransaction/Controller/users/show'])
+    catalog.prefix('WebTransaction/Controller/u').should.have.length_of(2)
+    catalog.prefix('Data').should.equal(['Database/insert/users', 'Database/select/users'])
+    catalog.prefix('Nothing/here').should.equal([])
+    catalog.prefix('').should.have.length_of(len(NAMES))
+
+
+def test_catalog_glob():
+    """
+    MetricCatalog should find metrics by glob, segment by segment
+    """
+    catalog = MetricCatalog(names=NAMES)
+    catalog.glob('WebTransaction/Controller/*/index').should.equal([
+        'WebTransaction/Controller/admin/index', 'WebTransaction/Controller/users/index'])
+    catalog.glob('Database/*').should.equal([])
+    catalog.glob('**/users').should.equal(['Database/insert/users', 'Database/select/users'])
+    catalog.glob('WebTransaction/**').should.have.length_of(4)
+
+
+def test_catalog_regex():
+    """
+    MetricCatalog should find metrics by regular expression
+    """
+    catalog = MetricCatalog(names=NAMES)
+    catalog.regex('users').should.have.length_of(4)
+    catalog.regex('^Database/(select|insert)/').should.have.length_of(2)
+    catalog.regex('^WebTransaction/Controller/users/(show|edit)$').should.equal([
+        'WebTransaction/Controller/users/show'])
+
+
+def test_catalog_fields():
+    """
+    MetricCatalog should index metrics by field
+    """
+    catalog = MetricCatalog(names=NAMES)
+    catalog.with_field('call_count').should.equal(['WebTransaction', 'WebTransaction/Controller/users/show'])
+    catalog.prefix('WebTransaction/', field='call_count').should.equal(['WebTransaction/Controller/users/show'])
+    catalog.fields('Errors/all').should.equal(['errors_per_minute'])
+    catalog.fields('Errors/none').should.be.none
+
+
+def test_catalog_update():
+    """
+    MetricCatalog should apply only what changed
+    """
+    catalog = MetricCatalog(names=NAMES)
+    names = dict(NAMES)
+    del names['WebTransaction/Controller/admin/index']
+    names['Errors/all'] = ['errors_per_minute', 'error_count']
+    names['External/all'] = ['average_response_time']
+
+    # When I update the catalog
+    added, removed = catalog.update(names)
+
+    # Then the differences should be reported and indexed
+    added.should.equal(['External/all'])
+    removed.should.equal(['WebTransaction/Controller/admin/index'])
+    catalog.glob('WebTransaction/Controller/admin/**').should.equal([])
+    catalog.with_field('error_count').should.equal(['Errors/all'])
+    ('WebTransaction/Controller/admin/index' in catalog).should.be.false
+    len(catalog).should.equal(len(NAMES))
+
+
+def test_catalog_refresh_in_background():
+    """
+    MetricCatalog should refresh itself in the background
+    """
+    refreshed = threading.Event()
+    client = Mock()
+
+    def get_metric_names(agent_id):
+        refreshed.set()
+        return {'Errors/all': ['errors_per_minute']}
+    client.get_metric_names.side_effect = get_metric_names
+
+    # When I start refreshing a catalog
+    catalog = MetricCatalog(client, 123, names=NAMES)
+    catalog.start(interval=60)
+    refreshed.wait(5)
+    catalog.stop()
+
+    # Then it should hold the application's current metrics
+    client.get_metric_names.assert_called_with(123)
+    len(catalog).should.equal(1)
+
+
+def test_catalog_refresh_survives_errors():
+    """
+    MetricCatalog should keep refreshing after unexpected errors
+    """
+    refreshed = threading.Event()
+    client = Mock()
+    responses = [ValueError("not XML"), {'Errors/all': ['errors_per_minute']}]
+
+    def get_metric_names(agent_id):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        refreshed.set()
+        return response
+    client.get_metric_names.side_effect = get_metric_names
+
+    # When the first refresh fails
+    catalog = MetricCatalog(client, 123, names=NAMES)
+    catalog.start(interval=0.01)
+    refreshed.wait(5)
+    catalog.stop()
+
+    # Then the next one should still happen
+    len(catalog).should.equal(1)
+
+
+@httpretty.activate
+def test_client_metric_catalog():
+    """
+    Client should build a MetricCatalog with one get_metric_names call
+    """
+    httpretty.register_uri(httpretty.GET, re.compile(".*.newrelic.com/.*"), body=METRIC_NAMES_SAMPLE)
+    c = Client(account_id="1", api_key="2")
+    catalog = c.metric_catalog(123)
+    catalog.prefix('WebTransaction/RPMCollector/').should.equal(
+        ['WebTransaction/RPMCollector/AgentListener/connect'])
+
+
+def test_literal_prefix():
+    """
+    literal_prefix should only return what every match starts with
+    """
+    literal_prefix('^WebTransaction/Controller/.*').should.equal('WebTransaction/Controller/')
+    literal_prefix('^Web\\.x*').should.equal('Web.')
+    literal_prefix('WebTransaction').should.equal('')
+    literal_prefix('^Web|Errors').should.equal('')
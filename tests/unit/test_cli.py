@@ -0,0 +1,58 @@
+import csv
+import httpretty
+import os
+import re
+import shutil
+import tempfile
+
+from six import StringIO
+
+from pyrelic.cli import main
+
+from ..fixtures.sample_responses import METRIC_DATA_SAMPLE
+
+NEW_RELIC_REGEX = re.compile(".*.newrelic.com/.*")
+
+
+@httpretty.activate
+def test_cli_export():
+    """
+    pyrelic export should stream metric data to a file and report progress
+    """
+    httpretty.register_uri(httpretty.GET, NEW_RELIC_REGEX, body=METRIC_DATA_SAMPLE)
+    directory = tempfile.mkdtemp()
+    stderr = StringIO()
+    try:
+        path = os.path.join(directory, 'metrics.csv')
+
+        # When I export a window to CSV
+        status = main(['--account-id', '1', '--api-key', '2', 'export', '--app', '123456',
+                       '--metric', 'ActiveRecord/all', '--field', 'average_response_time',
+                       '--begin', '2011-04-20T15:47:00Z', '--end', '2011-04-20T15:52:00Z',
+                       '--chunk', '180', '--output', path], stderr=stderr)
+
+        # Then every period should be in the file
+        status.should.equal(0)
+        with open(path) as f:
+            rows = list(csv.reader(f))
+        rows[0].should.equal(['app', 'agent_id', 'name', 'begin', 'end', 'average_response_time'])
+        rows.should.have.length_of(6)
+        stderr.getvalue().should.contain("Exported 3/3 requests, 5 rows")
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_cli_export_errors():
+    """
+    pyrelic export should report what it cannot do
+    """
+    stderr = StringIO()
+
+    # When I ask for Parquet on standard output
+    status = main(['--account-id', '1', '--api-key', '2', 'export', '--app', '1', '--metric', 'Database/all',
+                   '--field', 'average_value', '--begin', '2011-04-20T15:47:00Z', '--end', '2011-04-20T15:52:00Z',
+                   '--format', 'parquet'], stderr=stderr)
+
+    # Then it should fail with a message
+    status.should.equal(1)
+    stderr.getvalue().should.contain("Parquet exports need an output file")
@@ -1,10 +1,19 @@
-import datetime
 import httpretty
+import itertools
+import os
 import re
+import tempfile
+import threading
+import time
 
 from mock import Mock
+from six.moves.urllib.parse import parse_qs
 
 from pyrelic import (Client,
+                     MetricStore,
+                     RequestCoalescer,
+                     ResponseCache,
+                     RateLimiter,
                      NewRelicCredentialException,
                      NewRelicApiException,
                      NewRelicApiRateLimitException,
@@ -12,6 +21,8 @@ from pyrelic import (Client,
                      NewRelicUnknownApplicationException,
                      NewRelicInvalidParameterException)
 
+from pyrelic.utils import from_epoch, to_epoch
+
 from ..fixtures.sample_responses import (METRIC_DATA_SAMPLE,
                                          METRIC_NAMES_SAMPLE,
                                          VIEW_APPLICATIONS_SAMPLE,
@@ -112,13 +123,10 @@ def test_api_rate_limit_exceeded_no_previous_call():
     API Rate limit should not trigger on first call
     """
     # When I make an API request with a rate limit and I am have no previous requests
-    def foobar():
-        pass
-
     c = Client(account_id="foo", api_key="bar")
 
     # Then I should not receive a API Rate Limit Timeout
-    c._api_rate_limit_exceeded(foobar).should.be.false
+    c._api_rate_limit_exceeded.when.called_with("foobar").should_not.throw(NewRelicApiRateLimitException)
 
 
 def test_api_rate_limit_exceeded_outside_window():
@@ -127,14 +135,12 @@ def test_api_rate_limit_exceeded_outside_window():
     """
     # When I make an API request with a rate limit and I am have a previous
     # request outside of the time window
-    def foobar():
-        pass
-
-    c = Client(account_id="foo", api_key="bar")
-    c.foobar_window = datetime.datetime.now() - datetime.timedelta(seconds=61)
+    c = Client(account_id="foo", api_key="bar", rate_limiter=RateLimiter(per=0.01))
+    c._api_rate_limit_exceeded("foobar")
+    time.sleep(0.02)
 
     # Then I should not receive a API Rate Limit Timeout
-    c._api_rate_limit_exceeded(foobar, window=60).should.be.false
+    c._api_rate_limit_exceeded.when.called_with("foobar").should_not.throw(NewRelicApiRateLimitException)
 
 
 def test_api_rate_limit_exceeded_inside_window():
@@ -143,17 +149,28 @@ def test_api_rate_limit_exceeded_inside_window():
     """
     # When I make an API request with a rate limit and I am have a previous
     # request inside of the time window
-    def foobar():
-        pass
-
     c = Client(account_id="foo", api_key="bar")
-    c.foobar_window = datetime.datetime.now() - datetime.timedelta(seconds=59)
+    c._api_rate_limit_exceeded("foobar")
 
     # Then I should receive a wait time
-    c._api_rate_limit_exceeded.when.called_with(foobar, window=60)\
+    c._api_rate_limit_exceeded.when.called_with("foobar")\
         .should.throw(NewRelicApiRateLimitException)
 
 
+def test_api_rate_limit_wait():
+    """
+    API Rate limit should sleep instead of raising when asked to wait
+    """
+    # When I make two rate limited API requests with waiting enabled
+    c = Client(account_id="foo", api_key="bar", rate_limiter=RateLimiter(per=0.05), wait_on_rate_limit=True)
+    start = time.time()
+    c._api_rate_limit_exceeded("foobar")
+    c._api_rate_limit_exceeded("foobar")
+
+    # Then the second should have waited for a token
+    (time.time() - start).should.be.greater_than(0.04)
+
+
 @httpretty.activate
 def test_view_applications():
     """
@@ -232,6 +249,37 @@ def test_get_threshold_values():
     result[0].should.be.a('pyrelic.Threshold')
 
 
+@httpretty.activate
+def test_get_application_summary_metrics():
+    """
+    Client should fetch the summary metrics of every application concurrently
+    """
+    requested = []
+
+    def respond(request, uri, headers):
+        path = uri.split('?')[0]
+        requested.append(path)
+        if path.endswith('/applications.xml'):
+            return (200, headers, VIEW_APPLICATIONS_SAMPLE)
+        app_id = path.split('/')[-2]
+        return (200, headers, THRESHOLD_VALUES_SAMPLE.replace('name="Apdex"', 'name="Apdex {0}"'.format(app_id)))
+
+    httpretty.register_uri(httpretty.GET, NEW_RELIC_REGEX, body=respond)
+    # When I ask for the summary metrics of every application
+    c = Client(account_id="1", api_key="2")
+    result = c.get_application_summary_metrics(max_workers=2)
+
+    # Then the applications should be listed and fetched one by one
+    len(requested).should.equal(3)
+    sorted(result).should.equal(['123', '124'])
+    result['124'].should.have.length_of(8)
+    result['124'][0].should.equal(('Apdex 124', 'Fri Dec 12 01:22:00 +0000 2008', 'Fri Dec 12 01:27:00 +0000 2008',
+                                   '0.96', '0.96 [1.0]*', '1'))
+
+    # And the whole call should count once against the rate limit
+    c.get_application_summary_metrics.when.called_with(['123']).should.throw(NewRelicApiRateLimitException)
+
+
 @httpretty.activate
 def test_delete_applications():
     """
@@ -315,6 +363,65 @@ def test_delete_servers_failure():
     # Then I should receive an array of failed deletions
     result.should.equal([{'server_id': '123456'}])
 
+@httpretty.activate
+def test_bulk_delete_applications():
+    """
+    Client should delete applications in batches and report on every one
+    """
+    posted = []
+
+    def respond(request, uri, headers):
+        form = parse_qs(request.body.decode('utf-8'))
+        posted.append(form)
+        if 'app[]' in form or 'app' in form:
+            # Deleting by name fails outright
+            return (422, headers, "Invalid parameter")
+        body = "".join('<application name="App {0}" id="{0}"><result>{1}</result></application>'.format(
+            app_id, 'failed' if app_id == '3' else 'deleted') for app_id in form['app_id[]'] if app_id != '4')
+        return (200, headers, '<?xml version="1.0" encoding="UTF-8"?><applications>' + body + '</applications>')
+
+    httpretty.register_uri(httpretty.POST, NEW_RELIC_REGEX, body=respond)
+    # When I delete applications by ID and name
+    c = Client(account_id="1", api_key="2")
+    report = c.bulk_delete_applications(["1", "My App", "2", "3", "4", "5"], batch_size=3, max_workers=1)
+
+    # Then IDs and names should be batched separately
+    posted.should.have.length_of(3)
+    sorted(form.get('app_id[]', []) for form in posted).should.equal([[], ["1", "2", "3"], ["4", "5"]])
+
+    # And every application should be reported on, in order
+    [d.item for d in report].should.equal(["1", "My App", "2", "3", "4", "5"])
+    [d.item for d in report.deleted].should.equal(["1", "2", "5"])
+    report.deletions[1].error.should.be.a(NewRelicInvalidParameterException)
+    (report.deletions[3].name, report.deletions[3].result).should.equal(("App 3", "failed"))
+    report.deletions[4].result.should.be.none
+
+
+@httpretty.activate
+def test_bulk_delete_servers():
+    """
+    Client should delete servers concurrently and report on every one
+    """
+    def respond(request, uri, headers):
+        server_id = uri.rsplit('/', 1)[-1].split('.')[0]
+        if server_id == '13':
+            return (404, headers, "Not Found")
+        return (200, headers, DELETE_SERVERS_SUCCESS_SAMPLE.replace('123456', server_id))
+
+    httpretty.register_uri(httpretty.DELETE, NEW_RELIC_REGEX, body=respond)
+    # When I delete a fleet of servers, one of which is already gone
+    c = Client(account_id="1", api_key="2",
+               rate_limiter=RateLimiter(limits={'delete_servers': (1000, 1, 1000)}))
+    report = c.bulk_delete_servers([str(server_id) for server_id in range(10, 20)], max_workers=4,
+                                   rate_limited=True)
+
+    # Then every server should be reported on, in order
+    [d.item for d in report].should.equal([str(server_id) for server_id in range(10, 20)])
+    len(report.deleted).should.equal(9)
+    [(d.item, type(d.error)) for d in report.failed].should.equal([("13", NewRelicUnknownApplicationException)])
+    c.stats()['delete_servers']['rate_limit_wait']['count'].should.equal(10)
+
+
 @httpretty.activate
 def test_notify_deployment_failure():
     """
@@ -385,3 +492,510 @@ def test_notify_deployment_by_name_success():
     result.should.have.key('agent-id')
     result['agent-id'].should.equal('456')
 
+
+
+@httpretty.activate
+def test_get_metric_data_sharded():
+    """
+    Client should fan out metric data requests over application shards
+    """
+    requested = []
+
+    def respond(request, uri, headers):
+        app_id = request.querystring.get('app_id[]', request.querystring.get('app_id'))[0]
+        requested.append(app_id)
+        body = METRIC_DATA_SAMPLE.replace('agent_id="123456"', 'agent_id="{0}"'.format(app_id))
+        return (200, headers, body)
+
+    httpretty.register_uri(httpretty.GET,
+                           NEW_RELIC_REGEX,
+                           body=respond
+                           )
+    # When I request metric data for several applications in shards
+    c = Client(account_id="1", api_key="2")
+    result = c.get_metric_data(["1", "2", "3", "4", "5"], ["bar"], "baz", "foobar", "foobaz",
+                               shard_size=2, max_workers=3)
+
+    # Then one request should be made per shard
+    sorted(requested).should.equal(["1", "3", "5"])
+
+    # And the Metrics should come back in the order of the applications
+    result.should.have.length_of(15)
+    [m.agent_id for m in result[::5]].should.equal(["1", "3", "5"])
+
+
+@httpretty.activate
+def test_get_metric_data_sharded_order():
+    """
+    Client should keep the order of the applications within shards
+    """
+    def respond(request, uri, headers):
+        app_ids = request.querystring.get('app_id[]', request.querystring.get('app_id'))
+        metrics = "".join('<metric agent_id="{0}" begin="{1}" end="{2}" name="bar"/>'.format(
+            app_id, request.querystring['begin'][0], request.querystring['end'][0]) for app_id in app_ids)
+        return (200, headers, '<metrics type="array">{0}</metrics>'.format(metrics))
+
+    httpretty.register_uri(httpretty.GET,
+                           NEW_RELIC_REGEX,
+                           body=respond
+                           )
+
+    # When I request metric data in shards, with or without chunks
+    for chunk in (None, 60):
+        c = Client(account_id="1", api_key="2")
+        result = c.get_metric_data(["9", "10", "8"], ["bar"], "baz", "2011-04-20T15:47:00Z",
+                                   "2011-04-20T15:49:00Z", shard_size=2, max_workers=1, chunk=chunk)
+
+        # Then the Metrics should come back in the order of the applications
+        [m.agent_id for m in result[::len(result) // 3]].should.equal(["9", "10", "8"])
+
+
+@httpretty.activate
+def test_iter_metric_names():
+    """
+    Client should be able to stream Metric names
+    """
+    httpretty.register_uri(httpretty.GET,
+                           NEW_RELIC_REGEX,
+                           body=METRIC_NAMES_SAMPLE,
+                           status=200
+                           )
+
+    # When I make a streaming API request for metric names
+    c = Client(account_id="1", api_key="2")
+    result = list(c.iter_metric_names("foo"))
+
+    # Then I should receive (name, fields) pairs in order
+    result.should.have.length_of(2)
+    result[0][0].should.equal('WebTransaction')
+    result[0][1].should.have.length_of(8)
+    result[1][0].should.equal('WebTransaction/RPMCollector/AgentListener/connect')
+
+
+def serve_metric_names(names, requested):
+    """
+    Answer get_metric_names like New Relic: the first limit names matching re
+    """
+    def respond(request, uri, headers):
+        pattern = request.querystring['re'][0]
+        limit = int(request.querystring['limit'][0])
+        requested.append(pattern)
+        matching = sorted(name for name in names if re.search(pattern, name))[:limit]
+        body = "".join('<metric name="{0}"><fields type="array"><field name="call_count"/></fields></metric>'
+                       .format(name) for name in matching)
+        return (200, headers, '<?xml version="1.0" encoding="UTF-8"?><metrics type="array">' + body + '</metrics>')
+    return respond
+
+
+METRIC_NAMES = ["Apdex", "Apdex/users", "Database/all", "Database/select", "Database/insert",
+                "Errors/all", "Errors/users", "External/all", "WebTransaction",
+                "WebTransaction/users/show", "WebTransaction/users/index", "WebTransaction/admin"]
+
+
+@httpretty.activate
+def test_iter_all_metric_names():
+    """
+    Client should page through every metric name by prefix
+    """
+    requested = []
+    httpretty.register_uri(httpretty.GET, NEW_RELIC_REGEX, body=serve_metric_names(METRIC_NAMES, requested))
+
+    # When I list the metrics of an application with more than limit metrics
+    c = Client(account_id="1", api_key="2", rate_limiter=RateLimiter(rate=1000, per=1, burst=1000))
+    names = list(c.iter_all_metric_names(123, limit=3))
+
+    # Then I should receive every name exactly once
+    sorted(name for name, _ in names).should.equal(sorted(METRIC_NAMES))
+    names[0][1].should.equal(['call_count'])
+    requested[0].should.equal('^')
+
+
+@httpretty.activate
+def test_iter_all_metric_names_checkpoint():
+    """
+    Client should resume listing metric names from a checkpoint
+    """
+    requested = []
+    httpretty.register_uri(httpretty.GET, NEW_RELIC_REGEX, body=serve_metric_names(METRIC_NAMES, requested))
+    c = Client(account_id="1", api_key="2", rate_limiter=RateLimiter(rate=1000, per=1, burst=1000))
+    checkpoint = os.path.join(tempfile.mkdtemp(), "names.json")
+
+    # When I am interrupted half way through
+    names = c.iter_all_metric_names(123, limit=3, checkpoint=checkpoint)
+    first = [name for name, _ in itertools.islice(names, 5)]
+    names.close()
+    os.path.exists(checkpoint).should.be.ok
+    del requested[:]
+
+    # Then the next run should only fetch what is left
+    rest = [name for name, _ in c.iter_all_metric_names(123, limit=3, checkpoint=checkpoint)]
+    set(first + rest).should.equal(set(METRIC_NAMES))
+    requested.shouldnt.contain('^')
+    os.path.exists(checkpoint).should_not.be.ok
+
+
+@httpretty.activate
+def test_iter_metric_data():
+    """
+    Client should be able to stream Metrics
+    """
+    httpretty.register_uri(httpretty.GET,
+                           NEW_RELIC_REGEX,
+                           body=METRIC_DATA_SAMPLE,
+                           status=200
+                           )
+    # When I make a streaming API request for metric data
+    c = Client(account_id="1", api_key="2")
+    result = c.iter_metric_data(["123"], ["bar"], "baz", "foobar", "foobaz")
+
+    # Then I should receive Metrics one at a time
+    first = next(result)
+    first.should.be.a('pyrelic.Metric')
+    first.begin.should.equal('2011-04-20T15:47:00Z')
+    first.average_response_time.should.equal('0')
+    list(result).should.have.length_of(4)
+
+
+@httpretty.activate
+def test_iter_metric_data_gzip():
+    """
+    Client should stream compressed Metrics
+    """
+    import gzip
+    import io
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+        f.write(METRIC_DATA_SAMPLE.encode('utf-8'))
+    httpretty.register_uri(httpretty.GET,
+                           NEW_RELIC_REGEX,
+                           body=buf.getvalue(),
+                           status=200,
+                           adding_headers={'Content-Encoding': 'gzip'}
+                           )
+    # When I make a streaming API request that returns gzipped data
+    c = Client(account_id="1", api_key="2")
+
+    # Then I should receive the decompressed Metrics
+    list(c.iter_metric_data(["123"], ["bar"], "baz", "foobar", "foobaz")).should.have.length_of(5)
+
+
+@httpretty.activate
+def test_get_metric_data_gzip():
+    """
+    Client should ask for compressed responses and parse them
+    """
+    import gzip
+    import io
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+        f.write(METRIC_DATA_SAMPLE.encode('utf-8'))
+    httpretty.register_uri(httpretty.GET,
+                           NEW_RELIC_REGEX,
+                           body=buf.getvalue(),
+                           status=200,
+                           adding_headers={'Content-Encoding': 'gzip'}
+                           )
+    # When I request Metrics that come back gzipped
+    c = Client(account_id="1", api_key="2")
+    metrics = c.get_metric_data(["123"], ["bar"], "baz", "foobar", "foobaz")
+
+    # Then I should have asked for compression and receive the Metrics
+    httpretty.last_request().headers['Accept-Encoding'].should.contain('gzip')
+    metrics.should.have.length_of(5)
+
+
+@httpretty.activate
+def test_get_metric_data_as_frame():
+    """
+    Client should be able to return Metrics as a MetricFrame
+    """
+    httpretty.register_uri(httpretty.GET,
+                           NEW_RELIC_REGEX,
+                           body=METRIC_DATA_SAMPLE,
+                           status=200
+                           )
+    # When I request metric data as a frame
+    c = Client(account_id="1", api_key="2")
+    result = c.get_metric_data(["123"], ["bar"], "baz", "foobar", "foobaz", as_frame=True)
+
+    # Then I should receive a MetricFrame
+    result.should.be.a('pyrelic.MetricFrame')
+    len(result).should.equal(5)
+    result['average_response_time'].sum().should.equal(0)
+
+
+@httpretty.activate
+def test_view_applications_cached():
+    """
+    Client should serve repeated requests from its cache
+    """
+    httpretty.register_uri(httpretty.GET, NEW_RELIC_REGEX,
+                           body=VIEW_APPLICATIONS_SAMPLE,
+                           status=200
+                           )
+
+    # When I view applications twice with a cache
+    c = Client(account_id="1", api_key="2", cache=ResponseCache())
+    c.view_applications()
+    httpretty.reset()
+    result = c.view_applications()
+
+    # Then the second call should be answered from memory
+    result.should.have.length_of(2)
+    result[0].name.should.equal("My Application")
+
+
+@httpretty.activate
+def test_get_metric_names_cached_skips_rate_limit():
+    """
+    Client should not spend rate limit tokens on cached Metric names
+    """
+    httpretty.register_uri(httpretty.GET,
+                           NEW_RELIC_REGEX,
+                           body=METRIC_NAMES_SAMPLE,
+                           status=200
+                           )
+
+    # When I request the same metric names twice with a parsed cache
+    c = Client(account_id="1", api_key="2", cache=ResponseCache(parsed=True))
+    c.get_metric_names("foo")
+
+    # Then the second call should neither hit the API nor the rate limit
+    c.get_metric_names("foo").should.have.key('WebTransaction')
+
+    # But a different query still should
+    c.get_metric_names.when.called_with("foo", re="bar")\
+        .should.throw(NewRelicApiRateLimitException)
+
+
+def serve_resolutions(requested, shards=None):
+    """
+    Answer metric data requests like New Relic does, by the minute for up to
+    three hours and by the hour for longer windows
+    """
+    def respond(request, uri, headers):
+        begin, end = request.querystring['begin'][0], request.querystring['end'][0]
+        apps = request.querystring.get('app_id[]') or request.querystring['app_id']
+        requested.append((begin, end))
+        if shards is not None:
+            shards.append(sorted(apps))
+        begin, end = to_epoch(begin), to_epoch(end)
+        length = 60 if end - begin <= 3 * 3600 else 3600
+        metrics = "".join(
+            '<metric agent_id="{0}" begin="{1}" end="{2}" name="ActiveRecord/all">'
+            '<field name="average_response_time">{3}</field></metric>'.format(
+                app, from_epoch(start), from_epoch(start + length), length)
+            for app in apps for start in range(begin - begin % length, end, length))
+        return (200, headers, '<metrics type="array">{0}</metrics>'.format(metrics))
+
+    httpretty.register_uri(httpretty.GET,
+                           NEW_RELIC_REGEX,
+                           body=respond
+                           )
+
+
+@httpretty.activate
+def test_get_metric_data_with_store():
+    """
+    Client should only fetch metric data missing from its store
+    """
+    requested = []
+    serve_resolutions(requested)
+    store = MetricStore(os.path.join(tempfile.mkdtemp(), "metrics.db"), min_age=0)
+    c = Client(account_id="1", api_key="2", metric_store=store, rate_limiter=RateLimiter(per=0.01))
+
+    # When I fetch a window of metric data
+    first = c.get_metric_data(["123456"], ["ActiveRecord/all"], "average_response_time",
+                              "2011-04-20T15:47:00Z", "2011-04-20T15:50:00Z")
+
+    # Then the periods inside the window should be returned
+    [m.begin for m in first].should.equal(['2011-04-20T15:47:00Z', '2011-04-20T15:48:00Z',
+                                           '2011-04-20T15:49:00Z'])
+
+    # When I slide the window along
+    time.sleep(0.02)
+    second = c.get_metric_data(["123456"], ["ActiveRecord/all"], "average_response_time",
+                               "2011-04-20T15:49:00Z", "2011-04-20T15:52:00Z")
+
+    # Then only the missing part should have been requested, as a window as long
+    requested.should.equal([('2011-04-20T15:47:00Z', '2011-04-20T15:50:00Z'),
+                            ('2011-04-20T15:49:00Z', '2011-04-20T15:52:00Z')])
+    [m.begin[14:16] for m in second].should.equal(['49', '50', '51'])
+    second[0].average_response_time.should.equal('60')
+
+    # And a window we already hold should not be requested at all
+    time.sleep(0.02)
+    c.get_metric_data(["123456"], ["ActiveRecord/all"], "average_response_time",
+                      "2011-04-20T15:48:00Z", "2011-04-20T15:51:00Z").should.have.length_of(3)
+    requested.should.have.length_of(2)
+
+
+@httpretty.activate
+def test_get_metric_data_with_store_resolutions():
+    """
+    Client should not mix periods of different lengths from its store
+    """
+    requested = []
+    serve_resolutions(requested)
+    store = MetricStore(os.path.join(tempfile.mkdtemp(), "metrics.db"), min_age=0)
+    c = Client(account_id="1", api_key="2", metric_store=store, rate_limiter=RateLimiter(per=0.01))
+
+    # When I fetch an hour and then the day around it
+    hour = c.get_metric_data(["123456"], ["ActiveRecord/all"], "average_response_time",
+                             "2011-04-20T12:00:00Z", "2011-04-20T13:00:00Z")
+    time.sleep(0.02)
+    day = c.get_metric_data(["123456"], ["ActiveRecord/all"], "average_response_time",
+                            "2011-04-20T00:00:00Z", "2011-04-21T00:00:00Z")
+
+    # Then each should only hold periods of its own length
+    set(m.average_response_time for m in hour).should.equal(set(['60']))
+    set(m.average_response_time for m in day).should.equal(set(['3600']))
+    day.should.have.length_of(24)
+
+    # And going back to the hour should not need New Relic
+    time.sleep(0.02)
+    c.get_metric_data(["123456"], ["ActiveRecord/all"], "average_response_time",
+                      "2011-04-20T12:00:00Z", "2011-04-20T13:00:00Z").should.have.length_of(60)
+    requested.should.have.length_of(2)
+
+
+@httpretty.activate
+def test_get_metric_data_with_store_sharded():
+    """
+    Client should shard the requests for data missing from its store
+    """
+    requested = []
+    shards = []
+    serve_resolutions(requested, shards)
+    store = MetricStore(os.path.join(tempfile.mkdtemp(), "metrics.db"), min_age=0)
+    c = Client(account_id="1", api_key="2", metric_store=store, rate_limiter=RateLimiter(per=0.01))
+
+    # When I fetch three applications one at a time
+    metrics = c.get_metric_data(["1", "2", "3"], ["ActiveRecord/all"], "average_response_time",
+                                "2011-04-20T15:47:00Z", "2011-04-20T15:50:00Z", shard_size=1)
+
+    # Then every application should have been its own request
+    sorted(shards).should.equal([['1'], ['2'], ['3']])
+    [m.agent_id for m in metrics].should.equal(['1'] * 3 + ['2'] * 3 + ['3'] * 3)
+
+    # And so should the gaps of the next window
+    time.sleep(0.02)
+    del shards[:]
+    c.get_metric_data(["1", "2", "3"], ["ActiveRecord/all"], "average_response_time",
+                      "2011-04-20T15:50:00Z", "2011-04-20T15:53:00Z", shard_size=2)
+    sorted(shards).should.equal([['1', '2'], ['3']])
+
+
+@httpretty.activate
+def test_get_metric_data_chunked():
+    """
+    Client should split long metric data windows into chunks
+    """
+    requested = []
+
+    def respond(request, uri, headers):
+        requested.append(request.querystring['begin'][0])
+        return (200, headers, METRIC_DATA_SAMPLE)
+
+    httpretty.register_uri(httpretty.GET,
+                           NEW_RELIC_REGEX,
+                           body=respond
+                           )
+    # When I request a window in three minute chunks
+    c = Client(account_id="1", api_key="2")
+    result = c.get_metric_data(["123456"], ["ActiveRecord/all"], "average_response_time",
+                               "2011-04-20T15:47:00Z", "2011-04-20T15:52:00Z", chunk=180)
+
+    # Then each chunk should be requested
+    sorted(requested).should.equal(['2011-04-20T15:47:00Z', '2011-04-20T15:48:00Z', '2011-04-20T15:51:00Z'])
+
+    # And the periods should be stitched together without duplicates
+    [m.begin[14:16] for m in result].should.equal(['47', '48', '49', '50', '51'])
+
+
+@httpretty.activate
+def test_iter_metric_data_chunked():
+    """
+    Client should stream long metric data windows chunk by chunk
+    """
+    httpretty.register_uri(httpretty.GET,
+                           NEW_RELIC_REGEX,
+                           body=METRIC_DATA_SAMPLE,
+                           status=200
+                           )
+    # When I stream a window in chunks which return overlapping periods
+    c = Client(account_id="1", api_key="2")
+    result = list(c.iter_metric_data(["123456"], ["ActiveRecord/all"], "average_response_time",
+                                     "2011-04-20T15:47:00Z", "2011-04-20T15:52:00Z", chunk=180))
+
+    # Then every period should only be yielded once
+    [m.begin[14:16] for m in result].should.equal(['47', '48', '49', '50', '51'])
+
+
+@httpretty.activate
+def test_get_metric_data_coalesced():
+    """
+    Client should merge concurrent metric data requests for the same window
+    """
+    requested = []
+
+    def respond(request, uri, headers):
+        metrics = request.querystring['metrics[]']
+        requested.append(sorted(metrics))
+        body = "".join(METRIC_DATA_SAMPLE.replace('ActiveRecord/all', metric) for metric in metrics)
+        return (200, headers, '<metrics type="array">{0}</metrics>'.format(
+            body.replace('<?xml version="1.0" encoding="UTF-8"?>', '')))
+
+    httpretty.register_uri(httpretty.GET,
+                           NEW_RELIC_REGEX,
+                           body=respond
+                           )
+    # When two threads ask for different metrics over the same window
+    c = Client(account_id="1", api_key="2", coalescer=RequestCoalescer(window=0.2))
+    results = {}
+
+    def fetch(metric):
+        results[metric] = c.get_metric_data(["123456"], [metric], "average_response_time",
+                                            "2011-04-20T15:47:00Z", "2011-04-20T15:52:00Z")
+    threads = [threading.Thread(target=fetch, args=(metric,)) for metric in ("Foo", "Bar")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Then a single request should be made, using a single rate limit token
+    requested.should.equal([["Bar", "Foo"]])
+
+    # And each thread should only get its own metrics
+    set(m.name for m in results["Foo"]).should.equal(set(["Foo"]))
+    set(m.name for m in results["Bar"]).should.equal(set(["Bar"]))
+    results["Foo"].should.have.length_of(5)
+
+
+@httpretty.activate
+def test_client_stats():
+    """
+    Client should record per API method statistics
+    """
+    httpretty.register_uri(httpretty.GET,
+                           NEW_RELIC_REGEX,
+                           body=VIEW_SERVERS_SAMPLE,
+                           status=200
+                           )
+    observer = Mock()
+
+    # When I make the same call twice with a cache
+    c = Client(account_id="1", api_key="2", cache=ResponseCache(), observers=[observer])
+    c.view_servers()
+    c.view_servers()
+
+    # Then both calls and the cache hit should be recorded
+    stats = c.stats()['view_servers']
+    stats['requests'].should.equal(2)
+    stats['cache_hits'].should.equal(1)
+    stats['bytes']['sum'].should.equal(len(VIEW_SERVERS_SAMPLE))
+    stats['latency']['count'].should.equal(2)
+
+    # And other observers should see every record
+    observer.on_request.call_count.should.equal(2)
+    observer.on_request.call_args[0][0].endpoint.should.equal('view_servers')
@@ -0,0 +1,79 @@
+import threading
+
+from xml.etree import ElementTree as etree
+
+from pyrelic import RequestCoalescer
+
+
+def element(agent_id, name):
+    return etree.Element('metric', {'agent_id': agent_id, 'name': name})
+
+
+def run_together(coalescer, requests, fetch):
+    results = [None] * len(requests)
+    errors = [None] * len(requests)
+
+    def call(index):
+        applications, metrics = requests[index]
+        try:
+            results[index] = coalescer.submit('key', applications, metrics, fetch, 'agent_id')
+        except Exception as e:
+            errors[index] = e
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_coalescer_merges_requests():
+    """
+    RequestCoalescer should merge concurrent requests and slice the results
+    """
+    calls = []
+
+    def fetch(applications, metrics):
+        calls.append((sorted(applications), sorted(metrics)))
+        return [element(app, metric) for app in applications for metric in metrics]
+
+    # When two callers ask for different metrics at the same time
+    coalescer = RequestCoalescer(window=0.2)
+    results, errors = run_together(coalescer, [([1], ['Foo']), ([1, 2], ['Bar'])], fetch)
+
+    # Then a single merged call should be made
+    calls.should.equal([(['1', '2'], ['Bar', 'Foo'])])
+
+    # And each caller should only get what it asked for
+    [(e.get('agent_id'), e.get('name')) for e in results[0]].should.equal([('1', 'Foo')])
+    sorted((e.get('agent_id'), e.get('name')) for e in results[1]).should.equal([('1', 'Bar'), ('2', 'Bar')])
+
+
+def test_coalescer_respects_batch_limits():
+    """
+    RequestCoalescer should start a new batch once one is full
+    """
+    calls = []
+
+    def fetch(applications, metrics):
+        calls.append(sorted(metrics))
+        return []
+
+    coalescer = RequestCoalescer(window=0.2, max_metrics=1)
+    run_together(coalescer, [([1], ['Foo']), ([1], ['Bar'])], fetch)
+
+    sorted(calls).should.equal([['Bar'], ['Foo']])
+
+
+def test_coalescer_shares_errors():
+    """
+    RequestCoalescer should raise errors from a merged call in every caller
+    """
+    def fetch(applications, metrics):
+        raise ValueError("boom")
+
+    coalescer = RequestCoalescer(window=0.2)
+    results, errors = run_together(coalescer, [([1], ['Foo']), ([1], ['Bar'])], fetch)
+
+    [type(error) for error in errors].should.equal([ValueError, ValueError])
@@ -0,0 +1,68 @@
+import threading
+import time
+
+from pyrelic.concurrency import bounded_map, chunks
+
+
+def test_chunks():
+    """
+    chunks should split a sequence into consecutive lists
+    """
+    # When I chunk a list
+    result = chunks([1, 2, 3, 4, 5], 2)
+
+    # Then I should receive the items in order
+    result.should.equal([[1, 2], [3, 4], [5]])
+
+
+def test_chunks_without_size():
+    """
+    chunks should return a single chunk without a size
+    """
+    chunks([1, 2, 3], None).should.equal([[1, 2, 3]])
+
+
+def test_bounded_map_keeps_order():
+    """
+    bounded_map should return results in the order of the inputs
+    """
+    # When I map a function that finishes out of order
+    def slow_square(x):
+        time.sleep(0.01 * (5 - x))
+        return x * x
+
+    # Then the results should keep the order of the inputs
+    bounded_map(slow_square, range(5), 5).should.equal([0, 1, 4, 9, 16])
+
+
+def test_bounded_map_limits_concurrency():
+    """
+    bounded_map should not run more than max_workers calls at once
+    """
+    lock = threading.Lock()
+    state = {'running': 0, 'peak': 0}
+
+    def work(x):
+        with lock:
+            state['running'] += 1
+            state['peak'] = max(state['peak'], state['running'])
+        time.sleep(0.01)
+        with lock:
+            state['running'] -= 1
+        return x
+
+    # When I map over many items with two workers
+    bounded_map(work, range(10), 2)
+
+    # Then no more than two should have run at the same time
+    state['peak'].should.be.lower_than(3)
+
+
+def test_bounded_map_raises():
+    """
+    bounded_map should raise the errors of the mapped function
+    """
+    def fail(x):
+        raise ValueError(x)
+
+    bounded_map.when.called_with(fail, [1, 2], 2).should.throw(ValueError)
@@ -0,0 +1,156 @@
+import os
+import tempfile
+import threading
+
+from xml.etree.ElementTree import ParseError
+
+import requests
+
+from mock import Mock
+
+from pyrelic import (Client,
+                     DeploymentQueue,
+                     NewRelicInvalidParameterException,
+                     RetryPolicy)
+
+
+def new_spool():
+    return os.path.join(tempfile.mkdtemp(), "deployments.db")
+
+
+def new_client(side_effect=None):
+    c = Client(account_id="1", api_key="2")
+    c._make_post_request = Mock(side_effect=side_effect, return_value={'id': '1'})
+    return c
+
+
+def quick_retries(retries=3):
+    return RetryPolicy(retries=retries, backoff=0.01, max_delay=0.01, budget=False)
+
+
+def test_queue_notify_returns_at_once():
+    """
+    DeploymentQueue should spool notifications and send them in the background
+    """
+    # When New Relic is slow
+    sent = threading.Event()
+    c = new_client(side_effect=lambda *args, **kwargs: sent.wait(5))
+    queue = DeploymentQueue(c, new_spool(), poll_interval=0.01)
+
+    # Then notify should not wait for it
+    queue.notify(application_id=123, description="deploy", revision="abc")
+    queue.pending().should.equal(1)
+
+    # And the event should be delivered once it answers
+    sent.set()
+    queue.close(timeout=5).should.be.ok
+    uri, payload = c._make_post_request.call_args[0]
+    uri.should.equal("https://rpm.newrelic.com/deployments.xml")
+    payload.should.equal({'deployment[application_id]': 123, 'deployment[description]': 'deploy',
+                          'deployment[revision]': 'abc'})
+
+
+def test_queue_survives_restarts():
+    """
+    DeploymentQueue should send events spooled before a restart
+    """
+    # When events are spooled but never sent
+    spool = new_spool()
+    queue = DeploymentQueue(new_client(), spool, start=False)
+    queue.notify(application_id=1)
+    queue.notify(application_name="My App")
+    queue.close().should_not.be.ok
+
+    # Then the next queue on the same spool should send them
+    c = new_client()
+    queue = DeploymentQueue(c, spool, poll_interval=0.01)
+    queue.flush(timeout=5).should.be.ok
+    queue.close()
+    c._make_post_request.call_count.should.equal(2)
+
+
+def test_queue_retries():
+    """
+    DeploymentQueue should retry failed notifications
+    """
+    # When New Relic fails twice
+    failures = [requests.ConnectionError(), requests.Timeout()]
+
+    def send(*args, **kwargs):
+        if failures:
+            raise failures.pop(0)
+
+    c = new_client(side_effect=send)
+    queue = DeploymentQueue(c, new_spool(), retry_policy=quick_retries(), poll_interval=0.01)
+    queue.notify(application_id=1)
+
+    # Then the event should be delivered on the third attempt
+    queue.close(timeout=5).should.be.ok
+    c._make_post_request.call_count.should.equal(3)
+
+
+def test_queue_retries_unexpected_errors():
+    """
+    DeploymentQueue should keep working through unexpected errors
+    """
+    # When New Relic answers with something we cannot parse
+    failures = [ParseError("not XML")]
+
+    def send(*args, **kwargs):
+        if failures:
+            raise failures.pop(0)
+
+    c = new_client(side_effect=send)
+    queue = DeploymentQueue(c, new_spool(), max_workers=1, retry_policy=quick_retries(), poll_interval=0.01)
+    queue.notify(application_id=1)
+
+    # Then the event should still be delivered by the same worker
+    queue.close(timeout=5).should.be.ok
+    c._make_post_request.call_count.should.equal(2)
+
+
+def test_queue_failed():
+    """
+    DeploymentQueue should keep the events it gives up on
+    """
+    # When New Relic rejects an event
+    c = new_client(side_effect=NewRelicInvalidParameterException("422"))
+    queue = DeploymentQueue(c, new_spool(), retry_policy=quick_retries(), poll_interval=0.01)
+    event_id = queue.notify(application_id=1)
+    queue.flush(timeout=5).should.be.ok
+
+    # Then it should not be retried but kept aside
+    c._make_post_request.call_count.should.equal(1)
+    [(failed_id, error) for failed_id, _, error in queue.failed()].should.equal([(event_id, "NewRelicInvalidParameterException")])
+
+    # Until we ask for it to be sent again
+    c._make_post_request.side_effect = None
+    queue.retry_failed()
+    queue.close(timeout=5).should.be.ok
+    c._make_post_request.call_count.should.equal(2)
+
+
+def test_queue_validates_parameters():
+    """
+    DeploymentQueue should reject notifications without an application
+    """
+    queue = DeploymentQueue(new_client(), new_spool(), start=False)
+    queue.notify.when.called_with(description="deploy").should.throw(NewRelicInvalidParameterException)
+    queue.close()
+
+
+def test_queue_close_timeout():
+    """
+    DeploymentQueue should leave unsent events in the spool when closing
+    """
+    # When New Relic is down while we close the queue
+    spool = new_spool()
+    c = new_client(side_effect=requests.ConnectionError())
+    queue = DeploymentQueue(c, spool, retry_policy=quick_retries(retries=1000), poll_interval=0.01)
+    queue.notify(application_id=1)
+
+    # Then close should give up waiting
+    queue.close(timeout=0.1).should_not.be.ok
+
+    # And the event should still be spooled
+    DeploymentQueue(new_client(), spool, start=False).pending().should.equal(1)
@@ -0,0 +1,122 @@
+import httpretty
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from nose.plugins.skip import SkipTest
+
+from pyrelic import Client, CsvWriter, JsonLinesWriter
+from pyrelic.export import COLUMNS, export_metric_data, guess_format, open_writer
+
+from ..fixtures.sample_responses import METRIC_DATA_SAMPLE
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+NEW_RELIC_REGEX = re.compile(".*.newrelic.com/.*")
+
+
+class ListWriter(object):
+    def __init__(self):
+        self.writes = []
+
+    def write(self, rows):
+        self.writes.append(rows)
+
+
+def serve(requested):
+    def respond(request, uri, headers):
+        requested.append((request.querystring['begin'][0], request.querystring['app_id'][0]))
+        return (200, headers, METRIC_DATA_SAMPLE)
+    httpretty.register_uri(httpretty.GET, NEW_RELIC_REGEX, body=respond)
+
+
+@httpretty.activate
+def test_export_metric_data():
+    """
+    export_metric_data should write every period once, batch by batch
+    """
+    requested = []
+    serve(requested)
+    writer = ListWriter()
+    progress = []
+
+    # When I export a window in three minute chunks, one application per request
+    c = Client(account_id="1", api_key="2")
+    count = export_metric_data(c, ["123456", "654321"], ["ActiveRecord/all"], ["average_response_time"],
+                               "2011-04-20T15:47:00Z", "2011-04-20T15:52:00Z", writer, chunk=180, shard_size=1,
+                               max_workers=2, progress=lambda *args: progress.append(args))
+
+    # Then every window and application should be requested
+    sorted(requested).should.equal([(begin, app) for begin in ('2011-04-20T15:47:00Z', '2011-04-20T15:48:00Z',
+                                                               '2011-04-20T15:51:00Z')
+                                    for app in ('123456', '654321')])
+
+    # And the rows should be written one batch at a time without repeated periods
+    writer.writes.should.have.length_of(3)
+    rows = [row for rows in writer.writes for row in rows]
+    [row[3][14:16] for row in rows].should.equal(['47', '48', '49', '50', '51'])
+    rows[0].should.equal(('My Application', '123456', 'ActiveRecord/all', '2011-04-20T15:47:00Z',
+                          '2011-04-20T15:48:00Z', '0'))
+    count.should.equal(5)
+    progress.should.equal([(2, 6, 5), (4, 6, 5), (6, 6, 5)])
+
+
+def test_text_writers():
+    """
+    CsvWriter and JsonLinesWriter should write a row per line
+    """
+    columns = COLUMNS + ('average_value', 'call_count')
+    row = ('App', '1', 'Database/all', '2011-04-20T15:47:00Z', '2011-04-20T15:48:00Z', '1.5', None)
+
+    stream = io.StringIO()
+    CsvWriter(stream, columns).write([row])
+    stream.getvalue().splitlines().should.equal([
+        'app,agent_id,name,begin,end,average_value,call_count',
+        'App,1,Database/all,2011-04-20T15:47:00Z,2011-04-20T15:48:00Z,1.5,'])
+
+    stream = io.StringIO()
+    JsonLinesWriter(stream, columns).write([row, row])
+    lines = stream.getvalue().splitlines()
+    lines.should.have.length_of(2)
+    json.loads(lines[0]).should.equal({'app': 'App', 'agent_id': '1', 'name': 'Database/all',
+                                       'begin': '2011-04-20T15:47:00Z', 'end': '2011-04-20T15:48:00Z',
+                                       'average_value': 1.5, 'call_count': None})
+
+
+def test_parquet_writer():
+    """
+    ParquetWriter should write a row group per write
+    """
+    if pyarrow is None:
+        raise SkipTest("pyarrow is not installed")
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'metrics.parquet')
+        writer, stream = open_writer('parquet', path, COLUMNS + ('average_value',))
+        row = ('App', '1', 'Database/all', '2011-04-20T15:47:00Z', '2011-04-20T15:48:00Z', '1.5')
+        writer.write([row, row])
+        writer.write([row])
+        writer.close()
+
+        parquet = pyarrow.parquet.ParquetFile(path)
+        parquet.metadata.num_row_groups.should.equal(2)
+        parquet.read().column('average_value').to_pylist().should.equal([1.5, 1.5, 1.5])
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_open_writer():
+    """
+    open_writer should pick formats and refuse what it can't write
+    """
+    guess_format('march.parquet').should.equal('parquet')
+    guess_format('march.JSONL').should.equal('jsonl')
+    guess_format('-').should.be.none
+    open_writer.when.called_with('xml', '-', COLUMNS).should.throw(ValueError)
+    open_writer.when.called_with('parquet', '-', COLUMNS).should.throw(ValueError)
@@ -0,0 +1,107 @@
+import math
+
+from xml.etree import ElementTree as etree
+
+from nose.plugins.skip import SkipTest
+
+from pyrelic import MetricFrame
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+SAMPLE = """<metrics type="array">
+  <metric app="App 1" agent_id="1" begin="2011-04-20T15:47:00Z" end="2011-04-20T15:48:00Z" name="Database/select">
+    <field type="float" name="average_value">1.5</field>
+    <field type="integer" name="call_count">10</field>
+  </metric>
+  <metric app="App 1" agent_id="1" begin="2011-04-20T15:48:00Z" end="2011-04-20T15:49:00Z" name="Database/select">
+    <field type="float" name="average_value">2.5</field>
+  </metric>
+  <metric app="App 2" agent_id="2" begin="2011-04-20T15:47:00Z" end="2011-04-20T15:48:00Z" name="Database/update">
+    <field type="float" name="average_value">4.0</field>
+    <field type="integer" name="call_count">3</field>
+  </metric>
+</metrics>"""
+
+
+def sample_frame():
+    if numpy is None:
+        raise SkipTest("numpy is not installed")
+    return MetricFrame.from_elements(etree.fromstring(SAMPLE).findall('.//metric'))
+
+
+def test_frame_from_elements():
+    """
+    MetricFrame should build typed columns from metric elements
+    """
+    # When I build a frame from a response
+    f = sample_frame()
+
+    # Then it should hold parallel typed columns
+    len(f).should.equal(3)
+    f.app_id.dtype.should.equal(numpy.int64)
+    f.app_id.tolist().should.equal([1, 1, 2])
+    f.name.tolist().should.equal(['Database/select', 'Database/select', 'Database/update'])
+    f.begin.tolist().should.equal([1303314420, 1303314480, 1303314420])
+    f.end.dtype.should.equal(numpy.int64)
+    f['average_value'].tolist().should.equal([1.5, 2.5, 4.0])
+
+
+def test_frame_missing_fields_are_nan():
+    """
+    MetricFrame should fill fields missing from a period with NaN
+    """
+    f = sample_frame()
+    values = f['call_count'].tolist()
+    values[0].should.equal(10.0)
+    math.isnan(values[1]).should.be.true
+    values[2].should.equal(3.0)
+
+
+def test_frame_filter():
+    """
+    MetricFrame should filter rows without Python loops
+    """
+    f = sample_frame()
+
+    # When I filter by name
+    selected = f.filter(name='Database/select')
+
+    # Then I should only get those rows
+    len(selected).should.equal(2)
+    selected.filter(begin='2011-04-20T15:48:00Z')['average_value'].tolist().should.equal([2.5])
+    len(f.filter(app_id=[2])).should.equal(1)
+    len(f.filter(mask=f['average_value'] > 2)).should.equal(2)
+
+
+def test_frame_aggregate():
+    """
+    MetricFrame should aggregate fields, ignoring missing values
+    """
+    f = sample_frame()
+    f.aggregate('average_value', 'sum').should.equal(8.0)
+    f.aggregate('call_count', 'mean').should.equal(6.5)
+    f.aggregate('call_count', 'count').should.equal(2)
+    f.aggregate('average_value', 'max').should.equal(4.0)
+    f.aggregate.when.called_with('average_value', 'median').should.throw(ValueError)
+
+
+def test_frame_groupby():
+    """
+    MetricFrame should aggregate fields per group
+    """
+    f = sample_frame()
+    f.groupby('name', 'average_value', 'mean').should.equal({'Database/select': 2.0, 'Database/update': 4.0})
+    f.groupby('app_id', 'average_value', 'min').should.equal({1: 1.5, 2: 4.0})
+
+
+def test_frame_concat():
+    """
+    MetricFrame should stack frames in order
+    """
+    f = sample_frame()
+    stacked = MetricFrame.concat([f.filter(app_id=2), f.filter(app_id=1)])
+    stacked.app_id.tolist().should.equal([2, 1, 1])
+    stacked['average_value'].tolist().should.equal([4.0, 1.5, 2.5])
@@ -1,3 +1,7 @@
+import pickle
+
+from xml.etree import ElementTree as etree
+
 from mock import Mock, MagicMock
 
 from pyrelic import Metric
@@ -24,3 +28,76 @@ def test_metric_initialization():
     m.xpath_values.should.be("xpath_text")
     m.foo.should.be("bar")
     m.foobar.should.be("baz")
+
+
+def metric_element():
+    return etree.fromstring('<metric app="My Application" begin="2011-04-20T15:47:00Z" name="ActiveRecord/all">'
+                            '<field name="average_response_time">12.5</field><field name="call_count">3</field></metric>')
+
+
+def test_metric_vars():
+    """
+    Metrics should still list their properties through vars()
+    """
+    m = Metric(metric_element())
+    vars(m).should.equal({'app': 'My Application', 'begin': '2011-04-20T15:47:00Z', 'name': 'ActiveRecord/all',
+                          'average_response_time': '12.5', 'call_count': '3'})
+
+    # Without keeping a per-instance __dict__
+    m.__dict__['app'] = 'Other'
+    m.app.should.equal('My Application')
+    Metric.__slots__.should.equal(('_index', '_values'))
+
+
+def test_metric_missing_attribute():
+    """
+    Metrics should raise AttributeError for unknown properties
+    """
+    m = Metric(metric_element())
+    getattr.when.called_with(m, 'foo').should.throw(AttributeError)
+
+
+def test_metric_shares_index():
+    """
+    Metrics with the same properties should share one index
+    """
+    first = Metric(metric_element())
+    second = Metric(metric_element())
+    first._index.should.be(second._index)
+
+
+def test_metric_set_attribute():
+    """
+    Metrics should still accept new and updated attributes
+    """
+    # When I set attributes on a metric
+    m = Metric(metric_element())
+    m.call_count = "4"
+    m.foo = "bar"
+
+    # Then they should be readable
+    m.call_count.should.equal("4")
+    m.foo.should.equal("bar")
+    m.average_response_time.should.equal("12.5")
+
+
+def test_metric_as_number():
+    """
+    Metrics should convert values to numbers on request
+    """
+    m = Metric(metric_element())
+    m.as_number('average_response_time').should.equal(12.5)
+    m.as_number('call_count').should.equal(3)
+
+
+def test_metric_pickle():
+    """
+    Metrics should survive a pickle round trip
+    """
+    m = pickle.loads(pickle.dumps(Metric(metric_element())))
+    m.name.should.equal("ActiveRecord/all")
+    m.items().should.equal([('app', 'My Application'),
+                            ('begin', '2011-04-20T15:47:00Z'),
+                            ('name', 'ActiveRecord/all'),
+                            ('average_response_time', '12.5'),
+                            ('call_count', '3')])
@@ -0,0 +1,100 @@
+import io
+
+from pyrelic.metric import Metric
+from pyrelic.parsers import ACCELERATED_ETREE, EtreeParser, LxmlParser, SaxParser, get_parser, lxml_etree
+
+from ..fixtures.sample_responses import (METRIC_DATA_SAMPLE,
+                                         METRIC_NAMES_SAMPLE,
+                                         VIEW_APPLICATIONS_SAMPLE,
+                                         THRESHOLD_VALUES_SAMPLE,
+                                         DELETE_APPLICATION_SUCCESS_SAMPLE,
+                                         VIEW_SERVERS_SAMPLE,
+                                         DELETE_SERVERS_FAILURE_SAMPLE,
+                                         NOTIFY_DEPLOYMENT_SUCCESS
+                                         )
+
+
+def parsers():
+    available = [EtreeParser(), SaxParser()]
+    if lxml_etree is not None:
+        available.append(LxmlParser())
+    return available
+
+
+def test_parsers_agree_on_records():
+    """
+    Every parser should build the same records
+    """
+    for parser in parsers():
+        applications = parser.applications(VIEW_APPLICATIONS_SAMPLE)
+        [(a.app_id, a.name, a.overview_url) for a in applications].should.equal([
+            ('123', 'My Application', 'https://rpm.newrelic.com/accounts/1/applications/123'),
+            ('124', 'My Application2', 'https://rpm.newrelic.com/accounts/1/applications/124')])
+
+        servers = parser.servers(VIEW_SERVERS_SAMPLE)
+        [(s.server_id, s.hostname) for s in servers].should.equal([
+            ('555', 'my-hostname.newrelic.com'), ('556', 'my-hostname-2.newrelic.com')])
+
+        thresholds = parser.threshold_values(THRESHOLD_VALUES_SAMPLE)
+        thresholds.should.have.length_of(8)
+        (thresholds[0].name, thresholds[0].metric_value).should.equal(('Apdex', '0.96'))
+
+        parser.application_deletions(DELETE_APPLICATION_SUCCESS_SAMPLE).should.equal({'app_id': '2345'})
+        parser.server_deletions(DELETE_SERVERS_FAILURE_SAMPLE).should.equal([{'server_id': '123456'}])
+        parser.application_results(DELETE_APPLICATION_SUCCESS_SAMPLE).should.equal([
+            {'id': '1234', 'name': 'MyApp', 'result': 'deleted'},
+            {'id': '2345', 'name': 'MyApp 2', 'result': 'failed'}])
+
+        deployment = parser.deployment(NOTIFY_DEPLOYMENT_SUCCESS)
+        (deployment['revision'], deployment['changelog']).should.equal(('test', None))
+
+
+def test_parsers_agree_on_metrics():
+    """
+    Every parser should read metric names and data the same way
+    """
+    for parser in parsers():
+        names = parser.metric_names(METRIC_NAMES_SAMPLE)
+        sorted(names).should.equal(['WebTransaction', 'WebTransaction/RPMCollector/AgentListener/connect'])
+        names['WebTransaction'].should.have.length_of(8)
+
+        metrics = parser.metric_data(METRIC_DATA_SAMPLE)
+        [(m.agent_id, m.begin, m.average_response_time) for m in metrics[:2]].should.equal([
+            ('123456', '2011-04-20T15:47:00Z', '0'), ('123456', '2011-04-20T15:48:00Z', '0')])
+        [Metric(element).name for element in parser.metric_elements(METRIC_DATA_SAMPLE)]\
+            .should.equal(['ActiveRecord/all'] * 5)
+
+
+def test_parsers_read_bytes():
+    """
+    Every parser should read response bodies as bytes, leading whitespace
+    included
+    """
+    body = METRIC_DATA_SAMPLE.encode('utf-8')
+    body.startswith(b'\n').should.be.ok
+    for parser in parsers():
+        [m.begin for m in parser.metric_data(body)][:1].should.equal(['2011-04-20T15:47:00Z'])
+        parser.parse(body).tag.should.equal('metrics')
+        [a.name for a in parser.applications(VIEW_APPLICATIONS_SAMPLE.encode('utf-8'))]\
+            .should.equal(['My Application', 'My Application2'])
+
+
+def test_parsers_iterparse():
+    """
+    Every parser should stream elements from a file-like object
+    """
+    for parser in parsers():
+        stream = io.BytesIO(METRIC_DATA_SAMPLE.strip().encode('utf-8'))
+        [Metric(element).begin for element in parser.iterparse(stream, 'metric')].should.equal([
+            '2011-04-20T15:47:00Z', '2011-04-20T15:48:00Z', '2011-04-20T15:49:00Z',
+            '2011-04-20T15:50:00Z', '2011-04-20T15:51:00Z'])
+
+
+def test_get_parser():
+    """
+    get_parser should pick parsers by name and default to the fastest
+    """
+    get_parser('sax').should.be.a(SaxParser)
+    if ACCELERATED_ETREE:
+        get_parser(None).name.should.equal('etree')
+    get_parser.when.called_with('html').should.throw(ValueError)
@@ -0,0 +1,86 @@
+import datetime
+import re
+
+from xml.etree import ElementTree as etree
+
+from pyrelic.planner import name_partition_pattern, plan_windows, split_partition, stitch
+
+
+def element(agent_id, name, begin, end):
+    return etree.Element('metric', {'agent_id': agent_id, 'name': name, 'begin': begin, 'end': end})
+
+
+def test_plan_windows_short_range():
+    """
+    plan_windows should not split a window shorter than a chunk
+    """
+    plan_windows("2011-04-20T15:47:00Z", "2011-04-20T15:52:00Z", 3600)\
+        .should.equal([("2011-04-20T15:47:00Z", "2011-04-20T15:52:00Z")])
+
+
+def test_plan_windows_aligned_chunks():
+    """
+    plan_windows should split long windows on chunk boundaries
+    """
+    # When I plan a window spanning two day boundaries
+    windows = plan_windows("2011-04-20T12:00:00Z", "2011-04-22T06:00:00Z", datetime.timedelta(days=1))
+
+    # Then it should be split at midnight without gaps
+    windows.should.equal([("2011-04-20T12:00:00Z", "2011-04-21T00:00:00Z"),
+                          ("2011-04-21T00:00:00Z", "2011-04-22T00:00:00Z"),
+                          ("2011-04-22T00:00:00Z", "2011-04-22T06:00:00Z")])
+
+
+def test_plan_windows_whole_minutes():
+    """
+    plan_windows should round chunks up to whole minutes
+    """
+    plan_windows("2011-04-20T15:47:00Z", "2011-04-20T15:49:00Z", 1).should.have.length_of(2)
+
+
+def test_stitch_orders_and_deduplicates():
+    """
+    stitch should order periods and drop those repeated at boundaries
+    """
+    # When two windows both return the period on their boundary
+    first = [element('1', 'Foo', '2011-04-20T15:48:00Z', '2011-04-20T15:49:00Z'),
+             element('1', 'Foo', '2011-04-20T15:47:00Z', '2011-04-20T15:48:00Z')]
+    second = [element('1', 'Foo', '2011-04-20T15:48:00Z', '2011-04-20T15:49:00Z'),
+              element('1', 'Foo', '2011-04-20T15:49:00Z', '2011-04-20T15:50:00Z'),
+              element('1', 'Bar', '2011-04-20T15:49:00Z', '2011-04-20T15:50:00Z')]
+    result = stitch([first, second], 'agent_id')
+
+    # Then every period should appear once, in order
+    [(e.get('name'), e.get('begin')[11:16]) for e in result].should.equal([
+        ('Bar', '15:49'), ('Foo', '15:47'), ('Foo', '15:48'), ('Foo', '15:49')])
+    result[2].should.be(first[0])
+
+
+def test_stitch_application_order():
+    """
+    stitch should keep applications in the order they were asked for
+    """
+    result = stitch([[element('10', 'Foo', '2011-04-20T15:47:00Z', '2011-04-20T15:48:00Z'),
+                      element('9', 'Foo', '2011-04-20T15:47:00Z', '2011-04-20T15:48:00Z'),
+                      element('7', 'Foo', '2011-04-20T15:47:00Z', '2011-04-20T15:48:00Z')]], 'agent_id', [9, 10])
+    [e.get('agent_id') for e in result].should.equal(['9', '10', '7'])
+
+
+def test_name_partition_pattern():
+    """
+    name_partition_pattern should select names by prefix, minus excluded characters
+    """
+    name_partition_pattern('').should.equal('^')
+    name_partition_pattern('Web.').should.equal('^Web\\.')
+    pattern = name_partition_pattern('Web', 'T]')
+    [name for name in ['Web', 'WebT', 'Web]', 'Webx'] if re.search(pattern, name)].should.equal(['Web', 'Webx'])
+
+
+def test_split_partition():
+    """
+    split_partition should split a full page on the next character of its names
+    """
+    split_partition('Web', None, ['Web', 'WebT/a', 'WebT/b', 'Web/x']).should.equal([
+        ('Web/', None), ('WebT', None), ('Web', '/T')])
+    split_partition('Web', '/T', ['Webx', 'Weby']).should.equal([
+        ('Webx', None), ('Weby', None), ('Web', '/Txy')])
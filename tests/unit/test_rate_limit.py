@@ -0,0 +1,134 @@
+import os
+import tempfile
+import threading
+
+from nose.plugins.skip import SkipTest
+
+from pyrelic import Client, NewRelicApiRateLimitException, RateLimiter, SharedRateLimiter
+
+
+def test_rate_limiter_first_call():
+    """
+    RateLimiter should allow the first call
+    """
+    limiter = RateLimiter()
+    limiter.reserve("foo").should.equal(0)
+
+
+def test_rate_limiter_reports_delay():
+    """
+    RateLimiter should report the time until the next token
+    """
+    # When I use up the only token
+    limiter = RateLimiter(rate=1, per=60)
+    limiter.reserve("foo")
+
+    # Then the next call should have to wait about a minute
+    delay = limiter.reserve("foo")
+    delay.should.be.greater_than(59)
+    delay.should.be.lower_than(60.01)
+
+
+def test_rate_limiter_separate_endpoints():
+    """
+    RateLimiter should keep one bucket per endpoint
+    """
+    limiter = RateLimiter()
+    limiter.reserve("foo")
+    limiter.reserve("bar").should.equal(0)
+
+
+def test_rate_limiter_custom_limits():
+    """
+    RateLimiter should allow bursts for configured endpoints
+    """
+    # When an endpoint allows a burst of three calls
+    limiter = RateLimiter(limits={"foo": (3, 60, 3)})
+
+    # Then three calls should succeed straight away
+    [limiter.reserve("foo") for _ in range(3)].should.equal([0, 0, 0])
+    limiter.reserve("foo").should.be.greater_than(0)
+
+
+def test_rate_limiter_acquire_raises():
+    """
+    RateLimiter should raise with a numeric timeout when not waiting
+    """
+    limiter = RateLimiter()
+    limiter.acquire("foo")
+    try:
+        limiter.acquire("foo")
+    except NewRelicApiRateLimitException as e:
+        e.timeout.should.be.greater_than(59)
+    else:
+        raise AssertionError("NewRelicApiRateLimitException not raised")
+
+
+def test_rate_limiter_thread_safe():
+    """
+    RateLimiter should hand out each token only once across threads
+    """
+    # When many threads race for a burst of five tokens
+    limiter = RateLimiter(rate=5, per=60, burst=5)
+    granted = []
+
+    def take():
+        if not limiter.reserve("foo"):
+            granted.append(1)
+    threads = [threading.Thread(target=take) for _ in range(20)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+
+    # Then only five should have been granted
+    granted.should.have.length_of(5)
+
+
+def test_shared_rate_limiter_shares_budget():
+    """
+    SharedRateLimiters on the same file should share one budget
+    """
+    # When two limiters use the same state file
+    path = os.path.join(tempfile.mkdtemp(), "limits")
+    first = SharedRateLimiter("1", "foo", path=path)
+    second = SharedRateLimiter("1", "foo", path=path)
+
+    # Then a token taken by one should not be available to the other
+    first.reserve("get_metric_data").should.equal(0)
+    second.reserve("get_metric_data").should.be.greater_than(59)
+    second.reserve("get_metric_names").should.equal(0)
+
+
+def test_shared_rate_limiter_path_per_account():
+    """
+    SharedRateLimiter should keep a separate file per account and key
+    """
+    SharedRateLimiter("1", "foo").path.should_not.equal(SharedRateLimiter("1", "bar").path)
+    SharedRateLimiter("1", "foo").path.should.equal(SharedRateLimiter("1", "foo").path)
+
+
+def test_shared_rate_limiter_across_processes():
+    """
+    SharedRateLimiter should share its budget with forked processes
+    """
+    if not hasattr(os, 'fork'):
+        raise SkipTest("fork is not available")
+
+    # When a child process takes the only token
+    path = os.path.join(tempfile.mkdtemp(), "limits")
+    limiter = SharedRateLimiter("1", "foo", path=path)
+    limiter.reserve("warm-up")
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0 if limiter.reserve("get_metric_data") == 0 else 1)
+    os.waitpid(pid, 0)[1].should.equal(0)
+
+    # Then the parent should have to wait
+    limiter.reserve("get_metric_data").should.be.greater_than(59)
+
+
+def test_client_shared_rate_limiter():
+    """
+    Client should build a SharedRateLimiter when asked to
+    """
+    c = Client(account_id="1", api_key="2", rate_limiter='shared')
+    c.rate_limiter.should.be.a(SharedRateLimiter)
@@ -0,0 +1,78 @@
+import time
+
+from email.utils import formatdate
+
+from pyrelic import RetryBudget, RetryPolicy
+from pyrelic.retry import parse_retry_after
+
+
+def test_parse_retry_after():
+    """
+    parse_retry_after should understand seconds and HTTP dates
+    """
+    parse_retry_after("5").should.equal(5)
+    parse_retry_after(formatdate(time.time() + 30, usegmt=True)).should.be.within(28, 30)
+    parse_retry_after("soon").should.be.none
+    parse_retry_after(None).should.be.none
+
+
+def test_retry_policy_full_jitter():
+    """
+    RetryPolicy should wait a random time up to an exponential cap
+    """
+    policy = RetryPolicy(retries=10, backoff=1, max_delay=4, budget=False)
+    for _ in range(50):
+        policy.delay(1).should.be.within(0, 1)
+        policy.delay(3).should.be.within(0, 4)
+        policy.delay(6).should.be.within(0, 4)
+
+
+def test_retry_policy_gives_up():
+    """
+    RetryPolicy should stop after its retries and skip timeouts if asked
+    """
+    policy = RetryPolicy(retries=2, retry_timeouts=False, budget=False)
+    policy.delay(3).should.be.none
+    policy.delay(1, timeout=True).should.be.none
+
+
+def test_retry_policy_retry_after():
+    """
+    RetryPolicy should honour Retry-After unless it is too long
+    """
+    policy = RetryPolicy(max_retry_after=60, budget=False)
+    policy.delay(1, retry_after="7").should.equal(7)
+    policy.delay(1, retry_after="600").should.be.none
+
+
+def test_retry_policy_methods():
+    """
+    RetryPolicy should only retry timeouts and statuses of idempotent methods
+    """
+    policy = RetryPolicy(budget=False)
+    policy.retry_status(503, 'GET').should.be.true
+    policy.retry_status(503, 'POST').should.be.false
+    policy.delay(1, timeout=True, method='post').should.be.none
+    policy.delay(1, method='post').should_not.be.none
+
+    # Unless asked to
+    policy = RetryPolicy(budget=False, methods=('GET', 'POST'))
+    policy.retry_status(503, 'POST').should.be.true
+    policy.delay(1, timeout=True, method='POST').should_not.be.none
+
+
+def test_retry_budget():
+    """
+    RetryBudget should cap retries to a share of requests
+    """
+    # When the initial budget is spent
+    budget = RetryBudget(ratio=0.5, min_retries=1)
+    budget.withdraw().should.be.true
+    budget.withdraw().should.be.false
+
+    # Then it should take two requests to earn another retry
+    budget.deposit()
+    budget.withdraw().should.be.false
+    budget.deposit()
+    budget.deposit()
+    budget.withdraw().should.be.true
@@ -0,0 +1,49 @@
+from mock import Mock
+
+from pyrelic import PooledSession
+
+
+def test_session_mounts_pooled_adapters():
+    """
+    PooledSession should mount adapters with the configured pool sizes
+    """
+    # When I create a session with pool settings
+    s = PooledSession(pool_connections=3, pool_maxsize=7)
+
+    # Then both schemes should use a pooled adapter without retries
+    adapter = s.get_adapter("https://api.newrelic.com")
+    adapter._pool_connections.should.equal(3)
+    adapter._pool_maxsize.should.equal(7)
+    adapter.max_retries.total.should.equal(0)
+    s.get_adapter("http://rpm.newrelic.com").should.be(adapter)
+
+
+def test_session_keeps_recent_connections():
+    """
+    PooledSession should keep connections that are not idle
+    """
+    # When I use a session within the idle time
+    s = PooledSession(max_idle_time=60)
+    adapter = s.get_adapter("https://api.newrelic.com")
+    adapter.poolmanager = Mock()
+    s._drop_idle_connections()
+    s._drop_idle_connections()
+
+    # Then the pools should not be cleared
+    adapter.poolmanager.clear.called.should.be.false
+
+
+def test_session_drops_idle_connections():
+    """
+    PooledSession should drop connections after the idle time
+    """
+    # When I use a session after it has been idle too long
+    s = PooledSession(max_idle_time=60)
+    adapter = s.get_adapter("https://api.newrelic.com")
+    adapter.poolmanager = Mock()
+    s._last_used = 0
+
+    s._drop_idle_connections()
+
+    # Then the pools should be cleared
+    adapter.poolmanager.clear.called.should.be.true
@@ -0,0 +1,56 @@
+from pyrelic.stats import ClientStats, Histogram, RequestRecord
+
+
+def test_histogram_buckets():
+    """
+    Histogram should count values into cumulative buckets
+    """
+    histogram = Histogram((1, 10))
+    for value in (0.5, 1, 5, 20):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+    snapshot['buckets'].should.equal([(1, 2), (10, 3), (float('inf'), 4)])
+    snapshot['count'].should.equal(4)
+    snapshot['sum'].should.equal(26.5)
+    snapshot['max'].should.equal(20)
+    snapshot['p50'].should.equal(1)
+
+
+def test_client_stats_rollup():
+    """
+    ClientStats should roll records up per endpoint
+    """
+    stats = ClientStats()
+    record = RequestRecord('view_servers')
+    record.latency, record.connect, record.transfer, record.parse = 0.3, 0.2, 0.05, 0.05
+    record.bytes, record.retries = 2048, 1
+    stats.on_request(record)
+    hit = RequestRecord('view_servers')
+    hit.cache_hit = True
+    stats.on_request(hit)
+    stats.on_rate_limit('view_servers', 2.0)
+
+    snapshot = stats.snapshot()['view_servers']
+    snapshot['requests'].should.equal(2)
+    snapshot['cache_hits'].should.equal(1)
+    snapshot['retries'].should.equal(1)
+    snapshot['connect']['count'].should.equal(1)
+    snapshot['bytes']['sum'].should.equal(2048)
+    snapshot['rate_limit_wait']['max'].should.equal(2.0)
+
+
+def test_client_stats_prometheus():
+    """
+    ClientStats should render the Prometheus text format
+    """
+    stats = ClientStats()
+    record = RequestRecord('view_servers')
+    record.latency = 0.3
+    stats.on_request(record)
+
+    text = stats.prometheus()
+    text.should.contain('# TYPE pyrelic_requests_total counter\npyrelic_requests_total{endpoint="view_servers"} 1\n')
+    text.should.contain('pyrelic_latency_seconds_bucket{endpoint="view_servers",le="0.5"} 1\n')
+    text.should.contain('pyrelic_latency_seconds_bucket{endpoint="view_servers",le="+Inf"} 1\n')
+    text.should.contain('pyrelic_latency_seconds_count{endpoint="view_servers"} 1\n')
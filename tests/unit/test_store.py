@@ -0,0 +1,138 @@
+import os
+import tempfile
+
+from xml.etree import ElementTree as etree
+
+from pyrelic import MetricStore
+from pyrelic.utils import from_epoch
+
+
+def new_store(min_age=0):
+    return MetricStore(os.path.join(tempfile.mkdtemp(), "metrics.db"), min_age=min_age)
+
+
+def element(begin, end, value, **fields):
+    e = etree.Element('metric', {'agent_id': '1', 'app': 'My App', 'name': 'Foo',
+                                 'begin': begin, 'end': end})
+    fields['average_value'] = value
+    for name, text in sorted(fields.items()):
+        field = etree.SubElement(e, 'field', {'name': name})
+        field.text = text
+    return e
+
+
+def periods(begin, end, length=60):
+    """
+    The elements New Relic would return for begin/end epochs
+    """
+    return [element(from_epoch(start), from_epoch(start + length), str(start))
+            for start in range(begin, end, length)]
+
+
+def by_agent(e):
+    return e.get('agent_id')
+
+
+def test_store_everything_missing():
+    """
+    MetricStore should report the whole window missing when empty
+    """
+    store = new_store()
+    store.missing('1', 'Foo', 'average_value', 0, 600, 60).should.equal([(0, 600)])
+    store.resolution(600).should.be.none
+
+
+def test_store_gaps():
+    """
+    MetricStore should only report the windows it has not covered
+    """
+    # When I have covered two windows
+    store = new_store()
+    store.add(['1'], ['Foo'], ['average_value'], 120, 240, periods(120, 240), by_agent)
+    store.add(['1'], ['Foo'], ['average_value'], 360, 480, periods(360, 480), by_agent)
+
+    # Then only the windows around them should be missing
+    store.missing('1', 'Foo', 'average_value', 0, 600, 60).should.equal([(0, 120), (240, 360), (480, 600)])
+    store.missing('1', 'Foo', 'call_count', 0, 600, 60).should.equal([(0, 600)])
+
+    # At their period length only
+    store.missing('1', 'Foo', 'average_value', 0, 600, 3600).should.equal([(0, 600)])
+
+
+def test_store_merges_coverage():
+    """
+    MetricStore should merge adjacent covered windows
+    """
+    store = new_store()
+    store.add(['1'], ['Foo'], ['average_value'], 120, 240, periods(120, 240), by_agent)
+    store.add(['1'], ['Foo'], ['average_value'], 240, 360, periods(240, 360), by_agent)
+    store.missing('1', 'Foo', 'average_value', 120, 360, 60).should.equal([])
+    store._db.execute("SELECT COUNT(*) FROM coverage").fetchone()[0].should.equal(1)
+
+
+def test_store_recent_data_not_covered():
+    """
+    MetricStore should not mark windows younger than min_age as covered
+    """
+    store = new_store(min_age=10 ** 10)
+    store.add(['1'], ['Foo'], ['average_value'], 120, 240, periods(120, 240), by_agent)
+    store.missing('1', 'Foo', 'average_value', 120, 240, 60).should.equal([(120, 240)])
+
+
+def test_store_resolution():
+    """
+    MetricStore should learn the period length of each window length
+    """
+    store = new_store()
+    store.add(['1'], ['Foo'], ['average_value'], 0, 3600, periods(0, 3600), by_agent)
+    store.add(['1'], ['Foo'], ['average_value'], 0, 7200, periods(0, 7200), by_agent)
+    store.add(['1'], ['Foo'], ['average_value'], 0, 86400, periods(0, 86400, 3600), by_agent)
+
+    store.resolution(3600).should.equal(60)
+    store.resolution(5400).should.equal(60)
+    store.resolution(86400).should.equal(3600)
+
+    # Windows between spans of different resolutions could get either
+    store.resolution(40000).should.be.none
+
+    # And an empty response covers its window at the known resolution
+    store.add(['1'], ['Foo'], ['average_value'], 86400, 90000, [], by_agent)
+    store.missing('1', 'Foo', 'average_value', 86400, 90000, 60).should.equal([])
+
+
+def test_store_load():
+    """
+    MetricStore should rebuild stored periods in order
+    """
+    # When I store two periods out of order
+    store = new_store()
+    store.add(['1'], ['Foo'], ['average_value'], 1303314420, 1303314540, [
+        element('2011-04-20T15:48:00Z', '2011-04-20T15:49:00Z', '2', call_count='5'),
+        element('2011-04-20T15:47:00Z', '2011-04-20T15:48:00Z', '1', call_count='4'),
+    ], by_agent)
+
+    # Then I should get them back ordered by period
+    loaded = store.load(['1'], ['Foo'], ['call_count', 'average_value'], 1303314420, 1303314540, 60)
+    [e.get('begin') for e in loaded].should.equal(['2011-04-20T15:47:00Z', '2011-04-20T15:48:00Z'])
+    [(f.get('name'), f.text) for f in loaded[0].findall('.//field')].should.equal([
+        ('call_count', '4'), ('average_value', '1')])
+    loaded[0].get('app').should.equal('My App')
+
+    # And only the periods within the window, with the fields asked for
+    loaded = store.load(['1'], ['Foo'], ['average_value'], 1303314480, 1303314540, 60)
+    loaded.should.have.length_of(1)
+    loaded[0].findall('.//field').should.have.length_of(1)
+
+
+def test_store_keeps_resolutions_apart():
+    """
+    MetricStore should never mix periods of different lengths
+    """
+    # When I store an hour by the minute and a day by the hour
+    store = new_store()
+    store.add(['1'], ['Foo'], ['average_value'], 0, 3600, periods(0, 3600), by_agent)
+    store.add(['1'], ['Foo'], ['average_value'], 0, 86400, periods(0, 86400, 3600), by_agent)
+
+    # Then each should be loaded on its own
+    store.load(['1'], ['Foo'], ['average_value'], 0, 86400, 3600).should.have.length_of(24)
+    store.load(['1'], ['Foo'], ['average_value'], 0, 86400, 60).should.have.length_of(60)
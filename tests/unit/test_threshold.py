@@ -32,3 +32,19 @@ def test_threshold_good_initialization():
     t.threshold_value.should.be('threshold_value_foo')
     t.begin_time.should.be('begin_time_foo')
     t.end_time.should.be('end_time_foo')
+
+
+def test_threshold_as_number():
+    """
+    Threshold values should be converted to numbers on request
+    """
+    t = Threshold({'name': "Apdex",
+                   'metric_value': "0.96",
+                   'formatted_metric_value': "0.96 [1.0]*",
+                   'threshold_value': "1",
+                   'begin_time': "begin_time_foo",
+                   'end_time': "end_time_foo"
+                   })
+    hasattr(t, '__dict__').should.be.false
+    t.as_number('metric_value').should.equal(0.96)
+    t.as_number('threshold_value').should.equal(1)
@@ -0,0 +1,127 @@
+import httpretty
+import re
+import threading
+import time
+
+from mock import Mock, patch
+
+from pyrelic import Client, ThresholdWatcher
+
+from ..fixtures.sample_responses import THRESHOLD_VALUES_SAMPLE
+
+NEW_RELIC_REGEX = re.compile(".*.newrelic.com/.*")
+
+
+def serve(bodies, requested=None):
+    def respond(request, uri, headers):
+        if requested is not None:
+            requested.append(uri)
+        return (200, headers, bodies[0])
+    httpretty.register_uri(httpretty.GET, NEW_RELIC_REGEX, body=respond)
+
+
+@httpretty.activate
+def test_watcher_emits_changes():
+    """
+    ThresholdWatcher should only report thresholds that changed
+    """
+    bodies = [THRESHOLD_VALUES_SAMPLE]
+    serve(bodies)
+    received = []
+    watcher = ThresholdWatcher(Client(account_id="1", api_key="2"), ["123"])
+    watcher.add_callback(received.append)
+
+    # When I poll for the first time
+    changes = watcher.poll("123")
+
+    # Then every threshold should be new
+    changes.should.have.length_of(8)
+    changes[0].previous_level.should.be.none
+    received.should.equal([changes])
+
+    # When the CPU level goes up and the memory use changes
+    bodies[0] = THRESHOLD_VALUES_SAMPLE\
+        .replace('formatted_metric_value="52.86 %" threshold_value="1" metric_value="52.86"',
+                 'formatted_metric_value="95.1 %" threshold_value="3" metric_value="95.1"')\
+        .replace('threshold_value="1" metric_value="261.42"', 'threshold_value="1" metric_value="300.1"')
+    changes = watcher.poll("123")
+
+    # Then only those thresholds should be reported
+    [(c.name, c.previous_value, c.threshold.metric_value, c.level_changed) for c in changes].should.equal([
+        ('CPU', '52.86', '95.1', True), ('Memory', '261.42', '300.1', False)])
+
+    # And nothing at all when nothing changed
+    watcher.poll("123").should.equal([])
+    received.should.have.length_of(2)
+
+
+@httpretty.activate
+def test_watcher_levels_only():
+    """
+    ThresholdWatcher should ignore value changes when watching levels only
+    """
+    bodies = [THRESHOLD_VALUES_SAMPLE]
+    serve(bodies)
+    watcher = ThresholdWatcher(Client(account_id="1", api_key="2"), levels_only=True)
+    watcher.poll("123")
+
+    # When a value changes but its level doesn't
+    bodies[0] = THRESHOLD_VALUES_SAMPLE.replace('metric_value="261.42"', 'metric_value="300.1"')
+
+    # Then nothing should be reported
+    watcher.poll("123").should.equal([])
+
+    # When a threshold disappears
+    bodies[0] = re.sub('<threshold_value name="DB".*?/>', '', bodies[0])
+
+    # Then it should be reported gone
+    [(c.name, c.threshold, c.level_changed) for c in watcher.poll("123")].should.equal([('DB', None, True)])
+
+
+@httpretty.activate
+def test_watcher_polls_in_background():
+    """
+    ThresholdWatcher should poll every application in the background
+    """
+    requested = []
+    serve([THRESHOLD_VALUES_SAMPLE], requested)
+    polled = threading.Event()
+    applications = []
+
+    def received(changes):
+        applications.append(changes[0].app_id)
+        if len(applications) == 3:
+            polled.set()
+
+    # When I watch three applications
+    watcher = ThresholdWatcher(Client(account_id="1", api_key="2"), ["1", "2", "3"], interval=0.05,
+                               max_workers=1)
+    watcher.add_callback(received)
+    watcher.start()
+    polled.wait(5)
+    time.sleep(0.3)
+    watcher.stop()
+
+    # Then each should have been polled again and again
+    sorted(applications).should.equal(["1", "2", "3"])
+    len(requested).should.be.greater_than(6)
+
+
+def test_watcher_logs_unexpected_errors():
+    """
+    ThresholdWatcher should log unexpected errors and keep polling
+    """
+    c = Client(account_id="1", api_key="2")
+    watcher = ThresholdWatcher(c, ["1"], interval=0.01)
+    watcher.poll = Mock(side_effect=ValueError("not XML"))
+    polled = threading.Event()
+
+    # When a poll fails in an unexpected way
+    with patch('pyrelic.watcher.logger') as logger:
+        logger.exception.side_effect = lambda *args: polled.set() if watcher.poll.call_count > 1 else None
+        watcher.start()
+        polled.wait(5)
+        watcher.stop()
+
+    # Then it should be logged and the application polled again
+    logger.exception.call_count.should.be.greater_than(1)